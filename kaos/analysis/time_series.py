@@ -1,5 +1,8 @@
+import numpy as np
 import pandas as pd
 
+from kaos.time_utils import SessionCalendar
+
 # index functions ------------------------------------------------------
 
 
@@ -31,3 +34,27 @@ def symmetric_difference(
     idx = _get_index(pandas_object)
     idx_other = _get_index(other)
     return idx.symmetric_difference(idx_other)
+
+
+def session_dates(
+    pandas_object: pd.Index | pd.DataFrame | pd.Series, calendar: SessionCalendar
+) -> pd.DatetimeIndex:
+    """Trading date of the session containing each timestamp, NaT
+    outside sessions. Looked up in the precomputed calendar arrays."""
+    idx = _get_index(pandas_object)
+    if idx.tz is None:
+        idx = idx.tz_localize(calendar.tz, ambiguous=True, nonexistent="shift_forward")
+    return pd.DatetimeIndex(calendar.session_of(idx.as_unit("ns").asi8), name=idx.name)
+
+
+def union_timestamps(timestamps: list[np.ndarray]) -> np.ndarray:
+    """Sorted union of sorted int64 timestamp arrays. The arrays are
+    merged in one pass: a stable sort of their concatenation (timsort)
+    only merges the sorted runs, like a k-way merge."""
+    if not timestamps:
+        return np.empty(0, dtype=np.int64)
+    merged = np.sort(np.concatenate(timestamps), kind="stable")
+    keep = np.empty(len(merged), dtype=bool)
+    keep[:1] = True
+    np.not_equal(merged[1:], merged[:-1], out=keep[1:])
+    return merged[keep]
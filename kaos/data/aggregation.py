@@ -4,7 +4,15 @@ This module contains resampling functions to create timeframes.
 The type of aggregation I am interested in includes the start_time of the candle.
 """
 
+from collections.abc import Callable, Iterator
+from dataclasses import dataclass
+from typing import Literal
+
+import numpy as np
 import pandas as pd
+from pandas.tseries.frequencies import to_offset
+
+from kaos.time_utils import SessionCalendar
 
 # @dataclass(kw_only=True)
 # class OHLCVOData(MarketData):
@@ -17,6 +25,15 @@ import pandas as pd
 # volume: int
 # open_interest: int
 
+OHLCV_AGGREGATION = {
+    # col    # func
+    "open": "first",
+    "high": "max",
+    "low": "min",
+    "close": "last",
+    "volume": "sum",
+}
+
 
 def subsample_ohlc(
     data: pd.DataFrame,
@@ -25,7 +42,9 @@ def subsample_ohlc(
     time_column: str | None = None,
     offset=None,
     dropna_rows: bool = True,
-    label: str = 'right'
+    label: str = 'right',
+    engine: Literal["pandas", "numpy"] = "pandas",
+    calendar: SessionCalendar | None = None,
 ) -> pd.DataFrame:
     """
     they might give some problems with other timeframes, check them with TV
@@ -46,23 +65,563 @@ def subsample_ohlc(
 
     closed='left' changes data aggregation
     this changes fix the Weekly behaviour
+
+    engine='numpy' computes bin keys once from the int64 timestamps and
+    aggregates sorted data with reduceat kernels, see _subsample_ohlc_numpy.
+    It falls back to pandas for anchored timeframes (e.g. W), unsorted
+    data or missing values.
+
+    With a calendar, D and W bins are delimited by the session edges
+    precomputed by the calendar instead of offset: D gives the same bins
+    as offset=open_time, W starts at the open of the first session of
+    each week (e.g. Sunday 18:00 on CME), unlike the pandas W anchor.
     """
+    if calendar is not None and timeframe in _CALENDAR_TIMEFRAMES:
+        source = data if time_column is None else data.set_index(time_column)
+        return _subsample_ohlc_calendar(source, timeframe, calendar, dropna_rows, label)
+    if engine == "numpy":
+        source = data if time_column is None else data.set_index(time_column)
+        sampled = _subsample_ohlc_numpy(source, timeframe, offset, dropna_rows, label)
+        if sampled is not None:
+            return sampled
+    elif engine != "pandas":
+        raise ValueError(f"Unhandled engine: {engine}")
 
     sampled = data.resample(
         timeframe, label=label, closed="left", on=time_column, offset=offset
-    ).agg(
-        {
-            # col    # func
-            "open": "first",
-            "high": "max",
-            "low": "min",
-            "close": "last",
-            "volume": "sum",
+    ).agg(OHLCV_AGGREGATION)
+    # removes na rows since there are many times with 0 volume, so no data.
+    return (
+        sampled.dropna(subset=["open", "high", "low", "close"], how="all")
+        if dropna_rows
+        else sampled
+    )
+
+
+def subsample_ohlc_multi(
+    data: pd.DataFrame,
+    *,
+    timeframes: list[str],
+    time_column: str | None = None,
+    offset=None,
+    dropna_rows: bool = True,
+    label: str = "right",
+) -> dict[str, pd.DataFrame]:
+    """
+    Same as calling subsample_ohlc for each timeframe, in a single call.
+
+    Timeframes are computed from the finest to the coarsest, and each
+    one is aggregated from the coarsest already computed timeframe whose
+    bins nest exactly into its bins (e.g. 1min -> 5min -> 1h -> D), so
+    only the first step scans the full data. Timeframes not nesting into
+    any other one (e.g. W, or 4h -> D with an 18h offset) are computed
+    from data. Label, closed and offset semantics are the same as
+    subsample_ohlc.
+    """
+    if time_column is not None:
+        data = data.set_index(time_column)
+    if data.empty:
+        return {
+            tf: subsample_ohlc(
+                data, timeframe=tf, offset=offset, dropna_rows=dropna_rows, label=label
+            )
+            for tf in timeframes
         }
+
+    # same origin pandas would use on data ("start_day"), shared by all steps
+    origin: pd.Timestamp = data.index[0].normalize()
+    tz = data.index.tz
+    freqs = {tf: to_offset(tf) for tf in timeframes}
+    order = sorted(
+        timeframes,
+        key=lambda tf: (0, freqs[tf].nanos) if _is_tick(freqs[tf]) else (1, 0),
     )
-    # removes na rows since there are many times with 0 volume, so no data.
+
+    # bins labelled by their left edge, empty bins included
+    left: dict[str, pd.DataFrame] = {}
+    out: dict[str, pd.DataFrame] = {}
+    for tf in order:
+        if not _is_tick(freqs[tf]):
+            # anchored timeframes never nest, they are sampled from data
+            out[tf] = subsample_ohlc(
+                data, timeframe=tf, offset=offset, dropna_rows=dropna_rows, label=label
+            )
+            continue
+
+        source: pd.DataFrame = data
+        for done in reversed(left):
+            if _nests(freqs[done], freqs[tf], tz):
+                source = left[done]
+                break
+        left[tf] = source.resample(
+            tf, label="left", closed="left", offset=offset, origin=origin
+        ).agg(OHLCV_AGGREGATION)
+
+        sampled = left[tf]
+        if label == "right":
+            # right edge of each bin, built like pandas builds its bins
+            edges = pd.date_range(
+                start=sampled.index[0],
+                periods=len(sampled) + 1,
+                freq=freqs[tf],
+                name=sampled.index.name,
+                ambiguous=True,
+                nonexistent="shift_forward",
+            )
+            sampled = sampled.set_axis(edges[1:])
+        out[tf] = (
+            sampled.dropna(subset=["open", "high", "low", "close"], how="all")
+            if dropna_rows
+            else sampled
+        )
+
+    return {tf: out[tf] for tf in timeframes}
+
+
+def _subsample_ohlc_numpy(
+    data: pd.DataFrame,
+    timeframe: str,
+    offset,
+    dropna_rows: bool,
+    label: str,
+) -> pd.DataFrame | None:
+    """
+    Same output as the pandas path, or None if data is not supported.
+
+    Each row gets the key of its bin, consecutive rows with the same key
+    delimit a group, and np.*.reduceat computes max/min/sum of every
+    group in one call (first/last are plain indexing). Only non-empty
+    bins have a group, so no dropna pass is needed.
+
+    Sums of floats are not compensated as in pandas, they might differ
+    in the last digits.
+    """
+    freq = to_offset(timeframe)
+    columns = list(OHLCV_AGGREGATION)
+    if (
+        data.empty
+        or not _is_tick(freq)
+        or not data.index.is_monotonic_increasing
+        or any(_has_nan(data[col].to_numpy()) for col in columns)
+    ):
+        return None
+
+    grid = BinGrid(freq, offset, data.index[0].normalize())
+    keys = grid.keys(data.index)
+    if (np.diff(keys) < 0).any():
+        return None
+    return _aggregate_bins(data, grid, keys, dropna_rows, label)
+
+
+def _subsample_ohlc_calendar(
+    data: pd.DataFrame,
+    timeframe: str,
+    calendar: SessionCalendar,
+    dropna_rows: bool,
+    label: str,
+) -> pd.DataFrame:
+    """Resamples data into the daily or weekly bins of a session
+    calendar."""
+    columns = list(OHLCV_AGGREGATION)
+    if data.empty:
+        return data[columns].iloc[:0]
+    if not data.index.is_monotonic_increasing:
+        data = data.sort_index()
+
+    # a week of margin, the bins containing first and last rows are included
+    margin = pd.Timedelta(days=8)
+    start = data.index[0].tz_localize(None) - margin
+    end = data.index[-1].tz_localize(None) + margin
+    grid = _EdgeGrid(_CALENDAR_TIMEFRAMES[timeframe](calendar, start, end), calendar.tz)
+    keys = grid.keys(data.index)
+
+    if not any(_has_nan(data[col].to_numpy()) for col in columns):
+        return _aggregate_bins(data, grid, keys, dropna_rows, label)
+
+    # missing values are skipped by the pandas aggregations
+    sampled = data[columns].groupby(keys).agg(OHLCV_AGGREGATION)
+    first_key = int(sampled.index[0])
+    n_bins = int(sampled.index[-1]) - first_key + 1
+    if not dropna_rows:
+        sampled = sampled.reindex(range(first_key, first_key + n_bins))
+        sampled["volume"] = sampled["volume"].fillna(0)
+    labels = grid.labels(first_key, n_bins, label, data.index)
+    sampled = sampled.set_axis(labels[sampled.index.to_numpy() - first_key])
     return (
         sampled.dropna(subset=["open", "high", "low", "close"], how="all")
         if dropna_rows
         else sampled
     )
+
+
+def _aggregate_bins(
+    data: pd.DataFrame,
+    grid: "BinGrid | _EdgeGrid",
+    keys: np.ndarray,
+    dropna_rows: bool,
+    label: str,
+) -> pd.DataFrame:
+    """Aggregates sorted data without missing values by the bin keys of
+    grid with reduceat kernels."""
+    starts = np.flatnonzero(np.diff(keys, prepend=keys[0] - 1))
+    ends = np.append(starts[1:], len(keys))
+    sampled = {
+        "open": data["open"].to_numpy()[starts],
+        "high": np.maximum.reduceat(data["high"].to_numpy(), starts),
+        "low": np.minimum.reduceat(data["low"].to_numpy(), starts),
+        "close": data["close"].to_numpy()[ends - 1],
+        "volume": np.add.reduceat(data["volume"].to_numpy(), starts),
+    }
+
+    bin_keys = keys[starts]
+    n_bins = int(bin_keys[-1] - bin_keys[0]) + 1
+    labels = grid.labels(bin_keys[0], n_bins, label, data.index)
+    positions = bin_keys - bin_keys[0]
+
+    if len(starts) == n_bins:
+        return pd.DataFrame(sampled, index=labels)
+    if dropna_rows:
+        return pd.DataFrame(sampled, index=labels[positions])
+
+    # empty bins as pandas returns them: NaN prices and 0 volume
+    full = {}
+    for col, values in sampled.items():
+        if col == "volume":
+            full[col] = np.zeros(n_bins, dtype=values.dtype)
+        else:
+            dtype = values.dtype if values.dtype.kind == "f" else np.float64
+            full[col] = np.full(n_bins, np.nan, dtype=dtype)
+        full[col][positions] = values
+    return pd.DataFrame(full, index=labels)
+
+
+class _EdgeGrid:
+    """Bins delimited by precomputed int64 edges (UTC nanoseconds), e.g.
+    the session edges of a SessionCalendar. Same interface as BinGrid."""
+
+    def __init__(self, edges: np.ndarray, tz: str):
+        self.edges = edges
+        self.tz = tz
+
+    def keys(self, index: pd.DatetimeIndex) -> np.ndarray:
+        """Bin key (position of the left edge) of every timestamp."""
+        if index.tz is None:
+            index = index.tz_localize(
+                self.tz, ambiguous=True, nonexistent="shift_forward"
+            )
+        return np.searchsorted(self.edges, index.as_unit("ns").asi8, "right") - 1
+
+    def labels(
+        self, first_key: int, n_bins: int, label: str, like: pd.DatetimeIndex
+    ) -> pd.DatetimeIndex:
+        """Labels of n_bins consecutive bins, in the timezone of like."""
+        edges = self.edges[first_key : first_key + n_bins + 1]
+        edges = pd.DatetimeIndex(edges, tz="UTC", name=like.name).as_unit(like.unit)
+        if like.tz is None:
+            edges = edges.tz_convert(self.tz).tz_localize(None)
+        else:
+            edges = edges.tz_convert(like.tz)
+        return edges[1:] if label == "right" else edges[:-1]
+
+
+class BinGrid:
+    """
+    Bins of a fixed timeframe as pandas resample builds them with
+    closed='left': edges at origin + offset + k * timeframe. Daily
+    timeframes of tz-aware data are computed on local wall time, so that
+    days follow DST changes, intraday ones on UTC.
+    """
+
+    def __init__(self, freq: pd.DateOffset, offset, origin: pd.Timestamp):
+        if not _is_tick(freq):
+            raise ValueError(f"{freq} is not a fixed timeframe.")
+
+        self.freq = freq
+        self.tz = origin.tz
+        self.wall_time = isinstance(freq, pd.offsets.Day) and self.tz is not None
+        if self.wall_time:
+            origin = origin.tz_localize(None)
+        offset_ns = 0 if offset is None else pd.Timedelta(offset).value
+        self.base = origin.as_unit("ns").value + offset_ns
+        self.step = freq.nanos
+
+    def keys(self, index: pd.DatetimeIndex) -> np.ndarray:
+        """Bin key of every timestamp of a sorted DatetimeIndex."""
+        index = index.as_unit("ns")
+        if not self.wall_time:
+            return (index.asi8 - self.base) // self.step
+
+        # localizing every timestamp is slow, the few day edges are
+        # localized instead and timestamps are searched among them
+        first_key = self.key(index[0])
+        n_bins = self.key(index[-1]) - first_key + 1
+        edges = self.labels(first_key, n_bins, "left", index).asi8
+        return np.searchsorted(edges, index.asi8, "right") - 1 + first_key
+
+    def key(self, ts: pd.Timestamp) -> int:
+        """Bin key of a single timestamp."""
+        ts = ts.as_unit("ns")
+        if self.wall_time:
+            ts = ts.tz_localize(None)
+        return (ts.value - self.base) // self.step
+
+    def edge(self, key: int) -> pd.Timestamp:
+        """Left edge of a bin."""
+        ns = self.base + key * self.step
+        if self.wall_time:
+            return pd.Timestamp(ns).tz_localize(
+                self.tz, ambiguous=True, nonexistent="shift_forward"
+            )
+        return pd.Timestamp(ns, tz="UTC").tz_convert(self.tz)
+
+    def labels(
+        self, first_key: int, n_bins: int, label: str, like: pd.DatetimeIndex
+    ) -> pd.DatetimeIndex:
+        """Labels of n_bins consecutive bins, built like pandas builds its
+        bins. like provides name and resolution of the index."""
+        edges = pd.date_range(
+            start=self.edge(first_key),
+            periods=n_bins + 1,
+            freq=self.freq,
+            name=like.name,
+            unit=like.unit,
+        )
+        return edges[1:] if label == "right" else edges[:-1]
+
+
+_CALENDAR_TIMEFRAMES: dict[str, Callable] = {
+    "D": SessionCalendar.daily_edges,
+    "W": SessionCalendar.weekly_edges,
+}
+
+
+def _has_nan(values: np.ndarray) -> bool:
+    return values.dtype.kind == "f" and bool(np.isnan(values).any())
+
+
+def _is_tick(freq: pd.DateOffset) -> bool:
+    return isinstance(freq, pd.offsets.Tick)
+
+
+def _nests(source: pd.DateOffset, target: pd.DateOffset, tz) -> bool:
+    """Whether every bin edge of target is also a bin edge of source,
+    both anchored to the same origin and offset."""
+    if not (_is_tick(source) and _is_tick(target)):
+        return False
+
+    source_day = isinstance(source, pd.offsets.Day)
+    target_day = isinstance(target, pd.offsets.Day)
+    if tz is None or source_day == target_day:
+        return target.nanos % source.nanos == 0
+    if target_day:
+        # days are computed on local time: across DST changes their edges
+        # move by one hour from the UTC grid of intraday bins
+        return pd.Timedelta(hours=1).value % source.nanos == 0
+    return False
+
+
+# ----------------------------------------------------------------------
+# streaming
+# ----------------------------------------------------------------------
+
+
+@dataclass(slots=True)
+class Bar:
+    timestamp: pd.Timestamp
+    open: float
+    high: float
+    low: float
+    close: float
+    volume: float
+
+
+@dataclass(slots=True)
+class _PartialBar:
+    key: int
+    end: int  # UTC nanoseconds of the bin right edge
+    open: float
+    high: float
+    low: float
+    close: float
+    volume: float
+
+
+class BarAggregator:
+    """
+    Streaming counterpart of subsample_ohlc: bars (e.g. 1min) are pushed
+    one at a time, and completed bars of every timeframe are returned by
+    update and passed to on_bar(timeframe, bar), if given.
+
+    Only the open partial bar of each timeframe is kept, and a push costs
+    a comparison with its bin end, unless a bin is completed. Bins, label
+    and offset follow subsample_ohlc, with the origin taken from the
+    first bar, so replaying a frame gives the batch result with
+    dropna_rows=True. Only fixed timeframes (e.g. 5min, 1h, D) are
+    supported.
+    """
+
+    def __init__(
+        self,
+        timeframes: list[str],
+        *,
+        offset=None,
+        label: str = "right",
+        on_bar: Callable[[str, Bar], None] | None = None,
+    ):
+        self.timeframes = list(timeframes)
+        self.offset = offset
+        self.label = label
+        self.on_bar = on_bar
+
+        self._freqs = {tf: to_offset(tf) for tf in self.timeframes}
+        for tf, freq in self._freqs.items():
+            if not _is_tick(freq):
+                raise ValueError(f"Timeframe {tf} is not supported for streaming.")
+        self._grids: dict[str, BinGrid] = {}
+        self._partials: dict[str, _PartialBar] = {}
+        self._last: int | None = None
+
+    # ------------------------------------------------------------------
+    # methods
+    # ------------------------------------------------------------------
+
+    def update(
+        self,
+        timestamp: pd.Timestamp,
+        open: float,
+        high: float,
+        low: float,
+        close: float,
+        volume: float,
+    ) -> list[tuple[str, Bar]]:
+        """Pushes a bar and returns the bars it completed."""
+        if not isinstance(timestamp, pd.Timestamp):
+            timestamp = pd.Timestamp(timestamp)
+        ns = timestamp.value if timestamp.unit == "ns" else timestamp.as_unit("ns").value
+        if self._last is not None and ns < self._last:
+            raise ValueError("Bars must be pushed in time order.")
+        self._last = ns
+
+        if not self._grids:
+            origin = timestamp.normalize()
+            self._grids = {
+                tf: BinGrid(freq, self.offset, origin)
+                for tf, freq in self._freqs.items()
+            }
+
+        completed: list[tuple[str, Bar]] = []
+        for tf in self.timeframes:
+            partial = self._partials.get(tf)
+            if partial is not None and ns < partial.end:
+                partial.high = max(partial.high, high)
+                partial.low = min(partial.low, low)
+                partial.close = close
+                partial.volume += volume
+                continue
+
+            if partial is not None:
+                completed.append((tf, self._complete(tf, partial)))
+            grid = self._grids[tf]
+            key = grid.key(timestamp)
+            end = grid.edge(key + 1).as_unit("ns").value
+            self._partials[tf] = _PartialBar(key, end, open, high, low, close, volume)
+
+        self._emit(completed)
+        return completed
+
+    def flush(self) -> list[tuple[str, Bar]]:
+        """Completes and returns the partial bars, e.g. at the end of a
+        replay, like the last bin of the batch result."""
+        completed = [
+            (tf, self._complete(tf, self._partials[tf]))
+            for tf in self.timeframes
+            if tf in self._partials
+        ]
+        self._partials.clear()
+        self._emit(completed)
+        return completed
+
+    def replay(self, data: pd.DataFrame) -> Iterator[tuple[str, Bar]]:
+        """Pushes every row of OHLCV data, yielding completed bars, and
+        flushes at the end."""
+        columns = ["open", "high", "low", "close", "volume"]
+        for row in data[columns].itertuples(name=None):
+            yield from self.update(*row)
+        yield from self.flush()
+
+    # private methods --------------------------------------------------
+
+    def _complete(self, timeframe: str, partial: _PartialBar) -> Bar:
+        grid = self._grids[timeframe]
+        key = partial.key + 1 if self.label == "right" else partial.key
+        return Bar(
+            grid.edge(key),
+            partial.open,
+            partial.high,
+            partial.low,
+            partial.close,
+            partial.volume,
+        )
+
+    def _emit(self, completed: list[tuple[str, Bar]]) -> None:
+        if self.on_bar is not None:
+            for tf, bar in completed:
+                self.on_bar(tf, bar)
+
+
+def bars_to_frame(bars: list[Bar], name: str | None = "timestamp") -> pd.DataFrame:
+    """Converts bars into an OHLCV DataFrame indexed by timestamp."""
+    index = pd.DatetimeIndex([bar.timestamp for bar in bars], name=name)
+    return pd.DataFrame(
+        {
+            "open": [bar.open for bar in bars],
+            "high": [bar.high for bar in bars],
+            "low": [bar.low for bar in bars],
+            "close": [bar.close for bar in bars],
+            "volume": [bar.volume for bar in bars],
+        },
+        index=index,
+    )
+
+
+# ----------------------------------------------------------------------
+# demonstration
+# ----------------------------------------------------------------------
+
+
+if __name__ == "__main__":
+    from time import perf_counter
+
+    # ~10 years of 1min bars, with gaps
+    rng = np.random.default_rng(0)
+    index = pd.date_range(
+        "2015-01-01", periods=5_000_000, freq="min", tz="America/New_York"
+    )
+    index = index[rng.random(len(index)) > 0.2].rename("timestamp")
+    close = 100 + np.cumsum(rng.normal(0, 0.01, len(index)))
+    bars = pd.DataFrame(
+        {
+            "open": close + rng.normal(0, 0.01, len(index)),
+            "high": close + 0.05,
+            "low": close - 0.05,
+            "close": close,
+            "volume": rng.integers(0, 100, len(index)),
+        },
+        index=index,
+    )
+
+    for timeframe, offset in [("5min", None), ("1h", None), ("D", "18h")]:
+        timings = {}
+        results = {}
+        for engine in ("pandas", "numpy"):
+            start = perf_counter()
+            results[engine] = subsample_ohlc(
+                bars, timeframe=timeframe, offset=offset, engine=engine
+            )
+            timings[engine] = perf_counter() - start
+
+        pd.testing.assert_frame_equal(results["pandas"], results["numpy"])
+        print(
+            f"{timeframe:>4}: pandas {timings['pandas']:.3f}s,"
+            f" numpy {timings['numpy']:.3f}s, identical output"
+        )
@@ -0,0 +1,133 @@
+"""
+Transparent columnar cache for parsed market data files.
+
+A raw file is parsed once and its typed columns are stored as Parquet.
+Entries are keyed by source path, mtime, size and reading preset, so
+any change to the raw file (or to the way it is read) invalidates them.
+
+Parquet support requires pyarrow; without it the cache is disabled and
+files are always parsed from source.
+"""
+
+import hashlib
+import os
+from pathlib import Path
+
+import pandas as pd
+
+from kaos.log_utils import get_logger
+
+# logger config
+logger = get_logger(__name__)
+# ----------------------------------------------------------------------
+
+
+def has_parquet_engine() -> bool:
+    """Whether pyarrow, the Parquet engine, is installed."""
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+class ColumnarCache:
+    EXTENSION = ".parquet"
+    # rows per parquet row group, small enough to skip blocks when
+    # reading a time window
+    ROW_GROUP_SIZE = 100_000
+
+    def __init__(self, directory: Path):
+        self._directory = directory
+        self._enabled = has_parquet_engine()
+        if not self._enabled:
+            logger.warning("pyarrow not installed, columnar cache disabled.")
+
+    # properties -------------------------------------------------------
+
+    @property
+    def directory(self) -> Path:
+        return self._directory
+
+    @property
+    def enabled(self) -> bool:
+        return self._enabled
+
+    # ------------------------------------------------------------------
+    # methods
+    # ------------------------------------------------------------------
+
+    def get(
+        self,
+        file: Path,
+        preset: dict,
+        start: pd.Timestamp | None = None,
+        end: pd.Timestamp | None = None,
+    ) -> pd.DataFrame | None:
+        """Returns the cached DataFrame for the given source file and
+        preset, or None if there is no valid entry.
+
+        start and end (both included) filter the index; row groups
+        entirely outside the window are not read.
+        """
+        if not self.enabled:
+            return None
+
+        entry = self._entry_path(file, preset)
+        if not entry.exists():
+            return None
+        if start is None and end is None:
+            return pd.read_parquet(entry)
+
+        index_column = self._index_column(entry)
+        filters = []
+        if start is not None:
+            filters.append((index_column, ">=", start))
+        if end is not None:
+            filters.append((index_column, "<=", end))
+        return pd.read_parquet(entry, filters=filters)
+
+    def put(self, file: Path, preset: dict, data: pd.DataFrame) -> None:
+        """Stores data for the given source file and preset, removing
+        stale entries of the same file."""
+        if not self.enabled:
+            return
+
+        entry = self._entry_path(file, preset)
+        self._directory.mkdir(parents=True, exist_ok=True)
+        for stale in self._directory.glob(f"{self._source_id(file)}-*"):
+            stale.unlink(missing_ok=True)
+
+        # write to a temporary file first, a reader never sees partial data
+        tmp = entry.with_suffix(".tmp")
+        data.to_parquet(tmp, row_group_size=self.ROW_GROUP_SIZE)
+        os.replace(tmp, entry)
+
+    def clear(self) -> None:
+        """Removes every entry of the cache."""
+        for entry in self._directory.glob(f"*{self.EXTENSION}"):
+            entry.unlink(missing_ok=True)
+
+    # private methods --------------------------------------------------
+
+    @staticmethod
+    def _source_id(file: Path) -> str:
+        resolved = str(Path(file).expanduser().resolve())
+        return hashlib.sha1(resolved.encode()).hexdigest()[:16]
+
+    @staticmethod
+    def _index_column(entry: Path) -> str:
+        import pyarrow.parquet as pq
+
+        metadata = pq.ParquetFile(entry).schema_arrow.pandas_metadata
+        index_column = metadata["index_columns"][0]
+        if not isinstance(index_column, str):
+            raise ValueError(f"Cached data of {entry} has no index column.")
+        return index_column
+
+    def _entry_path(self, file: Path, preset: dict) -> Path:
+        stat = Path(file).stat()
+        # presets only contain literals, so their repr is stable
+        key = repr((stat.st_mtime_ns, stat.st_size, sorted(preset.items())))
+        variant = hashlib.sha1(key.encode()).hexdigest()[:16]
+        return self._directory / f"{self._source_id(file)}-{variant}{self.EXTENSION}"
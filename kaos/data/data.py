@@ -1,15 +1,34 @@
 import re
 from abc import abstractmethod
+from collections import OrderedDict
+from collections.abc import Callable, Iterable, Iterator, MutableMapping, Sequence
 from dataclasses import dataclass, field
 from itertools import product
 from pathlib import Path
-from typing import Self, final
+from typing import TYPE_CHECKING, Self, final
 
+import numpy as np
 import pandas as pd
 
-from kaos.data.enums import AssetClass, DataProvider, RolloverRule
+from kaos.analysis.time_series import union_timestamps
+from kaos.data.enums import (
+    AssetClass,
+    ContinuousFuturesAdjustment,
+    DataProvider,
+    RolloverRule,
+)
+from kaos.data.store import index_to_ns, search_range
 from kaos.data.symbol import Symbol
 from kaos.log_utils import get_logger
+from kaos.time_utils import (
+    CMES_CODE_TO_MONTH,
+    STANDARD_TIMEZONE,
+    contract_dates,
+    full_year,
+)
+
+if TYPE_CHECKING:
+    from kaos.data.instruments import Instrument
 
 # logger config
 logger = get_logger(__name__)
@@ -29,16 +48,39 @@ class _CustomRegex:
     )
 
 
+# minimum price fluctuation of every product (CME contract specs), CME
+# and FirstRate codes
+TICK_SIZES: dict[str, float] = {
+    **dict.fromkeys(("6E", "E6", "6A", "A6", "6C", "D6", "6S", "S6"), 0.00005),
+    **dict.fromkeys(("6N", "N6"), 0.00005),
+    **dict.fromkeys(("6B", "B6"), 0.0001),
+    **dict.fromkeys(("6J", "J6"), 0.0000005),
+    **dict.fromkeys(("ES", "NQ", "MES", "MNQ"), 0.25),
+    **dict.fromkeys(("YM", "MYM"), 1.0),
+    **dict.fromkeys(("RTY", "M2K", "EMD"), 0.1),
+    **dict.fromkeys(("ZT", "TU"), 1 / 256),
+    **dict.fromkeys(("ZF", "FV"), 1 / 128),
+    **dict.fromkeys(("ZN", "TY", "TN"), 1 / 64),
+    **dict.fromkeys(("ZB", "US", "UB"), 1 / 32),
+    **dict.fromkeys(("CL", "MCL", "ZL"), 0.01),
+    **dict.fromkeys(("NG",), 0.001),
+    **dict.fromkeys(("GC", "MGC", "ZM"), 0.1),
+    **dict.fromkeys(("SI",), 0.005),
+    **dict.fromkeys(("HG",), 0.0005),
+    **dict.fromkeys(("ZC", "ZS", "ZW", "ZO"), 0.25),
+}
+
+
 # ----------------------------------------------------------------------
 # Data
 # ----------------------------------------------------------------------
 
 
 class Data:
-    pass
+    __slots__ = ()
 
 
-@dataclass(kw_only=True)
+@dataclass(kw_only=True, slots=True)
 class ReferenceData(Data):
     """
     Reference data is metadata describing instruments and entities.
@@ -56,11 +98,13 @@ class ReferenceData(Data):
         pass
 
 
-@dataclass(kw_only=True)
+@dataclass(kw_only=True, slots=True)
 class FuturesReferenceData(ReferenceData):
     # ------------------------------------------------------------------
     activation: pd.Timestamp | None = None
     expiration: pd.Timestamp | None = None
+    last_trade: pd.Timestamp | None = None
+    tick_size: float | None = None
     product_code: str = field(init=False)
     month_code: str | None = field(init=False, default=None)  # None if continuous
 
@@ -70,28 +114,381 @@ class FuturesReferenceData(ReferenceData):
 
     @classmethod
     def from_symbol(cls, symbol: Symbol) -> Self:
+        """Expiration and last trade date come from the expiration
+        calendar, if the rule of the product is known, and tick size from
+        TICK_SIZES. 2-digit years (e.g. ES-H-20) are the closest to now.
+        Activation is left to the contract, see FuturesContract."""
+        expiration = last_trade = None
+        month = CMES_CODE_TO_MONTH.get(symbol.month_code.upper())
+        if month is not None and symbol.year.isdigit():
+            year = int(symbol.year)
+            if len(symbol.year) <= 2:
+                year = full_year(year)
+            dates = contract_dates(symbol.product_code, year, month)
+            if dates is not None:
+                expiration, last_trade = (
+                    pd.Timestamp(date).tz_localize(STANDARD_TIMEZONE) for date in dates
+                )
         # FIXME hard-coded
         return cls(
             provider=DataProvider.FIRSTRATE,
             asset_class=AssetClass.FX,
             symbol=symbol,
+            expiration=expiration,
+            last_trade=last_trade,
+            tick_size=TICK_SIZES.get(symbol.product_code.upper()),
         )
 
 
-@dataclass(kw_only=True)
+@dataclass(kw_only=True, slots=True)
 class ContinuousFuturesReferenceData(ReferenceData):
     product_code: str = field(init=False)
     offset: int = field(init=False)
     rollover_rule: RolloverRule
-    # adjustment: ContinuousFuturesAdjustment
+    adjustment: ContinuousFuturesAdjustment = ContinuousFuturesAdjustment.NONE
 
     def __post_init__(self):
         self.product_code = self.symbol.product_code
         # self.offset = int(str(self.symbol).split("-")[1])
 
 
-@dataclass(kw_only=True)
+@dataclass(kw_only=True, slots=True)
 class MarketData(Data):
     # ohlc: dict[str, pd.DataFrame]
     # other aggregations
     pass
+
+
+class LazyMarketData(MutableMapping[str, pd.DataFrame]):
+    """
+    Mapping of timeframe to DataFrame which loads each timeframe the
+    first time it is accessed and keeps it for following accesses.
+
+    If a memory budget (in bytes) is given, the least recently used
+    frames are evicted when loaded frames exceed it. Evicted frames are
+    simply loaded again on their next access. Frames set directly,
+    without a loader, are never evicted.
+    """
+
+    def __init__(
+        self,
+        loaders: dict[str, Callable[[], pd.DataFrame]],
+        memory_budget: int | None = None,
+    ):
+        self._loaders = dict(loaders)
+        self._frames: OrderedDict[str, pd.DataFrame] = OrderedDict()
+        self.memory_budget = memory_budget
+
+    # properties -------------------------------------------------------
+
+    @property
+    def loaded(self) -> list[str]:
+        """Timeframes currently held in memory, least recently used first."""
+        return list(self._frames)
+
+    @property
+    def nbytes(self) -> int:
+        """Memory used by loaded frames (object columns count as pointers)."""
+        return sum(_frame_nbytes(df) for df in self._frames.values())
+
+    # ------------------------------------------------------------------
+    # methods
+    # ------------------------------------------------------------------
+
+    def is_loaded(self, timeframe: str) -> bool:
+        return timeframe in self._frames
+
+    def evict(self, timeframe: str) -> None:
+        """Drops a loaded frame, keeping its loader."""
+        if timeframe in self._loaders:
+            self._frames.pop(timeframe, None)
+
+    # private methods --------------------------------------------------
+
+    def _enforce_budget(self, keep: str) -> None:
+        if self.memory_budget is None:
+            return
+        sizes = {tf: _frame_nbytes(df) for tf, df in self._frames.items()}
+        total = sum(sizes.values())
+        for tf in list(self._frames):
+            if total <= self.memory_budget:
+                break
+            if tf != keep and tf in self._loaders:
+                del self._frames[tf]
+                total -= sizes[tf]
+
+    # ------------------------------------------------------------------
+    # magic methods
+    # ------------------------------------------------------------------
+
+    def __getitem__(self, timeframe: str) -> pd.DataFrame:
+        if timeframe in self._frames:
+            self._frames.move_to_end(timeframe)
+            return self._frames[timeframe]
+
+        # raises KeyError for unknown timeframes, like a dict
+        df = self._loaders[timeframe]()
+        self._frames[timeframe] = df
+        self._enforce_budget(keep=timeframe)
+        return df
+
+    def __setitem__(self, timeframe: str, df: pd.DataFrame) -> None:
+        self._loaders.pop(timeframe, None)
+        self._frames[timeframe] = df
+        self._frames.move_to_end(timeframe)
+
+    def __delitem__(self, timeframe: str) -> None:
+        if timeframe not in self:
+            raise KeyError(timeframe)
+        self._loaders.pop(timeframe, None)
+        self._frames.pop(timeframe, None)
+
+    def __contains__(self, timeframe: object) -> bool:
+        return timeframe in self._loaders or timeframe in self._frames
+
+    def __iter__(self) -> Iterator[str]:
+        yield from self._loaders
+        yield from (tf for tf in self._frames if tf not in self._loaders)
+
+    def __len__(self) -> int:
+        return len(self._loaders.keys() | self._frames.keys())
+
+    def __repr__(self) -> str:
+        return f"LazyMarketData(timeframes={list(self)}, loaded={self.loaded})"
+
+
+def _frame_nbytes(df: pd.DataFrame) -> int:
+    return int(df.memory_usage(index=True, deep=False).sum())
+
+
+# ----------------------------------------------------------------------
+# Universe
+# ----------------------------------------------------------------------
+
+PANEL_FIELDS = ("open", "high", "low", "close", "volume")
+
+
+class Universe(Sequence["Instrument"]):
+    """
+    Ordered instruments, identified by their position as in the engines,
+    with their market data aligned on a shared time axis.
+
+    panel stacks a timeframe into a dense instrument x timestamp x field
+    float64 array. The time axis is the union of the indexes of every
+    instrument (int64 UTC nanoseconds), built by a single merge, with NaN
+    where an instrument has no bar: cross-sectional computations (rank,
+    correlation) are numpy operations along the instrument axis instead
+    of loops over DataFrames.
+
+    Panels are kept until clear is called. They take N x T x F x 8
+    bytes, start and end restrict them to a time window.
+    """
+
+    def __init__(self, instruments: Iterable["Instrument"]):
+        self._instruments = list(instruments)
+        # time axis and positions of every instrument on it
+        self._axes: dict[tuple, tuple] = {}
+        self._panels: dict[tuple, np.ndarray] = {}
+
+    # properties -------------------------------------------------------
+
+    @property
+    def instruments(self) -> list["Instrument"]:
+        return list(self._instruments)
+
+    @property
+    def symbols(self) -> list[Symbol]:
+        return [instrument.symbol for instrument in self._instruments]
+
+    # ------------------------------------------------------------------
+    # methods
+    # ------------------------------------------------------------------
+
+    def timestamps(
+        self,
+        timeframe: str,
+        start: pd.Timestamp | None = None,
+        end: pd.Timestamp | None = None,
+    ) -> np.ndarray:
+        """Time axis of the panels, int64 UTC nanoseconds."""
+        return self._axis(timeframe, start, end)[0]
+
+    def index(
+        self,
+        timeframe: str,
+        start: pd.Timestamp | None = None,
+        end: pd.Timestamp | None = None,
+        tz: str = STANDARD_TIMEZONE,
+    ) -> pd.DatetimeIndex:
+        """Time axis of the panels as a DatetimeIndex in tz."""
+        timestamps = self.timestamps(timeframe, start, end)
+        index = pd.DatetimeIndex(timestamps.view("M8[ns]"), name="timestamp")
+        return index.tz_localize("UTC").tz_convert(tz)
+
+    def panel(
+        self,
+        timeframe: str,
+        fields: tuple[str, ...] = PANEL_FIELDS,
+        start: pd.Timestamp | None = None,
+        end: pd.Timestamp | None = None,
+    ) -> np.ndarray:
+        """Instrument x timestamp x field array of a timeframe, NaN where
+        an instrument has no bar (or no such column)."""
+        key = (timeframe, tuple(fields), start, end)
+        if key not in self._panels:
+            timestamps, windows, positions = self._axis(timeframe, start, end)
+            out = np.full(
+                (len(self._instruments), len(timestamps), len(fields)), np.nan
+            )
+            for n, instrument in enumerate(self._instruments):
+                data = instrument.market_data[timeframe].iloc[windows[n]]
+                for k, name in enumerate(fields):
+                    if name in data:
+                        out[n, positions[n], k] = data[name].to_numpy(
+                            dtype=np.float64, na_value=np.nan
+                        )
+            self._panels[key] = out
+        return self._panels[key]
+
+    def field(
+        self,
+        name: str,
+        timeframe: str,
+        start: pd.Timestamp | None = None,
+        end: pd.Timestamp | None = None,
+    ) -> np.ndarray:
+        """Instrument x timestamp array of a field, a view on a panel."""
+        if name in PANEL_FIELDS:
+            return self.panel(timeframe, PANEL_FIELDS, start, end)[
+                :, :, PANEL_FIELDS.index(name)
+            ]
+        return self.panel(timeframe, (name,), start, end)[:, :, 0]
+
+    def returns(
+        self,
+        timeframe: str,
+        field: str = "close",
+        start: pd.Timestamp | None = None,
+        end: pd.Timestamp | None = None,
+    ) -> np.ndarray:
+        """Simple returns between consecutive timestamps of the axis, NaN
+        if either bar is missing."""
+        values = self.field(field, timeframe, start, end)
+        out = np.full(values.shape, np.nan)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            np.divide(values[:, 1:], values[:, :-1], out=out[:, 1:])
+        out[:, 1:] -= 1.0
+        return out
+
+    def rank(
+        self,
+        timeframe: str,
+        field: str = "close",
+        start: pd.Timestamp | None = None,
+        end: pd.Timestamp | None = None,
+    ) -> np.ndarray:
+        """Cross-sectional rank (0 for the lowest) of every instrument at
+        every timestamp among the instruments with a value, NaN for the
+        others. Ties are ranked by position in the universe."""
+        return cross_sectional_rank(self.field(field, timeframe, start, end))
+
+    def correlation(
+        self,
+        timeframe: str,
+        field: str = "close",
+        start: pd.Timestamp | None = None,
+        end: pd.Timestamp | None = None,
+        returns: bool = True,
+        min_periods: int = 2,
+    ) -> np.ndarray:
+        """Instrument x instrument correlation of returns (or of the
+        field itself), each pair over the timestamps where both have a
+        value."""
+        values = (
+            self.returns(timeframe, field, start, end)
+            if returns
+            else self.field(field, timeframe, start, end)
+        )
+        return pairwise_correlation(values, min_periods)
+
+    def clear(self) -> None:
+        """Drops the panels and time axes kept so far."""
+        self._axes.clear()
+        self._panels.clear()
+
+    # private methods --------------------------------------------------
+
+    def _axis(
+        self,
+        timeframe: str,
+        start: pd.Timestamp | None,
+        end: pd.Timestamp | None,
+    ) -> tuple[np.ndarray, list[slice], list[np.ndarray]]:
+        key = (timeframe, start, end)
+        if key not in self._axes:
+            windows, timestamps = [], []
+            for instrument in self._instruments:
+                index = instrument.market_data[timeframe].index
+                if not (index.is_monotonic_increasing and index.is_unique):
+                    raise ValueError(
+                        f"{timeframe} index of {instrument.symbol} must be"
+                        " strictly increasing."
+                    )
+                ns = index_to_ns(index)
+                window = slice(*search_range(ns, start, end))
+                windows.append(window)
+                timestamps.append(ns[window])
+            axis = union_timestamps(timestamps)
+            positions = [np.searchsorted(axis, ns) for ns in timestamps]
+            self._axes[key] = axis, windows, positions
+        return self._axes[key]
+
+    # ------------------------------------------------------------------
+    # magic methods
+    # ------------------------------------------------------------------
+
+    def __getitem__(self, n):
+        return self._instruments[n]
+
+    def __len__(self) -> int:
+        return len(self._instruments)
+
+    def __repr__(self) -> str:
+        return f"Universe({len(self)} instruments)"
+
+
+def cross_sectional_rank(values: np.ndarray) -> np.ndarray:
+    """Rank along the first axis of a 2-D array, see Universe.rank."""
+    # NaN are sorted last, so valid values get ranks 0 to k - 1
+    order = np.argsort(values, axis=0, kind="stable")
+    ranks = np.empty(values.shape)
+    positions = np.arange(len(values), dtype=np.float64)[:, None]
+    np.put_along_axis(ranks, order, np.broadcast_to(positions, order.shape), axis=0)
+    ranks[np.isnan(values)] = np.nan
+    return ranks
+
+
+def pairwise_correlation(values: np.ndarray, min_periods: int = 2) -> np.ndarray:
+    """Correlation of the rows of a 2-D array, each pair over the columns
+    where both are finite (NaN below min_periods), computed with matrix
+    products instead of a loop over pairs."""
+    present = np.isfinite(values)
+    # correlation does not change by shifting a row, centering it limits
+    # the cancellation in the sums below
+    x = np.where(present, values, 0.0)
+    mask = present.astype(np.float64)
+    counts = np.maximum(mask.sum(axis=1), 1.0)
+    x -= (x.sum(axis=1) / counts)[:, None]
+    x *= mask
+
+    n = mask @ mask.T
+    # sums of row i over the columns where row j is present
+    sum_x = x @ mask.T
+    sum_xx = (x * x) @ mask.T
+    sum_xy = x @ x.T
+    with np.errstate(divide="ignore", invalid="ignore"):
+        cov = sum_xy - sum_x * sum_x.T / n
+        var_x = sum_xx - sum_x**2 / n
+        out = cov / np.sqrt(var_x * var_x.T)
+    out[n < min_periods] = np.nan
+    return np.clip(out, -1.0, 1.0, out=out)
@@ -63,6 +63,31 @@ class RolloverRule(StrEnum):
     OPEN_INTEREST = auto()
 
 
+@unique
+class ExpirationRule(StrEnum):
+    """Families of CME expiration rules: expiration day in the contract
+    month and last trade date relative to it."""
+
+    CURRENCY = auto()  # 3rd Wednesday, last trade 2 business days before
+    CAD = auto()  # 3rd Wednesday, last trade the business day before
+    EQUITY_INDEX = auto()  # 3rd Friday
+    TREASURY = auto()  # last business day, last trade 7 business days before
+    # last trade on the last business day, expiration (last delivery) on
+    # the 3rd business day of the next month, e.g. 2 and 5-year notes
+    SHORT_TREASURY = auto()
+    CRUDE_OIL = auto()  # 3 business days before the 25th of previous month
+    NATURAL_GAS = auto()  # 3 business days before the 1st
+    METALS = auto()  # 3rd last business day
+    GRAINS = auto()  # business day before the 15th
+
+
+@unique
+class ContinuousFuturesAdjustment(StrEnum):
+    NONE = auto()
+    DIFFERENCE = auto()  # a.k.a. Panama: roll gaps removed adding offsets
+    RATIO = auto()  # roll gaps removed multiplying by price ratios
+
+
 # print(RolloverRule.OPEN_INTEREST.value)
 
 # @unique
@@ -77,6 +102,20 @@ class MarketDataType(IntEnum):
     TICK = auto()
 
 
+@unique
+class TickSide(IntEnum):
+    SELL = -1  # aggressor sold at the bid
+    NONE = 0  # unknown
+    BUY = 1  # aggressor bought at the ask
+
+
+@unique
+class BarType(StrEnum):
+    TIME = auto()  # a bar every fixed time interval
+    VOLUME = auto()  # a bar every fixed traded size
+    TICK = auto()  # a bar every fixed number of ticks
+
+
 # position -------------------------------------------------------------
 
 
@@ -1,19 +1,30 @@
 import re
 from abc import abstractmethod
+from collections.abc import Mapping
+from functools import partial
 from typing import Self
 
+import numpy as np
 import pandas as pd
 from numpy import roll
+from pandas.api.types import union_categoricals
 
 from kaos.analysis.time_series import is_strictly_increasing
 from kaos.data.data import (
     ContinuousFuturesReferenceData,
     FuturesReferenceData,
+    LazyMarketData,
     ReferenceData,
 )
-from kaos.data.enums import AssetClass, DataProvider, RolloverRule
+from kaos.data.enums import (
+    AssetClass,
+    ContinuousFuturesAdjustment,
+    DataProvider,
+    RolloverRule,
+)
 from kaos.data.symbol import Symbol
-from kaos.time_utils import MONTH_CODES, STANDARD_TIMEZONE, month_of_year
+
+PRICE_COLUMNS = ["open", "high", "low", "close"]
 
 # ----------------------------------------------------------------------
 # instruments classes
@@ -25,7 +36,7 @@ class Instrument:
     def __init__(
         self,
         reference_data: ReferenceData,
-        market_data: dict[str, pd.DataFrame],
+        market_data: Mapping[str, pd.DataFrame],
     ):
         self.reference_data = reference_data
         self.market_data = market_data
@@ -40,6 +51,19 @@ class Instrument:
         """Source of the instrument's market data."""
         return self.reference_data.provider
 
+    def memory_usage(self) -> int:
+        """Bytes used by market data. Timeframes of a LazyMarketData
+        that are not loaded yet are not counted."""
+        timeframes = (
+            self.market_data.loaded
+            if isinstance(self.market_data, LazyMarketData)
+            else list(self.market_data)
+        )
+        return sum(
+            int(self.market_data[tf].memory_usage(index=True, deep=True).sum())
+            for tf in timeframes
+        )
+
 
 # FuturesContract ------------------------------------------------------
 
@@ -49,14 +73,19 @@ class FuturesContract(Instrument):
     def __init__(
         self,
         reference_data: FuturesReferenceData,
-        market_data: dict[str, pd.DataFrame],
+        market_data: Mapping[str, pd.DataFrame],
     ):
-        """If reference data does not provide activation and expiration dates,
-        the first and last date of the index will be used instead.
+        """If reference data does not provide the expiration date, the
+        last date of the daily index is used. Without an activation date
+        (e.g. reference data from the expiration calendar), the first
+        date of the daily index is used, read on first access of
+        activation so lazy daily data is not loaded here. The last trade
+        date defaults to the expiration.
 
         Args:
             reference_data (FuturesReferenceData): _description_
-            market_data (dict[str, pd.DataFrame]): _description_
+            market_data (Mapping[str, pd.DataFrame]): a dict or a
+                LazyMarketData, loading timeframes on first access.
         """
         super().__init__(reference_data, market_data)
 
@@ -66,12 +95,13 @@ class FuturesContract(Instrument):
         # of the index will be used instead
         # if not isinstance(self.reference_data, FuturesReferenceData):
         #     raise ValueError()
-        if "D" not in market_data:
-            raise KeyError("Daily timeframe is currently required.")
-        if self.activation is None:
-            self.reference_data.activation = market_data["D"].index[0]
         if self.expiration is None:
+            # daily data is only needed (and loaded) without expiration
+            if "D" not in market_data:
+                raise KeyError("Daily timeframe is required without expiration.")
             self.reference_data.expiration = market_data["D"].index[-1]
+        if self.last_trade is None:
+            self.reference_data.last_trade = self.expiration
 
     # ------------------------------------------------------------------
     # properties
@@ -99,7 +129,12 @@ class FuturesContract(Instrument):
 
     @property
     def activation(self) -> pd.Timestamp | None:
-        """Activation date of the instrument."""
+        """Activation date of the instrument, the first date of the daily
+        index if reference data does not provide it."""
+        if self.reference_data.activation is None and "D" in self.market_data:
+            daily_index = self.market_data["D"].index
+            if len(daily_index):
+                self.reference_data.activation = daily_index[0]
         return self.reference_data.activation
 
     @property
@@ -107,33 +142,16 @@ class FuturesContract(Instrument):
         """Expiration date of the instrument."""
         return self.reference_data.expiration
 
+    @property
+    def last_trade(self) -> pd.Timestamp | None:
+        """Last trade date of the instrument, contracts roll on it."""
+        return self.reference_data.last_trade
+
     # @property
     # def ohlc(self) -> dict[str, pd.DataFrame]:
     #     """OHLC data of the instrument. It may include volume and open interest."""
     #     return self.market_data.ohlc
 
-    # ------------------------------------------------------------------
-    # methods
-    # ------------------------------------------------------------------
-
-    def _get_expiration(self, year: str) -> pd.Timestamp:
-        # NOTE some products are different, ex: CAD # https://www.cmegroup.com/rulebook/CME/III/250/252/252.pdf
-        # TODO validate expiry using df'last Index
-        """Given expiry year and month code, returns contract's
-        expiration date based on CME's criteria."""
-
-        # retrieve expiry year and month as integers
-        year_num = int(year)  # TODO handle 2-digit year
-        month_num = month_of_year(self.month_code)
-
-        # match self.asset_class:
-        #     case Currencies:
-        # third wed of contract month
-        first_day = pd.Timestamp(
-            year=year_num, month=month_num, day=1, tz=STANDARD_TIMEZONE
-        )
-        pass
-
     # ------------------------------------------------------------------
     # magic methods
     # ------------------------------------------------------------------
@@ -148,9 +166,34 @@ class ContinuousFuturesContract(Instrument):
         self,
         reference_data: ContinuousFuturesReferenceData,
         # NOTE dovrei avere contracts cokme parametro?
-        market_data: dict[str, pd.DataFrame],
+        market_data: Mapping[str, pd.DataFrame],
+        roll_dates: list[pd.Timestamp] | None = None,
+        adjustments: np.ndarray | None = None,
+        contracts: list[FuturesContract] | None = None,
     ):
+        """market_data is the unadjusted stitched data. With a
+        back-adjustment, market_data becomes an adjusted view computed
+        on first access of each timeframe, while unadjusted keeps
+        referencing the given frames.
+
+        Args:
+            roll_dates (list[pd.Timestamp]): roll date of each contract
+                but the last.
+            adjustments (np.ndarray): cumulative offset (DIFFERENCE) or
+                multiplier (RATIO) of each segment between roll dates.
+            contracts (list[FuturesContract]): sorted individual
+                contracts, required by update.
+        """
         super().__init__(reference_data, market_data)
+        self.roll_dates = [] if roll_dates is None else roll_dates
+        self.contracts = [] if contracts is None else contracts
+        self.unadjusted = market_data
+        self.adjustments = adjustments
+
+        if self.adjustment != ContinuousFuturesAdjustment.NONE:
+            if adjustments is None or len(adjustments) != len(self.roll_dates) + 1:
+                raise ValueError("One adjustment per roll segment is required.")
+            self._set_adjusted_view()
 
     # ------------------------------------------------------------------
     # properties
@@ -166,13 +209,101 @@ class ContinuousFuturesContract(Instrument):
         """Product code of the instrument (e.g. 6E, ES, ZN)."""
         return self.reference_data.product_code
 
+    @property
+    def adjustment(self) -> ContinuousFuturesAdjustment:
+        """Back-adjustment applied to market data (e.g. NONE, RATIO)."""
+        return self.reference_data.adjustment
+
     # ------------------------------------------------------------------
     # methods
     # ------------------------------------------------------------------
 
+    def _adjusted(self, timeframe: str) -> pd.DataFrame:
+        """Applies the segment adjustments to the prices of a timeframe,
+        repeating each one over the rows of its segment."""
+        df = self.unadjusted[timeframe]
+        # segments are contiguous, delimited by the (non decreasing) roll dates
+        bounds = df.index.searchsorted(pd.Index(self.roll_dates).to_series().cummax())
+        lengths = np.diff(np.concatenate([[0], bounds, [len(df)]]))
+        factors = np.repeat(self.adjustments, lengths)[:, np.newaxis]
+
+        columns = [col for col in PRICE_COLUMNS if col in df]
+        prices = df[columns].to_numpy()
+        match self.adjustment:
+            case ContinuousFuturesAdjustment.DIFFERENCE:
+                adjusted = prices + factors
+            case ContinuousFuturesAdjustment.RATIO:
+                adjusted = prices * factors
+
+        out = df.copy(deep=False)
+        out[columns] = adjusted.astype(prices.dtype, copy=False)
+        return out
+
+    def _set_adjusted_view(self) -> None:
+        self.market_data = LazyMarketData(
+            {tf: partial(self._adjusted, tf) for tf in self.unadjusted}
+        )
+
+    @classmethod
+    def _roll_gaps(
+        cls,
+        contracts: list[FuturesContract],
+        roll_dates: list[pd.Timestamp],
+        adjustment: ContinuousFuturesAdjustment,
+        timeframe: str = "D",
+    ) -> np.ndarray:
+        """Computes the roll gap once per roll date, comparing the closes
+        of the two contracts on the last bar before the roll: a
+        difference for DIFFERENCE, a ratio for RATIO."""
+        old_closes = np.empty(len(roll_dates))
+        new_closes = np.empty(len(roll_dates))
+
+        for i, roll_date in enumerate(roll_dates):
+            curr_df = contracts[i].market_data[timeframe]
+            next_df = contracts[i + 1].market_data[timeframe]
+            pos = curr_df.index.searchsorted(roll_date, "left") - 1
+            if pos < 0:
+                raise ValueError(f"No {contracts[i].symbol} data before {roll_date}.")
+            ts = curr_df.index[pos]
+            # last price of the next contract at the same time
+            next_pos = max(next_df.index.searchsorted(ts, "right") - 1, 0)
+            old_closes[i] = curr_df["close"].iloc[pos]
+            new_closes[i] = next_df["close"].iloc[next_pos]
+
+        match adjustment:
+            case ContinuousFuturesAdjustment.DIFFERENCE:
+                return new_closes - old_closes
+            case ContinuousFuturesAdjustment.RATIO:
+                return new_closes / old_closes
+            case _:
+                raise ValueError(f"Unhandled adjustment: {adjustment}")
+
+    @staticmethod
+    def _accumulate_gaps(
+        gaps: np.ndarray, adjustment: ContinuousFuturesAdjustment
+    ) -> np.ndarray:
+        """Accumulates roll gaps backwards: each segment is adjusted by
+        the gaps of all the following rolls, the last one is unchanged."""
+        match adjustment:
+            case ContinuousFuturesAdjustment.DIFFERENCE:
+                return np.cumsum(np.append(gaps, 0.0)[::-1])[::-1]
+            case ContinuousFuturesAdjustment.RATIO:
+                return np.cumprod(np.append(gaps, 1.0)[::-1])[::-1]
+            case _:
+                raise ValueError(f"Unhandled adjustment: {adjustment}")
+
+    def _gaps_from_adjustments(self) -> np.ndarray:
+        match self.adjustment:
+            case ContinuousFuturesAdjustment.DIFFERENCE:
+                return self.adjustments[:-1] - self.adjustments[1:]
+            case ContinuousFuturesAdjustment.RATIO:
+                return self.adjustments[:-1] / self.adjustments[1:]
+            case _:
+                raise ValueError(f"Unhandled adjustment: {self.adjustment}")
+
     @classmethod
     def _roll_dates(
-        contracts: list[FuturesContract], rollover_rule: RolloverRule
+        cls, contracts: list[FuturesContract], rollover_rule: RolloverRule
     ) -> list[pd.Timestamp]:
         roll_dates: list[pd.Timestamp] = []
 
@@ -183,9 +314,10 @@ class ContinuousFuturesContract(Instrument):
 
             match rollover_rule:
                 case RolloverRule.EXPIRY:
-                    end = curr_c.expiration
+                    end = curr_c.last_trade
                 case RolloverRule.OPEN_INTEREST:
-                    end = _ts_contract_exceeds_other(curr_c, next_c)
+                    # all pairs at once, see roll_schedule
+                    return roll_schedule(contracts)["roll_date"].tolist()
                 case _:
                     raise ValueError("This is not a valid rule.")
 
@@ -195,28 +327,50 @@ class ContinuousFuturesContract(Instrument):
 
     @classmethod
     def _concat_individuals(
-        contracts: list[FuturesContract], roll_dates: list[pd.Timestamp]
+        cls,
+        contracts: list[FuturesContract],
+        roll_dates: list[pd.Timestamp],
+        timeframe: str,
+        after: pd.Timestamp | None = None,
+        include_after: bool = True,
     ) -> pd.DataFrame:
-        slices = []
-
-        contracts.insert(0, contracts[0].activation)
-        # TODO do it two times, one for daily and the other for 1min
-        for i in range(len(roll_dates) - 1):
-            start = roll_dates[i]
-            end = roll_dates[i + 1]
-            df = contracts[i].market_data["D"]
-
-            slice_c = df[(df.index >= start) & (df.index < end)]
-            slices.append(slice_c)
-            start = end
-        slices.append(contracts[-1].market_data["D"][start:])
-
-        return pd.concat(slices)
+        """Each contract contributes its bars in [previous roll date, its
+        roll date), the last one until the end of its data. Slices are
+        located by binary search on the sorted indexes.
+
+        If after is given, only bars from it onwards are built (excluding
+        it if include_after is False), without touching contracts whose
+        segment ends before it."""
+        slices: list[pd.DataFrame] = []
+        start: pd.Timestamp | None = None
+        side = "left" if include_after else "right"
+
+        for i, contract in enumerate(contracts):
+            end = roll_dates[i] if i < len(roll_dates) else None
+            if after is None or end is None or end > after:
+                df = contract.market_data[timeframe]
+                lo = 0 if start is None else df.index.searchsorted(start, "left")
+                if after is not None:
+                    lo = max(lo, df.index.searchsorted(after, side))
+                hi = len(df) if end is None else df.index.searchsorted(end, "left")
+                slices.append(df.iloc[lo:max(lo, hi)])
+
+            # a roll date before the previous one produces an empty slice
+            if end is not None:
+                start = end if start is None else max(start, end)
+
+        return _concat_frames(slices)
 
     @classmethod
     def from_individuals(
-        cls, contracts: list[FuturesContract], rollover_rule: RolloverRule
+        cls,
+        contracts: list[FuturesContract],
+        rollover_rule: RolloverRule,
+        adjustment: ContinuousFuturesAdjustment = ContinuousFuturesAdjustment.NONE,
     ) -> Self:
+        """Builds a continuous contract, stitching every timeframe
+        available in all the given contracts. Back-adjustment factors are
+        computed on the daily timeframe and applied to all of them."""
         sort_contracts(contracts)
         # FIXME hard-coded -1-{rollover_rule.value}
         sym = Symbol(f"{contracts[0].product_code}-1-{rollover_rule.value}")
@@ -225,19 +379,119 @@ class ContinuousFuturesContract(Instrument):
             provider=contracts[0].provider,
             asset_class=contracts[0].asset_class,
             rollover_rule=rollover_rule,
+            adjustment=adjustment,
         )
-        # market_data = {tf: pd.DataFrame() for tf in contracts[0].market_data.keys()}
         roll_dates: list[pd.Timestamp] = cls._roll_dates(contracts, rollover_rule)
-        concatenated: pd.DataFrame = cls._concat_individuals(contracts, roll_dates)
-        market_data = ...
+        timeframes = [
+            tf
+            for tf in contracts[0].market_data
+            if all(tf in c.market_data for c in contracts[1:])
+        ]
+        market_data = {
+            tf: cls._concat_individuals(contracts, roll_dates, tf) for tf in timeframes
+        }
 
         # TODO move it to tests
-        if not is_strictly_increasing(market_data["D"].index):
-            raise ValueError(
-                "Continuous index is not strictly increasing."
-                "Something may be wrong in the calculation."
+        for tf, df in market_data.items():
+            if not is_strictly_increasing(df.index):
+                raise ValueError(
+                    f"Continuous {tf} index is not strictly increasing."
+                    "Something may be wrong in the calculation."
+                )
+        adjustments = (
+            None
+            if adjustment == ContinuousFuturesAdjustment.NONE
+            else cls._accumulate_gaps(
+                cls._roll_gaps(contracts, roll_dates, adjustment), adjustment
+            )
+        )
+        return cls(ref, market_data, roll_dates, adjustments, contracts)
+
+    def update(self, contracts: list[FuturesContract]) -> None:
+        """
+        Appends new data without rebuilding the whole series.
+
+        contracts are new versions of the individual contracts (matched
+        by symbol) or newly listed ones, holding at least the bars to
+        append: e.g. the active contract and the next one, reloaded with
+        the last day. Only roll dates involving them are recomputed. Bars
+        are rebuilt from the first roll date that changed, otherwise only
+        the bars after the current end are appended. Back-adjustment
+        gaps are computed only for new or changed rolls and for the rolls
+        of an updated contract.
+        """
+        if not contracts:
+            return
+        positions = {c.symbol.value: i for i, c in enumerate(self.contracts)}
+        for contract in contracts:
+            if contract.symbol.value in positions:
+                self.contracts[positions[contract.symbol.value]] = contract
+            else:
+                self.contracts.append(contract)
+        sort_contracts(self.contracts)
+
+        # rolls (i, i+1) with an updated contract may change
+        first = min(
+            i for i, c in enumerate(self.contracts) if any(c is u for u in contracts)
+        )
+        k = max(first - 1, 0)
+        rule = self.reference_data.rollover_rule
+        roll_dates = self.roll_dates[:k] + self._roll_dates(self.contracts[k:], rule)
+
+        # first roll that differs from the current ones
+        changed = next(
+            (
+                i
+                for i, (old, new) in enumerate(zip(self.roll_dates, roll_dates))
+                if old != new
+            ),
+            min(len(self.roll_dates), len(roll_dates)),
+        )
+        cut: pd.Timestamp | None = None
+        if changed < len(self.roll_dates):
+            cut = min(self.roll_dates[changed], roll_dates[changed])
+        elif changed < len(roll_dates):
+            cut = roll_dates[changed]
+
+        unadjusted: dict[str, pd.DataFrame] = {}
+        for tf, df in self.unadjusted.items():
+            # rebuilds from cut if it falls inside current data, else appends
+            if cut is not None and len(df) and cut <= df.index[-1]:
+                after, include, keep = cut, True, df.index.searchsorted(cut, "left")
+            elif len(df):
+                after, include, keep = df.index[-1], False, len(df)
+            else:
+                after, include, keep = None, True, 0
+            tail = self._concat_individuals(
+                self.contracts, roll_dates, tf, after, include
             )
-        return cls(ref, market_data)
+            if not is_strictly_increasing(tail.index) or (
+                keep and len(tail) and tail.index[0] <= df.index[keep - 1]
+            ):
+                raise ValueError(f"Appended {tf} index is not strictly increasing.")
+            unadjusted[tf] = _concat_frames([df.iloc[:keep], tail])
+
+        if self.adjustment != ContinuousFuturesAdjustment.NONE:
+            # a gap also changes with new bars of either contract of its
+            # roll, e.g. EXPIRY roll dates are known before the data
+            updated = [any(c is u for u in contracts) for c in self.contracts]
+            gaps = np.empty(len(roll_dates))
+            gaps[:changed] = self._gaps_from_adjustments()[:changed]
+            for i in range(len(roll_dates)):
+                if i >= changed or updated[i] or updated[i + 1]:
+                    gaps[i : i + 1] = self._roll_gaps(
+                        self.contracts[i : i + 2],
+                        roll_dates[i : i + 1],
+                        self.adjustment,
+                    )
+            self.adjustments = self._accumulate_gaps(gaps, self.adjustment)
+
+        self.roll_dates = roll_dates
+        self.unadjusted = unadjusted
+        if self.adjustment == ContinuousFuturesAdjustment.NONE:
+            self.market_data = unadjusted
+        else:
+            self._set_adjusted_view()
 
 
 # class FuturesContracts:
@@ -270,31 +524,108 @@ def _ts_contract_exceeds_other(
     days_to_expiration: int = 20,
     occurrence: int = 2,  # avoids lookahead bias
 ) -> pd.Timestamp:
-    curr_df: pd.DataFrame = curr_contract.market_data["D"]
-    df: pd.DataFrame = next_contract.market_data["D"]
+    schedule = roll_schedule(
+        [curr_contract, next_contract],
+        column=column,
+        days_to_expiration=days_to_expiration,
+        occurrence=occurrence,
+        fallback=None,
+    )
+    return schedule["roll_date"].iloc[0]
+
+
+def roll_schedule(
+    contracts: list[FuturesContract],
+    column: str = "open_interest",
+    days_to_expiration: int = 20,
+    occurrence: int = 2,  # avoids lookahead bias
+    fallback: RolloverRule | None = RolloverRule.EXPIRY,
+) -> pd.DataFrame:
+    """
+    Finds the roll date of every adjacent pair of a sorted chain of
+    contracts: the date of the nth occurrence (occurrence) in which the
+    daily column of the next contract exceeds the current one, looking
+    only at the last days_to_expiration days both contracts have data.
+
+    The columns of the whole chain are aligned into a single matrix, so
+    all pairs are searched with one vectorized pass. Pairs without
+    enough crossovers roll on the fallback rule (only EXPIRY for now),
+    or raise ValueError if fallback is None.
+
+    Returns a DataFrame with a row per pair: symbol, next_symbol,
+    roll_date and rule (the rule which determined the roll date).
+    """
+    n_pairs = max(len(contracts) - 1, 0)
+    if fallback not in (None, RolloverRule.EXPIRY):
+        raise ValueError(f"Unhandled fallback rule: {fallback}")
+
+    # time x contract matrix, NaN where a contract has no data
+    columns = [c.market_data["D"][column] for c in contracts]
+    aligned = pd.concat(columns, axis=1, keys=range(len(contracts)))
+    values = aligned.to_numpy(dtype=np.float64)
+    curr, next_ = values[:, :-1], values[:, 1:]
+
+    both = ~np.isnan(curr) & ~np.isnan(next_)
+    # rows at or after each row in which both contracts have data
+    remaining = np.cumsum(both[::-1], axis=0)[::-1]
+    in_window = both & (remaining <= days_to_expiration)
+
+    crossover = in_window & (next_ > curr)
+    nth = crossover & (np.cumsum(crossover, axis=0) == occurrence)
+    found = nth.any(axis=0)
+    rows = nth.argmax(axis=0)
+
+    roll_dates: list[pd.Timestamp] = []
+    rules: list[RolloverRule] = []
+    for i in range(n_pairs):
+        if found[i]:
+            roll_dates.append(aligned.index[rows[i]])
+            rules.append(RolloverRule.OPEN_INTEREST)
+        elif fallback == RolloverRule.EXPIRY:
+            roll_dates.append(contracts[i].last_trade)
+            rules.append(RolloverRule.EXPIRY)
+        else:
+            raise ValueError(
+                f"Crossover {occurrence} of {column} between {contracts[i].symbol}"
+                f" and {contracts[i + 1].symbol} not found."
+            )
+
+    return pd.DataFrame(
+        {
+            "symbol": [c.symbol for c in contracts[:-1]],
+            "next_symbol": [c.symbol for c in contracts[1:]],
+            "roll_date": roll_dates,
+            "rule": rules,
+        }
+    )
+
 
-    # get a df comparing column inside index intersection of the two contracts
-    # I take the last portion tu filter possible fakeouts
-    _curr, _next = "_curr", "_next"
-    oi_both = curr_df[[column]].join(
-        df[[column]], lsuffix=_curr, rsuffix=_next, how="inner"
-    )[-days_to_expiration:]
+def _concat_frames(frames: list[pd.DataFrame]) -> pd.DataFrame:
+    """Concatenates frames sharing the same columns, one column at a time.
+    Unlike pd.concat, categorical columns stay categorical even when
+    their categories differ (e.g. the symbol column of compact data)."""
+    columns = frames[0].columns
+    if any(not df.columns.equals(columns) for df in frames[1:]):
+        return pd.concat(frames)
 
-    crossover: pd.Series = oi_both[column + _next] > oi_both[column + _curr]
-    # TODO handle IndexError
-    start = crossover[crossover].index[occurrence - 1]
+    data = {}
+    for col in columns:
+        parts = [df[col] for df in frames]
+        if all(isinstance(part.dtype, pd.CategoricalDtype) for part in parts):
+            data[col] = union_categoricals(parts)
+        else:
+            data[col] = np.concatenate([part.to_numpy() for part in parts])
 
-    if not isinstance(start, pd.Timestamp):
-        raise ValueError(f"Crossover date not found. Its value is {start}")
-    return start
+    index = frames[0].index.append([df.index for df in frames[1:]])
+    return pd.DataFrame(data, index=index, columns=columns)
 
 
 def sort_contracts(contracts: list[FuturesContract]) -> None:
     """
     Sorts in-place a given list of Futures contracts based on product
-    code and expiration."""
+    code and expiration, i.e. the precomputed sort key of their symbol."""
 
-    contracts.sort(key=lambda contract: (contract.product_code, contract.expiration))
+    contracts.sort(key=lambda contract: contract.reference_data.symbol.sort_key)
 
 
 # def next_timestamp(index: pd.DatetimeIndex, ts: pd.Timestamp) -> pd.Timestamp | None:
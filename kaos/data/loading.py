@@ -1,20 +1,32 @@
+import os
 import re
+from collections.abc import Callable, Mapping
+from concurrent.futures import (
+    Executor,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    as_completed,
+)
+from functools import partial
 from pathlib import Path
 from typing import Literal
 
+import numpy as np
 import pandas as pd
 
-from kaos.data.data import FuturesReferenceData
+from kaos.data.cache import ColumnarCache
+from kaos.data.data import FuturesReferenceData, LazyMarketData
 from kaos.data.enums import DataProvider
 from kaos.data.instruments import FuturesContract, sort_contracts
+from kaos.data.manifest import Manifest
+from kaos.data.partitioned import PartitionedStore, check_parquet_engine
+from kaos.data.store import BinaryStore
 from kaos.data.symbol import Symbol
 from kaos.log_utils import get_logger
 
 # logger config
 logger = get_logger(__name__)
 # ----------------------------------------------------------------------
-# class Universe:
-#     def __init__(self, instruments: list[Instrument]):
 
 
 # TODO merge it with DataProvider, making it a class instead of an enum
@@ -44,18 +56,35 @@ class CSVPreset:
 # Catalog
 # ----------------------------------------------------------------------
 
+# rows read at a time when loading a time window without cache
+CSV_CHUNK_SIZE = 250_000
+
 "6E-M-2024.CME"
 "{product_code}-{month_code}-{year}-{multiplier}"
 
 
 class Catalog:
-    def __init__(self, directory: Path = Path("~/data").expanduser()):
+    def __init__(
+        self,
+        directory: Path = Path("~/data").expanduser(),
+        use_cache: bool = True,
+    ):
         self._directory = directory
         self._market_directory = directory / "market"
         # self._reference_directory = directory / "reference" # NOTE might not need it
         # put the reference data in the market directory? create a link to it?
         self._fundamental_directory = directory / "fundamental"
         self._raw_directory = directory / "raw"
+        self._cache_directory = directory / "cache"
+        self._cache = ColumnarCache(self._cache_directory) if use_cache else None
+        self._load_errors: dict[Symbol, Exception] = {}
+        self._binary_store = BinaryStore(directory / "binary")
+        self._market_store = PartitionedStore(self._market_directory)
+        self._manifest = Manifest(
+            directory / "manifest.csv",
+            self._raw_directory,
+            {DataProvider.FIRSTRATE: CSVPreset.FIRSTRATE},
+        )
 
     # properties -------------------------------------------------------
 
@@ -75,38 +104,94 @@ class Catalog:
     def raw_directory(self) -> Path:
         return self._raw_directory
 
+    @property
+    def cache_directory(self) -> Path:
+        return self._cache_directory
+
+    @property
+    def cache(self) -> ColumnarCache | None:
+        return self._cache
+
+    @property
+    def binary_store(self) -> BinaryStore:
+        return self._binary_store
+
+    @property
+    def market_store(self) -> PartitionedStore:
+        """Normalised data of market_directory, populated by write."""
+        return self._market_store
+
+    @property
+    def manifest(self) -> Manifest:
+        """Index of the raw files, see refresh_manifest."""
+        return self._manifest
+
+    @property
+    def load_errors(self) -> dict[Symbol, Exception]:
+        """Symbols that failed in the last get_futures_contracts call."""
+        return self._load_errors
+
     # ------------------------------------------------------------------
     # methods
     # ------------------------------------------------------------------
 
     @staticmethod
-    def get_csv(file: Path, preset: dict = {}) -> pd.DataFrame:
+    def get_csv(
+        file: Path,
+        preset: dict = {},
+        cache: ColumnarCache | None = None,
+        start: pd.Timestamp | None = None,
+        end: pd.Timestamp | None = None,
+    ) -> pd.DataFrame:
         """
         Reads a single .csv/.txt file and returns the corresponding DataFrame.
         Allows the use of a preset for ready-made settings.
 
-        For improved performance with large files, consider using polars.
+        If a cache is given, the parsed file is stored in columnar format
+        and following calls read it directly, until the file changes.
+
+        start and end (both included) restrict the rows to a time window.
+        Without cache the file is read in chunks, so that only rows
+        inside the window are kept in memory; with cache, blocks outside
+        the window are skipped. Files must be sorted by time.
         """
         if not file.exists():
             raise FileNotFoundError(f"File not found: {file}")
 
+        preset = {} if preset is None else preset
+        tz: str | None = preset.get("tz", None)
+        start, end = _localize_bound(start, tz), _localize_bound(end, tz)
+        if cache is not None:
+            cached = cache.get(file, preset, start, end)
+            if cached is not None:
+                return cached
+
         # ------------------------------------------------------------------
         # creates a copy instead of changing the original object
-        preset = {} if preset is None else preset.copy()
-        tz: str | None = preset.pop("tz", None)
-        out: pd.DataFrame = pd.read_csv(file, **preset)
+        read_kwargs = preset.copy()
+        read_kwargs.pop("tz", None)
+        windowed = start is not None or end is not None
+
+        if windowed and (cache is None or not cache.enabled):
+            return Catalog._get_csv_window(file, read_kwargs, tz, start, end)
+
+        out: pd.DataFrame = pd.read_csv(file, **read_kwargs)
 
         # localizes index if data's timezone is specified
         if tz:
             out.index = out.index.tz_localize(tz)
 
-        return out
+        if cache is not None:
+            cache.put(file, preset, out)
+        return out.loc[start:end] if windowed else out
 
     def get_csvs(
         self,
         directory: Path,
         preset: dict = {},
         pattern: re.Pattern = re.compile(r".*"),
+        start: pd.Timestamp | None = None,
+        end: pd.Timestamp | None = None,
     ) -> tuple[pd.DataFrame]:
 
         if not directory.exists():
@@ -116,7 +201,9 @@ class Catalog:
         if not files:
             print(f"No files found matching pattern: {pattern}")
 
-        return tuple(self.get_csv(file, preset) for file in files)
+        return tuple(
+            self.get_csv(file, preset, self.cache, start, end) for file in files
+        )
 
     def get_futures_contract(
         self,
@@ -124,28 +211,40 @@ class Catalog:
         provider: DataProvider,
         timeframes: list[str],
         is_raw_data: bool,
+        lazy: bool = False,
+        memory_budget: int | None = None,
+        start: pd.Timestamp | None = None,
+        end: pd.Timestamp | None = None,
+        compact: bool = False,
     ) -> FuturesContract:
         """
         Generates a FuturesContract object, allowing for multiple
         timeframes.
         Rn use 1day and 1min ad tfs
-        """
-        # select the right preset base on data provider
-        preset: CSVPreset = self._get_csv_preset_from_provider(provider)
 
-        if not is_raw_data:
-            raise NotImplementedError()
+        If lazy is True, market data is a LazyMarketData: each timeframe
+        is read the first time it is accessed, and loaded frames are
+        evicted when they exceed memory_budget bytes.
 
-        # for each tf read the corresponding csv and return a dict
-        dfs: dict[str, pd.DataFrame] = {}
-        for tf in timeframes:
-            tf_pandas, file = self._path_in_raw_data(symbol, provider, tf)
-            dfs[tf_pandas] = self.get_csv(file, preset)
-            # create symbol column, useful for continuous contracts, NOTE: consider moving this elsewhere
-            dfs[tf_pandas].insert(0, "symbol", value=(symbol))
+        start and end restrict every timeframe to a time window, see
+        get_csv.
 
-        reference_data = FuturesReferenceData.from_symbol(symbol)
-        return FuturesContract(reference_data, dfs)
+        If compact is True, frames use compact dtypes, see compact_ohlcv.
+
+        If is_raw_data is False, frames are read from the partitioned
+        store of market_directory, populated by write.
+        """
+        loaders = self._timeframe_loaders(
+            symbol, provider, timeframes, is_raw_data, start, end, compact
+        )
+        if not lazy:
+            return _load_contract(symbol, loaders)
+        # a missing file fails here rather than on first access
+        self._check_sources(symbol, loaders, is_raw_data)
+        return FuturesContract(
+            FuturesReferenceData.from_symbol(symbol),
+            LazyMarketData(loaders, memory_budget),
+        )
 
     def get_futures_contracts(
         self,
@@ -153,28 +252,240 @@ class Catalog:
         provider: DataProvider,
         timeframes: list[str],
         is_raw_data: bool,
+        max_workers: int | None = None,
+        use_processes: bool = False,
+        lazy: bool = False,
+        start: pd.Timestamp | None = None,
+        end: pd.Timestamp | None = None,
+        compact: bool = False,
     ) -> list[FuturesContract]:
-        """Rn use 1day and 1min ad tfs"""
-
-        if not is_raw_data:
-            raise NotImplementedError()
-        # logger.debug(files)
-        contracts = [
-            self.get_futures_contract(symbol, provider, timeframes, is_raw_data)
-            for symbol in symbols
-        ]
+        """
+        Loads multiple contracts and returns them sorted.
+        Rn use 1day and 1min ad tfs
+
+        With max_workers greater than 1 contracts are loaded in parallel,
+        by a thread pool or, if use_processes is True, by a process pool.
+        A symbol that fails to load does not abort the batch: the error
+        is logged and stored in load_errors.
+
+        If lazy is True, contracts load their timeframes on first access,
+        start/end restrict them to a time window and compact selects
+        compact dtypes, see get_futures_contract.
+        """
+        if lazy and use_processes:
+            raise ValueError("Lazy contracts cannot be loaded by a process pool.")
+        self._load_errors = {}
+        contracts: list[FuturesContract] = []
+        load = partial(
+            self.get_futures_contract,
+            provider=provider,
+            timeframes=timeframes,
+            is_raw_data=is_raw_data,
+            lazy=lazy,
+            start=start,
+            end=end,
+            compact=compact,
+        )
+        timeframe_loaders = partial(
+            self._timeframe_loaders,
+            provider=provider,
+            timeframes=timeframes,
+            is_raw_data=is_raw_data,
+            start=start,
+            end=end,
+            compact=compact,
+        )
+
+        if max_workers is None or max_workers <= 1 or len(symbols) <= 1:
+            for symbol in symbols:
+                try:
+                    contracts.append(load(symbol))
+                except Exception as e:
+                    self._on_load_error(symbol, e)
+        else:
+            pool: type[Executor] = (
+                ProcessPoolExecutor if use_processes else ThreadPoolExecutor
+            )
+            with pool(max_workers=min(max_workers, len(symbols))) as executor:
+                futures = {}
+                for symbol in symbols:
+                    if not use_processes:
+                        futures[executor.submit(load, symbol)] = symbol
+                        continue
+                    # workers only receive file paths and parameters, never
+                    # the catalog itself
+                    try:
+                        loaders = timeframe_loaders(symbol)
+                    except Exception as e:
+                        self._on_load_error(symbol, e)
+                        continue
+                    futures[executor.submit(_load_contract, symbol, loaders)] = symbol
+                for future in as_completed(futures):
+                    try:
+                        contracts.append(future.result())
+                    except Exception as e:
+                        self._on_load_error(futures[future], e)
+
         sort_contracts(contracts)
         return contracts
 
+    def write_binary(self, contract: FuturesContract) -> list[Path]:
+        """Writes every timeframe of a contract to the memory-mapped
+        binary store, see BinaryStore."""
+        return [
+            self.binary_store.write(contract.symbol, tf, df)
+            for tf, df in contract.market_data.items()
+        ]
+
+    def refresh_manifest(self) -> tuple[int, int]:
+        """Indexes new and changed raw files and drops removed ones, see
+        Manifest.refresh. Lookups of raw files use the manifest once it
+        is built, instead of listing directories."""
+        return self.manifest.refresh()
+
     # @staticmethod
     # get_tradingview(symbol: str, timeframe)
 
-    # TODO: should also be able to fetch data from raw and categorize it
-    def write(self):
-        pass
+    def write(
+        self,
+        provider: DataProvider = DataProvider.FIRSTRATE,
+        max_workers: int | None = None,
+    ) -> tuple[int, int]:
+        """
+        Ingests the raw files of a provider into the partitioned store of
+        market_directory, in parallel processes. Files already ingested
+        and unchanged since (by mtime and size) are skipped, so running
+        it again after an interruption resumes where it stopped.
+
+        Returns the number of files ingested and skipped. A file that
+        fails does not abort the ingest: the error is logged and stored
+        in load_errors. Raises ImportError up front if pyarrow, required
+        by the partitioned store, is not installed.
+        """
+        check_parquet_engine()
+        self.refresh_manifest()
+        preset = self._get_csv_preset_from_provider(provider)
+        ingested = self.market_store.ingested()
+        self._load_errors = {}
+        entries = self.manifest.query(provider=provider)
+        pending = [
+            entry
+            for entry in entries.itertuples()
+            if ingested.get(entry.path) != (entry.mtime, entry.size)
+        ]
+        skipped = len(entries) - len(pending)
+        if not pending:
+            return 0, skipped
+
+        done = 0
+        with ProcessPoolExecutor(
+            max_workers=min(max_workers or os.cpu_count() or 1, len(pending))
+        ) as executor:
+            futures = {
+                executor.submit(
+                    _ingest_file,
+                    self.market_store.directory,
+                    self.raw_directory / entry.path,
+                    preset,
+                    entry.symbol,
+                    pandas_timeframe(entry.timeframe),
+                ): entry
+                for entry in pending
+            }
+            for future in as_completed(futures):
+                entry = futures[future]
+                try:
+                    future.result()
+                except Exception as e:
+                    self._on_load_error(Symbol(entry.symbol), e)
+                    continue
+                # logged once written, a file is never half ingested
+                self.market_store.log(entry.path, entry.mtime, entry.size)
+                done += 1
+
+        self.market_store.compact_log()
+        logger.info(f"Ingested {done} {provider} files, {skipped} unchanged.")
+        return done, skipped
 
     # private methods --------------------------------------------------
 
+    @staticmethod
+    def _get_csv_window(
+        file: Path,
+        read_kwargs: dict,
+        tz: str | None,
+        start: pd.Timestamp | None,
+        end: pd.Timestamp | None,
+    ) -> pd.DataFrame:
+        chunks: list[pd.DataFrame] = []
+        empty: pd.DataFrame | None = None
+        with pd.read_csv(file, chunksize=CSV_CHUNK_SIZE, **read_kwargs) as reader:
+            for chunk in reader:
+                if tz:
+                    chunk.index = chunk.index.tz_localize(tz)
+                window = chunk.loc[start:end]
+                if len(window):
+                    chunks.append(window)
+                elif empty is None:
+                    # keeps columns and index type for an empty result
+                    empty = window
+                # data is sorted, following chunks are all after the window
+                if end is not None and chunk.index[-1] > end:
+                    break
+
+        if not chunks:
+            return empty if empty is not None else pd.read_csv(file, **read_kwargs)
+        return pd.concat(chunks)
+
+    def _timeframe_loaders(
+        self,
+        symbol: Symbol,
+        provider: DataProvider,
+        timeframes: list[str],
+        is_raw_data: bool,
+        start: pd.Timestamp | None = None,
+        end: pd.Timestamp | None = None,
+        compact: bool = False,
+    ) -> dict[str, partial]:
+        """Loader of every timeframe of a contract, by pandas timeframe.
+        Loaders only hold the file or store directory and read parameters,
+        they are cheap to send to worker processes."""
+        # select the right preset base on data provider
+        preset: CSVPreset = self._get_csv_preset_from_provider(provider)
+        tick_size = FuturesReferenceData.from_symbol(symbol).tick_size
+        loaders = {}
+        for tf in timeframes:
+            tf_pandas, file = self._path_in_raw_data(symbol, provider, tf)
+            loaders[tf_pandas] = partial(
+                _read_timeframe,
+                file if is_raw_data else self.market_directory,
+                symbol,
+                tf_pandas,
+                preset,
+                self.cache_directory if self.cache and self.cache.enabled else None,
+                is_raw_data,
+                start,
+                end,
+                compact,
+                tick_size,
+            )
+        return loaders
+
+    def _check_sources(
+        self, symbol: Symbol, loaders: Mapping[str, partial], is_raw_data: bool
+    ) -> None:
+        """Raises FileNotFoundError if the file (or store partitions) of a
+        timeframe loader is missing."""
+        for tf, load in loaders.items():
+            if is_raw_data and not load.args[0].exists():
+                raise FileNotFoundError(f"File not found: {load.args[0]}")
+            if not is_raw_data and not self.market_store.exists(symbol, tf):
+                raise FileNotFoundError(f"{symbol} {tf} not in {self.market_directory}")
+
+    def _on_load_error(self, symbol: Symbol, error: Exception) -> None:
+        logger.error(f"Failed to load {symbol}: {error!r}")
+        self._load_errors[symbol] = error
+
     # def _get_timeframes(self, timeframes: list[str]) -> dict[str, pd.DataFrame]:
     @staticmethod
     def _get_csv_preset_from_provider(provider: DataProvider) -> CSVPreset:
@@ -186,9 +497,12 @@ class Catalog:
 
         return preset
 
-    @staticmethod
-    def _list_matching_files(directory: Path, pattern: re.Pattern) -> list[Path]:
+    def _list_matching_files(self, directory: Path, pattern: re.Pattern) -> list[Path]:
         base = Path(directory).expanduser().resolve()
+        indexed = self.manifest.files(base, pattern)
+        if indexed is not None:
+            return indexed
+        # directory not in the manifest
         return sorted(
             [path for path in base.iterdir() if pattern.match(path.name)],
             key=lambda p: p.stem,
@@ -196,13 +510,14 @@ class Catalog:
 
     def _path_in_raw_data(self, symbol: Symbol, provider: DataProvider, timeframe: str):
         dir = self.raw_directory / provider.value
-        daily_aliases = ("1day", "1d", "d")
-        tf_pandas: str = "D" if timeframe.lower() in daily_aliases else "1min"  # == tf
+        tf_pandas: str = pandas_timeframe(timeframe)
 
         if provider == DataProvider.FIRSTRATE:
-            tf_dir: str = "1d" if timeframe.lower() in daily_aliases else "1m"
+            tf_dir: str = "1d" if tf_pandas == "D" else "1m"
             dir /= firstrate_dirname(tf_dir)
-        file = dir / f"{symbol.firstrate_string}_{timeframe}.txt"
+        file = self.manifest.find(symbol, provider, timeframe)
+        if file is None:
+            file = dir / f"{symbol.firstrate_string}_{timeframe}.txt"
         return tf_pandas, file
 
     # @staticmethod
@@ -221,6 +536,64 @@ class Catalog:
 # ----------------------------------------------------------------------
 
 
+def pandas_timeframe(timeframe: str) -> str:
+    """Timeframe of the frames of a contract, given the timeframe of a
+    raw file (e.g. 1day -> D)."""
+    # TODO only daily and 1 minute data are handled for now
+    return "D" if timeframe.lower() in ("1day", "1d", "d") else "1min"
+
+
+def _ingest_file(
+    directory: Path, file: Path, preset: dict, symbol: str, timeframe: str
+) -> int:
+    """Writes a raw file to the partitioned store in directory, run by
+    the worker processes of Catalog.write."""
+    data = Catalog.get_csv(file, preset)
+    PartitionedStore(directory).write(Symbol(symbol), timeframe, data)
+    return len(data)
+
+
+def _read_timeframe(
+    source: Path,
+    symbol: Symbol,
+    timeframe: str,
+    preset: dict,
+    cache_directory: Path | None,
+    is_raw_data: bool,
+    start: pd.Timestamp | None = None,
+    end: pd.Timestamp | None = None,
+    compact: bool = False,
+    tick_size: float | None = None,
+) -> pd.DataFrame:
+    """Frame of a contract timeframe, read from a raw file or from the
+    partitioned store in source, see Catalog.get_futures_contract."""
+    if is_raw_data:
+        cache = ColumnarCache(cache_directory) if cache_directory else None
+        df = Catalog.get_csv(source, preset, cache, start, end)
+    else:
+        df = PartitionedStore(source).read(
+            symbol, timeframe, start, end, preset.get("tz")
+        )
+    # create symbol column, useful for continuous contracts, NOTE: consider moving this elsewhere
+    if compact:
+        codes = np.zeros(len(df), dtype=np.int8)
+        df.insert(0, "symbol", pd.Categorical.from_codes(codes, [symbol]))
+        return compact_ohlcv(df, tick_size)
+    df.insert(0, "symbol", value=(symbol))
+    return df
+
+
+def _load_contract(
+    symbol: Symbol, loaders: Mapping[str, Callable[[], pd.DataFrame]]
+) -> FuturesContract:
+    """Contract with every timeframe loaded, run by the worker processes
+    of Catalog.get_futures_contracts."""
+    return FuturesContract(
+        FuturesReferenceData.from_symbol(symbol),
+        {tf: load() for tf, load in loaders.items()},
+    )
+
+
 def regex_pattern(
     symbols: list[str],
     years: list[int],
@@ -237,6 +610,70 @@ def regex_pattern(
     return re.compile(pattern, re.IGNORECASE)
 
 
+def _localize_bound(ts: pd.Timestamp | None, tz: str | None) -> pd.Timestamp | None:
+    """Converts a window bound to a Timestamp comparable with data in tz."""
+    if ts is None:
+        return None
+    ts = pd.Timestamp(ts)
+    if tz and ts.tz is None:
+        return ts.tz_localize(tz)
+    return ts
+
+
+def compact_ohlcv(data: pd.DataFrame, tick_size: float | None = None) -> pd.DataFrame:
+    """
+    Returns a copy of OHLCV data using compact dtypes:
+    - symbol column as categorical, storing a code per row instead of
+      an object pointer;
+    - prices as float32, only if rounding them to the tick size still
+      gives back the original prices. If tick size is unknown the
+      decimal resolution of the data is used instead;
+    - volume and open interest as int32 if they fit, or float32 if they
+      have missing values and all the values are exactly representable.
+    """
+    out = data.copy()
+
+    if "symbol" in out and not isinstance(out["symbol"].dtype, pd.CategoricalDtype):
+        out["symbol"] = out["symbol"].astype("category")
+
+    prices = [col for col in ("open", "high", "low", "close") if col in out]
+    if prices:
+        values = out[prices].to_numpy(dtype=np.float64)
+        tick = tick_size if tick_size else _price_resolution(values)
+        downcast = values.astype(np.float32)
+        error = np.abs(downcast.astype(np.float64) - values)
+        if tick is not None and np.nanmax(error, initial=0.0) < tick / 2:
+            out[prices] = downcast
+
+    for col in ("volume", "open_interest"):
+        if col in out:
+            out[col] = _compact_integer(out[col])
+
+    return out
+
+
+def _price_resolution(values: np.ndarray, max_decimals: int = 8) -> float | None:
+    """Smallest power of ten on which all (finite) prices lie."""
+    values = values[np.isfinite(values)]
+    for decimals in range(max_decimals + 1):
+        if np.allclose(values, np.round(values, decimals), rtol=0, atol=1e-9):
+            return 10.0**-decimals
+    return None
+
+
+def _compact_integer(series: pd.Series) -> pd.Series:
+    int32 = np.iinfo(np.int32)
+    if series.isna().any():
+        # float32 represents integers exactly up to 2**24
+        finite = series.dropna()
+        exact = finite.empty or (
+            (finite % 1 == 0).all() and finite.abs().max() <= 2**24
+        )
+        return series.astype(np.float32) if exact else series
+    if series.min() >= int32.min and series.max() <= int32.max:
+        return series.astype(np.int32)
+    return series
+
 
 ### NOTE provisional: just to make data retrieval faster
 
@@ -263,7 +700,6 @@ def firstrate_filename(
 
 if __name__ == "__main__":
     catalog = Catalog()
-    pattern = regex_pattern(symbols=["E6", "NQ"], years=[23, 24], month_codes="HMUZ")
     timeframes = ["1day", "1min"]
     es_hmuz_2020 = [Symbol(f"ES-{m}-2020") for m in "HMUZ"]
 
@@ -283,3 +719,23 @@ if __name__ == "__main__":
         is_raw_data=True,
     )
     print(*contracts, sep="\n")
+
+    # memory of compact dtypes, same contracts
+    compact = catalog.get_futures_contracts(
+        es_hmuz_2020,
+        provider=DataProvider.FIRSTRATE,
+        timeframes=timeframes,
+        is_raw_data=True,
+        compact=True,
+    )
+    for default_c, compact_c in zip(contracts, compact):
+        before, after = default_c.memory_usage(), compact_c.memory_usage()
+        print(f"{default_c.symbol}: {before:,} -> {after:,} bytes ({after / before:.0%})")
+
+    # contracts with 1min data in 2023, answered from the manifest
+    catalog.refresh_manifest()
+    print(
+        catalog.manifest.symbols(
+            "NQ", DataProvider.FIRSTRATE, "1min", "2023-01-01", "2023-12-31 23:59"
+        )
+    )
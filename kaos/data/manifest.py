@@ -0,0 +1,316 @@
+"""
+Persistent index of the raw data files of a Catalog.
+
+The manifest records, for every raw file, its provider, symbol,
+timeframe, path, first and last timestamp, row count, mtime and size.
+It is stored as a CSV file next to the catalog directories and kept in
+memory once loaded, so lookups and queries (e.g. every NQ contract with
+1min data in 2023) never touch the raw directories.
+
+refresh brings the index up to date: directories are listed, but only
+new or changed files (by mtime and size) are opened, and only their
+first and last lines are parsed. Only file names matching the pattern
+of their provider are indexed, and a directory modified after the
+manifest was written is listed again rather than answered from it.
+"""
+
+import os
+import re
+from collections.abc import Mapping
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from kaos.data.enums import DataProvider
+from kaos.data.store import to_ns
+from kaos.data.symbol import Symbol
+from kaos.log_utils import get_logger
+from kaos.time_utils import full_year
+
+# logger config
+logger = get_logger(__name__)
+# ----------------------------------------------------------------------
+# constants
+# ----------------------------------------------------------------------
+
+MANIFEST_COLUMNS = {
+    "provider": object,
+    "symbol": object,
+    "timeframe": object,
+    "path": object,  # relative to the raw directory
+    "first": np.int64,  # UTC nanoseconds
+    "last": np.int64,
+    "rows": np.int64,
+    "mtime": np.int64,  # nanoseconds
+    "size": np.int64,
+}
+# file names of every provider: product, month code, 2-digit year and
+# timeframe, e.g. E6_M24_1min.txt
+FILENAME_PATTERNS = {
+    DataProvider.FIRSTRATE: re.compile(
+        r"^([A-Z0-9]+)_([FGHJKMNQUVXZ])(\d{2})_(\w+)\.(?:txt|csv)$", re.IGNORECASE
+    ),
+}
+# bytes read from the end of a file to find its last line
+TAIL_SIZE = 4096
+COUNT_BLOCK_SIZE = 1 << 20
+
+
+class Manifest:
+    def __init__(
+        self,
+        path: Path,
+        raw_directory: Path,
+        presets: Mapping[DataProvider, dict] | None = None,
+    ):
+        """
+        Args:
+            path (Path): CSV file of the manifest.
+            raw_directory (Path): files are indexed under
+                raw_directory / provider.
+            presets (Mapping[DataProvider, dict] | None): reading preset
+                of every provider, for the timezone and separator of its
+                files.
+        """
+        self._path = path
+        self._raw_directory = raw_directory
+        self._presets = dict(presets or {})
+        self._entries: pd.DataFrame | None = None
+        self._lookup: dict[tuple[str, str, str], Path] | None = None
+        # files of the last refresh not matching their provider pattern
+        self._skipped = 0
+
+    # properties -------------------------------------------------------
+
+    @property
+    def path(self) -> Path:
+        return self._path
+
+    @property
+    def entries(self) -> pd.DataFrame:
+        """Every indexed file, read from disk on first access."""
+        if self._entries is None:
+            self._set_entries(self._read())
+        return self._entries
+
+    # ------------------------------------------------------------------
+    # methods
+    # ------------------------------------------------------------------
+
+    def refresh(self) -> tuple[int, int]:
+        """
+        Updates the index with the files currently in the raw directory
+        and writes it to disk. Returns the number of files (re)scanned and
+        removed.
+        """
+        previous = {row.path: row for row in self.entries.itertuples(index=False)}
+        rows, scanned, self._skipped = [], 0, 0
+        for provider in self._presets:
+            for relative, stat in self._list_files(provider):
+                old = previous.pop(relative, None)
+                if (
+                    old is not None
+                    and old.mtime == stat.st_mtime_ns
+                    and old.size == stat.st_size
+                ):
+                    rows.append(old._asdict())
+                    continue
+                try:
+                    row = self._scan(provider, relative, stat)
+                except Exception as e:
+                    logger.error(f"Failed to index {relative}: {e!r}")
+                    continue
+                if row is not None:
+                    rows.append(row)
+                    scanned += 1
+
+        self._set_entries(pd.DataFrame(rows, columns=list(MANIFEST_COLUMNS)))
+        self._write()
+        logger.info(
+            f"Manifest: {len(rows)} files, {scanned} scanned, {len(previous)} removed."
+        )
+        if self._skipped:
+            logger.warning(
+                f"Manifest: {self._skipped} files do not match the file name"
+                " pattern of their provider and are not indexed."
+            )
+        return scanned, len(previous)
+
+    def query(
+        self,
+        product: str | None = None,
+        provider: DataProvider | None = None,
+        timeframe: str | None = None,
+        start: pd.Timestamp | None = None,
+        end: pd.Timestamp | None = None,
+    ) -> pd.DataFrame:
+        """Indexed files matching every given field, with data between
+        start and end (both included, naive bounds are in the standard
+        timezone)."""
+        entries = self.entries
+        mask = np.ones(len(entries), dtype=bool)
+        if product is not None:
+            mask &= entries["symbol"].str.split("-").str[0].eq(product).to_numpy()
+        if provider is not None:
+            mask &= entries["provider"].eq(provider.value).to_numpy()
+        if timeframe is not None:
+            mask &= entries["timeframe"].eq(timeframe).to_numpy()
+        if start is not None:
+            mask &= entries["last"].to_numpy() >= to_ns(start)
+        if end is not None:
+            mask &= entries["first"].to_numpy() <= to_ns(end)
+        return entries[mask]
+
+    def symbols(self, *args, **kwargs) -> list[Symbol]:
+        """Sorted symbols of the files matching a query, see query."""
+        values = self.query(*args, **kwargs)["symbol"]
+        return sorted({Symbol(value) for value in values})
+
+    def find(
+        self, symbol: Symbol, provider: DataProvider, timeframe: str
+    ) -> Path | None:
+        """Path of the file of a symbol and timeframe, None if not indexed."""
+        if self._lookup is None:
+            self._set_entries(self._read())
+        return self._lookup.get((provider.value, symbol.value, timeframe))
+
+    def files(self, directory: Path, pattern: re.Pattern) -> list[Path] | None:
+        """Indexed files in directory whose name matches pattern, sorted
+        by stem. None if the directory is not indexed or changed since the
+        manifest was written, the caller then lists it."""
+        raw_directory = self._raw_directory.expanduser().resolve()
+        try:
+            relative = Path(directory).relative_to(raw_directory).as_posix()
+        except ValueError:
+            return None
+        if self._is_stale(directory):
+            logger.warning(
+                f"{directory} changed since the manifest was refreshed,"
+                " listing it instead (see Catalog.refresh_manifest)."
+            )
+            return None
+        paths = self.entries["path"]
+        inside = paths[paths.str.rpartition("/")[0] == relative]
+        if inside.empty:
+            return None
+        names = inside.str.rpartition("/")[2]
+        return sorted(
+            (
+                self._raw_directory / path
+                for path, name in zip(inside, names)
+                if pattern.match(name)
+            ),
+            key=lambda p: p.stem,
+        )
+
+    # private methods --------------------------------------------------
+
+    def _is_stale(self, directory: Path) -> bool:
+        """Whether files were added to, renamed in or removed from
+        directory after the manifest was written."""
+        try:
+            written = self._path.stat().st_mtime_ns
+        except FileNotFoundError:
+            return True
+        return Path(directory).stat().st_mtime_ns > written
+
+    def _read(self) -> pd.DataFrame:
+        if not self._path.exists():
+            return pd.DataFrame(
+                {name: pd.Series(dtype=t) for name, t in MANIFEST_COLUMNS.items()}
+            )
+        return pd.read_csv(self._path, dtype=MANIFEST_COLUMNS)
+
+    def _write(self) -> None:
+        self._path.parent.mkdir(parents=True, exist_ok=True)
+        # write to a temporary file first, a reader never sees partial data
+        tmp = self._path.with_suffix(".tmp")
+        self._entries.to_csv(tmp, index=False)
+        os.replace(tmp, self._path)
+
+    def _set_entries(self, entries: pd.DataFrame) -> None:
+        self._entries = entries.sort_values("path", ignore_index=True)
+        self._lookup = {
+            (provider, symbol, timeframe): self._raw_directory / path
+            for provider, symbol, timeframe, path in zip(
+                entries["provider"],
+                entries["symbol"],
+                entries["timeframe"],
+                entries["path"],
+            )
+        }
+
+    def _list_files(self, provider: DataProvider):
+        """(path relative to the raw directory, stat) of every file of a
+        provider whose name matches the provider pattern."""
+        pattern = FILENAME_PATTERNS.get(provider)
+        base = self._raw_directory / provider.value
+        if pattern is None or not base.is_dir():
+            return
+        stack = [base]
+        while stack:
+            with os.scandir(stack.pop()) as it:
+                for entry in it:
+                    if entry.is_dir():
+                        stack.append(Path(entry.path))
+                    elif pattern.match(entry.name):
+                        relative = Path(entry.path).relative_to(self._raw_directory)
+                        yield relative.as_posix(), entry.stat()
+                    else:
+                        self._skipped += 1
+
+    def _scan(
+        self, provider: DataProvider, relative: str, stat: os.stat_result
+    ) -> dict | None:
+        file = self._raw_directory / relative
+        product, month_code, year, timeframe = (
+            FILENAME_PATTERNS[provider].match(file.name).groups()
+        )
+        preset = self._presets[provider]
+        sep = preset.get("sep", ",")
+        head, tail, rows = _head_tail_rows(file)
+        if head is None:
+            return None
+        first = _parse_timestamp(head.split(sep)[0], preset.get("tz"))
+        last = _parse_timestamp(tail.split(sep)[0], preset.get("tz"))
+        return {
+            "provider": provider.value,
+            "symbol": f"{product}-{month_code}-{full_year(int(year), last)}",
+            "timeframe": timeframe,
+            "path": relative,
+            "first": to_ns(first),
+            "last": to_ns(last),
+            "rows": rows,
+            "mtime": stat.st_mtime_ns,
+            "size": stat.st_size,
+        }
+
+
+# ----------------------------------------------------------------------
+# functions
+# ----------------------------------------------------------------------
+
+
+def _head_tail_rows(file: Path) -> tuple[str | None, str | None, int]:
+    """First and last non-empty lines of a file and its number of lines,
+    counted on raw blocks without decoding them."""
+    rows, last_byte = 0, b"\n"
+    with open(file, "rb") as f:
+        head = f.readline()
+        f.seek(0)
+        while block := f.read(COUNT_BLOCK_SIZE):
+            rows += block.count(b"\n")
+            last_byte = block[-1:]
+        if not head.strip():
+            return None, None, 0
+        rows += last_byte != b"\n"
+        f.seek(max(f.tell() - TAIL_SIZE, 0))
+        tail = f.read().rstrip().rsplit(b"\n", 1)[-1]
+    return head.decode().strip(), tail.decode().strip(), rows
+
+
+def _parse_timestamp(value: str, tz: str | None) -> pd.Timestamp:
+    ts = pd.Timestamp(value)
+    return ts.tz_localize(tz) if tz and ts.tz is None else ts
+
@@ -0,0 +1,184 @@
+"""
+Normalised columnar market data store, partitioned on disk as
+
+    directory / product / timeframe / year / symbol.parquet
+
+Every partition holds the bars of a symbol in a UTC calendar year,
+indexed by a UTC timestamp, so a time window only reads the partitions
+of its years (and, inside them, the row groups of the window).
+Partitions are written to a temporary file and renamed, a reader never
+sees partial data and rewriting a symbol is idempotent.
+
+The store also keeps the log of the raw files it was built from (path,
+mtime and size), appended as soon as a file is written: an interrupted
+ingest resumes from the files not logged yet, and re-ingesting only
+touches files that changed since.
+
+Parquet support requires pyarrow, a dependency declared in pyproject.toml.
+"""
+
+import os
+from pathlib import Path
+
+import pandas as pd
+
+from kaos.data.cache import has_parquet_engine
+from kaos.data.store import to_ns
+from kaos.data.symbol import Symbol
+from kaos.time_utils import STANDARD_TIMEZONE
+
+# ----------------------------------------------------------------------
+# constants
+# ----------------------------------------------------------------------
+
+COLUMNS = ("open", "high", "low", "close", "volume", "open_interest")
+# rows per parquet row group, small enough to skip blocks when reading a
+# time window
+ROW_GROUP_SIZE = 100_000
+INGEST_LOG = "ingested.csv"
+INGEST_LOG_COLUMNS = ["path", "mtime", "size"]
+
+
+class PartitionedStore:
+    EXTENSION = ".parquet"
+
+    def __init__(self, directory: Path):
+        self._directory = directory
+
+    # properties -------------------------------------------------------
+
+    @property
+    def directory(self) -> Path:
+        return self._directory
+
+    @property
+    def log_path(self) -> Path:
+        return self._directory / INGEST_LOG
+
+    # ------------------------------------------------------------------
+    # methods
+    # ------------------------------------------------------------------
+
+    def path(self, symbol: Symbol, timeframe: str, year: int) -> Path:
+        return (
+            self._directory
+            / symbol.product_code
+            / timeframe
+            / str(year)
+            / f"{symbol.value}{self.EXTENSION}"
+        )
+
+    def partitions(self, symbol: Symbol, timeframe: str) -> dict[int, Path]:
+        """Partition of every year of a symbol and timeframe."""
+        pattern = f"*/{symbol.value}{self.EXTENSION}"
+        directory = self._directory / symbol.product_code / timeframe
+        return {int(path.parent.name): path for path in directory.glob(pattern)}
+
+    def exists(self, symbol: Symbol, timeframe: str) -> bool:
+        return bool(self.partitions(symbol, timeframe))
+
+    def write(self, symbol: Symbol, timeframe: str, data: pd.DataFrame) -> list[Path]:
+        """Writes OHLCV data indexed by timestamp, replacing every
+        partition previously written for the symbol and timeframe."""
+        check_parquet_engine()
+        if not data.index.is_monotonic_increasing:
+            raise ValueError("Data index must be sorted to be stored.")
+
+        index = data.index
+        if index.tz is None:
+            index = index.tz_localize(STANDARD_TIMEZONE)
+        data = data[[column for column in COLUMNS if column in data]].set_axis(
+            index.tz_convert("UTC").rename("timestamp")
+        )
+
+        stale = self.partitions(symbol, timeframe)
+        paths = []
+        for year, partition in data.groupby(data.index.year, sort=True):
+            path = self.path(symbol, timeframe, year)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_suffix(".tmp")
+            partition.to_parquet(tmp, row_group_size=ROW_GROUP_SIZE)
+            os.replace(tmp, path)
+            stale.pop(year, None)
+            paths.append(path)
+        for path in stale.values():
+            path.unlink(missing_ok=True)
+        return paths
+
+    def read(
+        self,
+        symbol: Symbol,
+        timeframe: str,
+        start: pd.Timestamp | None = None,
+        end: pd.Timestamp | None = None,
+        tz: str | None = STANDARD_TIMEZONE,
+    ) -> pd.DataFrame:
+        """Bars of a symbol and timeframe between start and end (both
+        included), indexed in tz."""
+        check_parquet_engine()
+        partitions = self.partitions(symbol, timeframe)
+        if not partitions:
+            raise FileNotFoundError(
+                f"No {timeframe} data of {symbol} in {self._directory}"
+            )
+
+        filters = []
+        first_year, last_year = min(partitions), max(partitions)
+        if start is not None:
+            start = pd.Timestamp(to_ns(start), tz="UTC")
+            filters.append(("timestamp", ">=", start))
+            first_year = start.year
+        if end is not None:
+            end = pd.Timestamp(to_ns(end), tz="UTC")
+            filters.append(("timestamp", "<=", end))
+            last_year = end.year
+
+        years = [y for y in sorted(partitions) if first_year <= y <= last_year]
+        # the first partition also gives the schema of an empty window
+        frames = [
+            pd.read_parquet(partitions[year], filters=filters or None)
+            for year in years or sorted(partitions)[:1]
+        ]
+        out = pd.concat(frames) if len(frames) > 1 else frames[0]
+        if not years:
+            out = out.iloc[:0]
+        out.index = out.index.tz_convert(tz) if tz else out.index.tz_localize(None)
+        return out
+
+    def ingested(self) -> dict[str, tuple[int, int]]:
+        """(mtime, size) of every raw file in the ingest log, by path."""
+        if not self.log_path.exists():
+            return {}
+        # a line cut by an interruption is skipped
+        log = pd.read_csv(
+            self.log_path,
+            names=INGEST_LOG_COLUMNS,
+            # nullable integers, nanosecond mtimes don't fit in a float
+            dtype={"path": str, "mtime": "Int64", "size": "Int64"},
+            on_bad_lines="skip",
+        ).dropna()
+        return {
+            path: (int(mtime), int(size))
+            for path, mtime, size in log.itertuples(index=False)
+        }
+
+    def log(self, path: str, mtime: int, size: int) -> None:
+        """Appends a raw file to the ingest log, once its data is written."""
+        self._directory.mkdir(parents=True, exist_ok=True)
+        with open(self.log_path, "a") as f:
+            f.write(f"{path},{mtime},{size}\n")
+
+    def compact_log(self) -> None:
+        """Rewrites the ingest log keeping the last line of every file."""
+        ingested = self.ingested()
+        tmp = self.log_path.with_suffix(".tmp")
+        with open(tmp, "w") as f:
+            for path, (mtime, size) in ingested.items():
+                f.write(f"{path},{mtime},{size}\n")
+        os.replace(tmp, self.log_path)
+
+
+def check_parquet_engine() -> None:
+    """Raises ImportError if pyarrow is not installed."""
+    if not has_parquet_engine():
+        raise ImportError("pyarrow is required by the partitioned store.")
@@ -0,0 +1,186 @@
+"""
+Fixed-width binary OHLCV store backed by memory-mapped files.
+
+Each symbol/timeframe is a single .npy file of records with an int64
+timestamp (UTC nanoseconds) followed by OHLCV and open interest columns.
+Files are memory-mapped, so only the pages touched by a query are read,
+and a time range is located with a binary search on the timestamp
+column. Slices are views on the mapped file, not copies.
+"""
+
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from kaos.data.symbol import Symbol
+from kaos.time_utils import STANDARD_TIMEZONE
+
+# ----------------------------------------------------------------------
+# constants
+# ----------------------------------------------------------------------
+
+OHLCV_DTYPE = np.dtype(
+    [
+        ("timestamp", "<i8"),
+        ("open", "<f8"),
+        ("high", "<f8"),
+        ("low", "<f8"),
+        ("close", "<f8"),
+        ("volume", "<i8"),
+        ("open_interest", "<i8"),
+    ]
+)
+# integer columns can't hold NaN, missing values are stored as this
+MISSING_INT = -1
+
+# ----------------------------------------------------------------------
+# BinaryStore
+# ----------------------------------------------------------------------
+
+
+class BinaryStore:
+    EXTENSION = ".npy"
+
+    def __init__(self, directory: Path):
+        self._directory = directory
+        self._maps: dict[Path, np.memmap] = {}
+
+    # properties -------------------------------------------------------
+
+    @property
+    def directory(self) -> Path:
+        return self._directory
+
+    # ------------------------------------------------------------------
+    # methods
+    # ------------------------------------------------------------------
+
+    def path(self, symbol: Symbol, timeframe: str) -> Path:
+        return self._directory / timeframe / f"{symbol.value}{self.EXTENSION}"
+
+    def exists(self, symbol: Symbol, timeframe: str) -> bool:
+        return self.path(symbol, timeframe).exists()
+
+    def write(self, symbol: Symbol, timeframe: str, data: pd.DataFrame) -> Path:
+        """Writes an OHLCV DataFrame indexed by timestamp to the store,
+        replacing any previous file of the same symbol and timeframe."""
+        path = self.path(symbol, timeframe)
+        self._maps.pop(path, None)
+        return write_records(path, data)
+
+    def open(self, symbol: Symbol, timeframe: str) -> np.memmap:
+        """Returns the read-only memory map of a symbol/timeframe."""
+        path = self.path(symbol, timeframe)
+        if path not in self._maps:
+            if not path.exists():
+                raise FileNotFoundError(f"File not found: {path}")
+            self._maps[path] = np.load(path, mmap_mode="r")
+        return self._maps[path]
+
+    def slice(
+        self,
+        symbol: Symbol,
+        timeframe: str,
+        start: pd.Timestamp | None = None,
+        end: pd.Timestamp | None = None,
+    ) -> np.ndarray:
+        """Returns the records between start and end (both included) as
+        a view on the mapped file."""
+        records = self.open(symbol, timeframe)
+        return records[slice(*search_range(records["timestamp"], start, end))]
+
+    def get(
+        self,
+        symbol: Symbol,
+        timeframe: str,
+        start: pd.Timestamp | None = None,
+        end: pd.Timestamp | None = None,
+        tz: str = STANDARD_TIMEZONE,
+    ) -> pd.DataFrame:
+        """Same as slice, but copies the records into a DataFrame."""
+        return to_frame(self.slice(symbol, timeframe, start, end), tz)
+
+
+# ----------------------------------------------------------------------
+# functions
+# ----------------------------------------------------------------------
+
+
+def search_range(
+    timestamps: np.ndarray,
+    start: pd.Timestamp | None = None,
+    end: pd.Timestamp | None = None,
+) -> tuple[int, int]:
+    """Given sorted int64 timestamps, returns the positions delimiting
+    [start, end] using binary search."""
+    i = 0 if start is None else np.searchsorted(timestamps, to_ns(start), "left")
+    j = (
+        len(timestamps)
+        if end is None
+        else np.searchsorted(timestamps, to_ns(end), "right")
+    )
+    return int(i), int(j)
+
+
+def write_records(path: Path, data: pd.DataFrame) -> Path:
+    """Writes an OHLCV DataFrame indexed by timestamp as a .npy file of
+    OHLCV_DTYPE records."""
+    if not data.index.is_monotonic_increasing:
+        raise ValueError("Data index must be sorted to be stored.")
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    out = np.lib.format.open_memmap(
+        path, mode="w+", dtype=OHLCV_DTYPE, shape=(len(data),)
+    )
+    out["timestamp"] = index_to_ns(data.index)
+    for column in OHLCV_DTYPE.names[1:]:
+        if column not in data:
+            out[column] = np.nan if out[column].dtype.kind == "f" else MISSING_INT
+        elif out[column].dtype.kind == "i":
+            out[column] = data[column].fillna(MISSING_INT).to_numpy()
+        else:
+            out[column] = data[column].to_numpy()
+    out.flush()
+    del out
+    return path
+
+
+def to_frame(
+    records: np.ndarray, tz: str | None = STANDARD_TIMEZONE, copy: bool = True
+) -> pd.DataFrame:
+    """Converts OHLCV records into a DataFrame indexed by timestamp.
+
+    With copy=False, the columns are views on records (e.g. a read-only
+    memory map) and only the index is allocated."""
+    index = pd.DatetimeIndex(
+        pd.to_datetime(records["timestamp"], utc=True), name="timestamp"
+    )
+    index = index.tz_convert(tz) if tz else index.tz_localize(None)
+
+    out = pd.DataFrame(
+        {name: records[name] for name in OHLCV_DTYPE.names[1:]},
+        index=index,
+        copy=copy,
+    )
+    # restores missing values of integer columns
+    for column in ("volume", "open_interest"):
+        if (out[column] == MISSING_INT).any():
+            out[column] = out[column].where(out[column] != MISSING_INT)
+    return out
+
+
+def to_ns(ts: pd.Timestamp) -> int:
+    """UTC nanoseconds of a timestamp, naive ones are in the standard
+    timezone."""
+    ts = pd.Timestamp(ts)
+    if ts.tz is None:
+        ts = ts.tz_localize(STANDARD_TIMEZONE)
+    return ts.as_unit("ns").value
+
+
+def index_to_ns(index: pd.DatetimeIndex) -> np.ndarray:
+    """int64 UTC nanoseconds of an index, see to_ns."""
+    if index.tz is None:
+        index = index.tz_localize(STANDARD_TIMEZONE)
+    return index.as_unit("ns").asi8
@@ -1,16 +1,79 @@
+from kaos.time_utils import CMES_CODE_TO_MONTH, full_year
+
+
 class Symbol:
-    def __init__(self, value: str):
-        pieces: list[str] = value.split("-")
+    """
+    Flyweight symbol (e.g. 6E-M-2024, 6E-1-open_interest): each value is
+    parsed once and interned, so Symbol(value) returns the same object
+    for the same value. Hash and sort key (product, year, month) are
+    precomputed, symbols are cheap dict keys and sort without parsing.
+    Symbols are immutable.
+    """
+
+    __slots__ = ("value", "product_code", "month_code", "year", "sort_key", "_hash")
+    _interned: dict[str, "Symbol"] = {}
+
+    value: str
+    product_code: str
+    month_code: str
+    year: str
+    sort_key: tuple[str, int, int, str]
+
+    def __new__(cls, value: str) -> "Symbol":
+        try:
+            return cls._interned[value]
+        except KeyError:
+            pass
 
-        self.value = value
-        self.product_code = pieces[0]
-        self.month_code = pieces[1]
-        self.year = pieces[2]
+        product_code, month_code, year = value.split("-")[:3]
+        self = super().__new__(cls)
+        # continuous symbols have a series and a rule instead of month
+        # and year, they sort before individual contracts; 2-digit years
+        # sort with their 4-digit year
+        if not year.isdigit():
+            full = -1
+        elif len(year) <= 2:
+            full = full_year(int(year))
+        else:
+            full = int(year)
+        sort_key = (
+            product_code,
+            full,
+            CMES_CODE_TO_MONTH.get(month_code.upper(), 0),
+            value,
+        )
+        for name, attribute in zip(
+            Symbol.__slots__,
+            (value, product_code, month_code, year, sort_key, hash(value)),
+        ):
+            object.__setattr__(self, name, attribute)
+        # another thread may have interned the same value meanwhile
+        return cls._interned.setdefault(value, self)
 
     @property
     def firstrate_string(self) -> str:
         return f"{self.product_code}_{self.month_code}{self.year[-2:]}"
 
+    def __setattr__(self, name, value) -> None:
+        raise AttributeError(f"{type(self).__name__} is immutable.")
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, Symbol):
+            return self.value == other.value
+        return NotImplemented
+
+    def __lt__(self, other: "Symbol") -> bool:
+        if isinstance(other, Symbol):
+            return self.sort_key < other.sort_key
+        return NotImplemented
+
+    def __hash__(self) -> int:
+        return self._hash
+
+    def __reduce__(self):
+        # unpickled symbols are interned in the receiving process
+        return Symbol, (self.value,)
+
     def __repr__(self) -> str:
         return self.value
 
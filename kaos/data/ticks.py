@@ -0,0 +1,384 @@
+"""
+Tick data store and tick-to-bar aggregation.
+
+Ticks are NumPy structured records (TICK_DTYPE, 21 bytes each) stored
+per symbol as chunks of at most CHUNK_SIZE ticks, each one a .npy file
+named after its first and last timestamps. Reads memory-map the chunks
+overlapping the requested window and never load a whole symbol.
+
+aggregate_ticks builds OHLCV bars (time, volume or tick-count bars) one
+chunk at a time with reduceat kernels; the last bar of a chunk is
+carried over to the next one, so hundreds of millions of ticks are
+aggregated with the memory of a single chunk. TickStore.loader plugs
+tick bars into a LazyMarketData, i.e. FuturesContract.market_data.
+"""
+
+import os
+from bisect import bisect_left
+from collections.abc import Callable, Iterable, Iterator
+from functools import partial
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from pandas.tseries.frequencies import to_offset
+
+from kaos.data.aggregation import BinGrid
+from kaos.data.enums import BarType, TickSide
+from kaos.data.store import search_range, to_ns
+from kaos.data.symbol import Symbol
+from kaos.log_utils import get_logger
+from kaos.time_utils import STANDARD_TIMEZONE
+
+# logger config
+logger = get_logger(__name__)
+# ----------------------------------------------------------------------
+# constants
+# ----------------------------------------------------------------------
+
+TICK_DTYPE = np.dtype(
+    [
+        ("timestamp", "<i8"),  # UTC nanoseconds
+        ("price", "<f8"),
+        ("size", "<u4"),
+        ("side", "i1"),  # TickSide
+    ]
+)
+# ticks per chunk file, ~100MB
+CHUNK_SIZE = 5_000_000
+
+# ----------------------------------------------------------------------
+# TickStore
+# ----------------------------------------------------------------------
+
+
+class TickStore:
+    EXTENSION = ".npy"
+
+    def __init__(self, directory: Path, chunk_size: int = CHUNK_SIZE):
+        self._directory = directory
+        self.chunk_size = chunk_size
+
+    # properties -------------------------------------------------------
+
+    @property
+    def directory(self) -> Path:
+        return self._directory
+
+    # ------------------------------------------------------------------
+    # methods
+    # ------------------------------------------------------------------
+
+    def path(self, symbol: Symbol) -> Path:
+        return self._directory / symbol.value
+
+    def chunk_files(self, symbol: Symbol) -> list[tuple[int, int, Path]]:
+        """(first timestamp, last timestamp, path) of every chunk of a
+        symbol, in time order. Only file names are read."""
+        files = []
+        for path in self.path(symbol).glob(f"*{self.EXTENSION}"):
+            first, last = path.stem.split("_")
+            files.append((int(first), int(last), path))
+        return sorted(files)
+
+    def write(self, symbol: Symbol, ticks: np.ndarray) -> None:
+        """Appends sorted ticks after the ones already stored. The last
+        chunk is topped up before new chunks are created."""
+        ticks = np.asarray(ticks, dtype=TICK_DTYPE)
+        if not len(ticks):
+            return
+        if (np.diff(ticks["timestamp"]) < 0).any():
+            raise ValueError("Ticks must be sorted by timestamp.")
+
+        files = self.chunk_files(symbol)
+        replaced = None
+        if files:
+            _, last, path = files[-1]
+            if ticks["timestamp"][0] < last:
+                raise ValueError(f"Ticks of {symbol} must start after {last}.")
+            stored = np.load(path)
+            if len(stored) < self.chunk_size:
+                ticks = np.concatenate([stored, ticks])
+                replaced = path
+
+        directory = self.path(symbol)
+        directory.mkdir(parents=True, exist_ok=True)
+        written = [
+            self._write_chunk(directory, ticks[i : i + self.chunk_size])
+            for i in range(0, len(ticks), self.chunk_size)
+        ]
+        # the partial chunk is only removed once its replacement is written,
+        # a failed write loses no stored ticks
+        if replaced is not None and replaced not in written:
+            replaced.unlink()
+
+    def chunks(
+        self,
+        symbol: Symbol,
+        start: pd.Timestamp | None = None,
+        end: pd.Timestamp | None = None,
+    ) -> Iterator[np.ndarray]:
+        """Ticks between start and end (both included), one chunk at a
+        time, as read-only views on memory-mapped files."""
+        lower = None if start is None else to_ns(start)
+        upper = None if end is None else to_ns(end)
+        for first, last, path in self.chunk_files(symbol):
+            if (lower is not None and last < lower) or (
+                upper is not None and first > upper
+            ):
+                continue
+            ticks = np.load(path, mmap_mode="r")
+            i, j = search_range(ticks["timestamp"], start, end)
+            if j > i:
+                yield ticks[i:j]
+
+    def read(
+        self,
+        symbol: Symbol,
+        start: pd.Timestamp | None = None,
+        end: pd.Timestamp | None = None,
+    ) -> np.ndarray:
+        """Same as chunks, but copied into a single array."""
+        return np.concatenate(
+            [np.empty(0, dtype=TICK_DTYPE), *self.chunks(symbol, start, end)]
+        )
+
+    def bars(
+        self,
+        symbol: Symbol,
+        bar_type: BarType,
+        size: str | int,
+        start: pd.Timestamp | None = None,
+        end: pd.Timestamp | None = None,
+        offset=None,
+        tz: str = STANDARD_TIMEZONE,
+    ) -> pd.DataFrame:
+        """OHLCV bars of the ticks of a symbol, see aggregate_ticks."""
+        return aggregate_ticks(
+            self.chunks(symbol, start, end), bar_type, size, offset=offset, tz=tz
+        )
+
+    def loader(
+        self, symbol: Symbol, bar_type: BarType, size: str | int, **kwargs
+    ) -> Callable[[], pd.DataFrame]:
+        """Loader of tick bars for a LazyMarketData, e.g.
+
+        >>> LazyMarketData({"1000v": store.loader(symbol, BarType.VOLUME, 1000)})
+        """
+        return partial(self.bars, symbol, bar_type, size, **kwargs)
+
+    # private methods --------------------------------------------------
+
+    def _write_chunk(self, directory: Path, ticks: np.ndarray) -> Path:
+        first, last = int(ticks["timestamp"][0]), int(ticks["timestamp"][-1])
+        path = directory / f"{first:020d}_{last:020d}{self.EXTENSION}"
+        # a reader never sees a partial chunk
+        tmp = path.with_suffix(".tmp")
+        with open(tmp, "wb") as f:
+            np.save(f, ticks)
+        os.replace(tmp, path)
+        return path
+
+
+# ----------------------------------------------------------------------
+# functions
+# ----------------------------------------------------------------------
+
+
+def to_ticks(data: pd.DataFrame) -> np.ndarray:
+    """Converts a DataFrame indexed by timestamp, with price, size and
+    optionally side columns, into TICK_DTYPE records."""
+    index = data.index
+    if index.tz is None:
+        index = index.tz_localize(STANDARD_TIMEZONE)
+
+    ticks = np.empty(len(data), dtype=TICK_DTYPE)
+    ticks["timestamp"] = index.as_unit("ns").asi8
+    ticks["price"] = data["price"].to_numpy()
+    ticks["size"] = data["size"].to_numpy()
+    ticks["side"] = data["side"].to_numpy() if "side" in data else TickSide.NONE
+    return ticks
+
+
+def aggregate_ticks(
+    chunks: Iterable[np.ndarray],
+    bar_type: BarType,
+    size: str | int,
+    offset=None,
+    tz: str = STANDARD_TIMEZONE,
+) -> pd.DataFrame:
+    """
+    Aggregates sorted chunks of ticks into OHLCV bars with a ticks count.
+
+    - TIME: size is a fixed timeframe (e.g. "5min"), bins and labels
+      (right edge) are the same as subsample_ohlc on the ticks.
+    - VOLUME: a bar closes with the tick bringing its volume to size or
+      more (ticks are not split), the next bar counts from zero.
+    - TICK: a bar every size ticks.
+
+    Volume and tick bars are labelled by the time of their last tick.
+    """
+    aggregator = _TickAggregator(BarType(bar_type), size, offset, tz)
+    for chunk in chunks:
+        aggregator.add(chunk)
+    return aggregator.result()
+
+
+class _TickAggregator:
+    COLUMNS = ("open", "high", "low", "close", "volume", "ticks")
+
+    def __init__(self, bar_type: BarType, size: str | int, offset, tz: str):
+        self.bar_type = bar_type
+        self.tz = tz
+        if bar_type == BarType.TIME:
+            self.freq = to_offset(size)
+            self.offset = offset
+            self.grid: BinGrid | None = None  # anchored to the first tick
+        else:
+            self.size = int(size)
+            if self.size <= 0:
+                raise ValueError(f"Bar size must be positive, got {size}.")
+        # ticks of the chunks already added
+        self.count = 0
+        # key and volume of the volume bar left open by the last chunk
+        self.key = 0
+        self.open_volume = 0
+        # bars of the chunks added, the last one may still grow
+        self.parts: list[dict[str, np.ndarray]] = []
+        self.partial: dict[str, np.ndarray] | None = None
+
+    def add(self, ticks: np.ndarray) -> None:
+        if not len(ticks):
+            return
+        timestamps = np.asarray(ticks["timestamp"])
+        prices = np.asarray(ticks["price"], dtype=np.float64)
+        sizes = np.asarray(ticks["size"], dtype=np.int64)
+
+        keys = self._keys(timestamps, sizes)
+        starts = np.flatnonzero(np.diff(keys, prepend=keys[0] - 1))
+        ends = np.append(starts[1:], len(keys))
+        bars = {
+            "key": keys[starts],
+            "open": prices[starts],
+            "high": np.maximum.reduceat(prices, starts),
+            "low": np.minimum.reduceat(prices, starts),
+            "close": prices[ends - 1],
+            "volume": np.add.reduceat(sizes, starts),
+            "ticks": ends - starts,
+            "last": timestamps[ends - 1],
+        }
+        self.count += len(ticks)
+
+        # the first bar may continue the last bar of the previous chunk
+        if self.partial is not None:
+            if self.partial["key"][0] == bars["key"][0]:
+                bars["open"][0] = self.partial["open"][0]
+                bars["high"][0] = max(bars["high"][0], self.partial["high"][0])
+                bars["low"][0] = min(bars["low"][0], self.partial["low"][0])
+                bars["volume"][0] += self.partial["volume"][0]
+                bars["ticks"][0] += self.partial["ticks"][0]
+            else:
+                self.parts.append(self.partial)
+        self.parts.append({name: values[:-1] for name, values in bars.items()})
+        self.partial = {name: values[-1:] for name, values in bars.items()}
+
+    def result(self) -> pd.DataFrame:
+        parts = self.parts + ([self.partial] if self.partial is not None else [])
+        if not parts:
+            return pd.DataFrame(
+                {name: [] for name in self.COLUMNS},
+                index=pd.DatetimeIndex([], tz=self.tz, name="timestamp"),
+            )
+        bars = {name: np.concatenate([p[name] for p in parts]) for name in parts[0]}
+
+        if self.bar_type == BarType.TIME:
+            first_key = int(bars["key"][0])
+            n_bins = int(bars["key"][-1]) - first_key + 1
+            like = pd.DatetimeIndex([], tz=self.tz, name="timestamp")
+            labels = self.grid.labels(first_key, n_bins, "right", like)
+            index = labels[bars["key"] - first_key]
+        else:
+            index = _to_index(bars["last"], self.tz)
+        return pd.DataFrame({name: bars[name] for name in self.COLUMNS}, index=index)
+
+    def _keys(self, timestamps: np.ndarray, sizes: np.ndarray) -> np.ndarray:
+        if self.bar_type == BarType.TICK:
+            return (self.count + np.arange(len(timestamps))) // self.size
+        if self.bar_type == BarType.VOLUME:
+            return self._volume_keys(sizes)
+
+        index = _to_index(timestamps, self.tz)
+        if self.grid is None:
+            # same origin as pandas resample ("start_day")
+            self.grid = BinGrid(self.freq, self.offset, index[0].normalize())
+        return self.grid.keys(index)
+
+    def _volume_keys(self, sizes: np.ndarray) -> np.ndarray:
+        """
+        A volume bar closes with the tick bringing its volume to size or
+        more and the next one starts from zero, so each close depends on
+        the previous one: closes are found one bar at a time, by binary
+        search on the cumulative volume of the chunk.
+        """
+        # volume of the open bar plus the chunk volume up to each tick, as
+        # a list: bisect on a list is much cheaper than np.searchsorted
+        cumulative = (self.open_volume + np.cumsum(sizes)).tolist()
+        closes = []
+        # cumulative volume before the current bar and its first tick
+        closed, start = 0, 0
+        while True:
+            end = bisect_left(cumulative, closed + self.size, start)
+            if end == len(cumulative):
+                break
+            closes.append(end)
+            closed = cumulative[end]
+            start = end + 1
+
+        # the bar of a tick changes after each close
+        close = np.zeros(len(cumulative), dtype=np.int64)
+        close[closes] = 1
+        keys = self.key + np.cumsum(close) - close
+        self.key += len(closes)
+        self.open_volume = cumulative[-1] - closed
+        return keys
+
+
+def _to_index(timestamps: np.ndarray, tz: str) -> pd.DatetimeIndex:
+    # viewing int64 as datetime64 is much faster than pd.to_datetime
+    index = pd.DatetimeIndex(timestamps.view("M8[ns]"), name="timestamp")
+    return index.tz_localize("UTC").tz_convert(tz)
+
+
+if __name__ == "__main__":
+    # demonstration: chunked store and bars of 20M synthetic ticks
+    import tempfile
+    from time import perf_counter
+
+    rng = np.random.default_rng(0)
+    n_ticks = 20_000_000
+    start = pd.Timestamp("2024-01-02 18:00", tz=STANDARD_TIMEZONE).value
+    ticks = np.empty(n_ticks, dtype=TICK_DTYPE)
+    ticks["timestamp"] = start + np.cumsum(rng.integers(1, 50_000_000, n_ticks))
+    ticks["price"] = 100 + np.cumsum(rng.normal(0, 0.001, n_ticks))
+    ticks["size"] = rng.integers(1, 10, n_ticks)
+    ticks["side"] = rng.choice([TickSide.BUY, TickSide.SELL], n_ticks)
+
+    with tempfile.TemporaryDirectory() as directory:
+        store = TickStore(Path(directory))
+        symbol = Symbol("ES-H-2024")
+        store.write(symbol, ticks)
+        del ticks
+        print(f"{len(store.chunk_files(symbol))} chunks of {CHUNK_SIZE} ticks")
+
+        for bar_type, size in [
+            (BarType.TIME, "1min"),
+            (BarType.VOLUME, 5_000),
+            (BarType.TICK, 1_000),
+        ]:
+            begin = perf_counter()
+            bars = store.bars(symbol, bar_type, size)
+            elapsed = perf_counter() - begin
+            print(
+                f"{bar_type} {size}: {len(bars)} bars in {elapsed:.2f}s"
+                f" ({n_ticks / elapsed / 1e6:.0f}M ticks/s)"
+            )
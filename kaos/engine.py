@@ -1,19 +1,508 @@
+"""
+Event-driven backtest engine.
+
+Bars of every instrument in the universe are merged into a single time
+ordered stream with a k-way merge: each instrument is a pre-sorted
+array of int64 timestamps and a heap holds the next bar of every
+instrument, so the stream costs O(log k) per bar and nothing is
+concatenated or re-sorted. Columns are converted to Python lists one
+chunk per instrument at a time, which bounds memory. Market orders are
+filled at the open of the next bar of their instrument.
+
+With a no-op strategy a bar costs about 1.5 to 2 µs on CPython 3.12
+(0.5 to 0.7M bars/s, see the demonstration), short of millions of bars
+per second: the cost is the per-bar Python work (heap replace, event
+field writes, mark and handler calls), not the merge itself.
+
+VectorizedEngine runs SignalStrategy instances on whole arrays instead,
+with the same fills, costs and equity as the event-driven path.
+"""
+
+import heapq
+from collections.abc import Iterator
+from dataclasses import dataclass
+from time import perf_counter
+
+import numpy as np
+import pandas as pd
+
 from kaos.data.data import Universe
+from kaos.data.instruments import Instrument
+from kaos.log_utils import get_logger
 from kaos.risk import Portfolio
-from kaos.strategy import Strategy
+from kaos.strategy import SignalStrategy, Strategy
+from kaos.time_utils import STANDARD_TIMEZONE
+
+# logger config
+logger = get_logger(__name__)
+# ----------------------------------------------------------------------
+# constants
+# ----------------------------------------------------------------------
+
+# bars of an instrument converted to Python lists at a time by the loop
+CHUNK_SIZE = 1 << 16
+
+
+class BarEvent:
+    """
+    A bar of an instrument. The engine keeps one event per instrument
+    and updates it in place for each bar, so no object is created per
+    bar: copy the fields of an event to keep them.
+    """
+
+    __slots__ = (
+        "instrument",
+        "symbol",
+        "timestamp",
+        "row",
+        "open",
+        "high",
+        "low",
+        "close",
+        "volume",
+    )
+
+    def __init__(self, instrument: int, symbol):
+        self.instrument = instrument  # position in the engine universe
+        self.symbol = symbol
+        self.timestamp: int = 0  # UTC nanoseconds
+        self.row: int = -1  # position in the instrument timeframe
+        self.open: float = np.nan
+        self.high: float = np.nan
+        self.low: float = np.nan
+        self.close: float = np.nan
+        self.volume: float = 0
+
+    @property
+    def time(self) -> pd.Timestamp:
+        return pd.Timestamp(self.timestamp, tz="UTC").tz_convert(STANDARD_TIMEZONE)
+
+    def __repr__(self) -> str:
+        return (
+            f"BarEvent({self.symbol}, {self.time}, o={self.open}, h={self.high},"
+            f" l={self.low}, c={self.close}, v={self.volume})"
+        )
+
+
+@dataclass(slots=True)
+class EngineStats:
+    events: int = 0
+    fills: int = 0
+    setup_time: float = 0.0  # seconds spent converting market data
+    run_time: float = 0.0  # seconds spent in the event loop
+
+    @property
+    def events_per_second(self) -> float:
+        return self.events / self.run_time if self.run_time else 0.0
+
+    @property
+    def ns_per_event(self) -> float:
+        """Average cost of an event, engine overhead and strategies."""
+        return self.run_time / self.events * 1e9 if self.events else 0.0
+
+
+class _BarFeed:
+    """Columns of an instrument timeframe, converted to Python lists a
+    chunk at a time: indexing a list is much cheaper than extracting
+    numpy scalars in the loop."""
+
+    __slots__ = ("timestamps", "columns")
+
+    def __init__(self, data: pd.DataFrame):
+        self.timestamps = _timestamps(data)
+        self.columns = [
+            data[col].to_numpy(dtype=float)
+            for col in ("open", "high", "low", "close", "volume")
+        ]
+
+    def __len__(self) -> int:
+        return len(self.timestamps)
+
+    def chunks(self, size: int = CHUNK_SIZE) -> Iterator[tuple]:
+        """Row of the first bar, then timestamps, open, high, low, close
+        and volume lists of at most size bars."""
+        for start in range(0, len(self.timestamps), size):
+            stop = start + size
+            yield (
+                start,
+                self.timestamps[start:stop].tolist(),
+                *(column[start:stop].tolist() for column in self.columns),
+            )
+
+
+# ----------------------------------------------------------------------
+# Engine
+# ----------------------------------------------------------------------
 
 
 class Engine:
     def __init__(
         self,
-        universe: Universe,
+        universe: Universe | list[Instrument],
         strategies: list[Strategy],
         portfolio: Portfolio,
+        timeframe: str = "1min",
+        commission: float = 0.0,
         # findings table... (might as well be composed in strategy/study)
     ):
+        """
+        Args:
+            universe (Universe | list[Instrument]): instruments whose bars
+                are dispatched, identified by their position.
+            strategies (list[Strategy]): receive every bar, in order.
+            portfolio (Portfolio): filled, marked and recorded by the
+                engine, once per timestamp.
+            timeframe (str): market data timeframe of the bars.
+            commission (float): cost per unit traded.
+        """
+        self.universe = _as_universe(universe)
+        self.strategies = strategies
+        self.portfolio = portfolio
+        self.timeframe = timeframe
+        self.commission = commission
+        self.stats = EngineStats()
+        self._pending: list[float] = [0.0] * len(universe)
+        self._pending_stop: list[float | None] = [None] * len(universe)
+        # (level, quantity) of the stop order of each position
+        self._stops: list[tuple[float, float] | None] = [None] * len(universe)
+
+    # ------------------------------------------------------------------
+    # methods
+    # ------------------------------------------------------------------
+
+    def submit(
+        self, instrument: int, quantity: float, stop_loss: float | None = None
+    ) -> None:
+        """Queues a market order, filled at the open of the next bar of
+        the instrument. Orders of the same instrument are netted.
+
+        With stop_loss, the position resulting from the fill is closed by
+        a stop order stop_loss (a fraction of the fill price) away, which
+        is filled intrabar at its level, or at the open on gaps. Without
+        it, the stop of the previous position is cancelled.
+        """
+        self._pending[instrument] += quantity
+        self._pending_stop[instrument] = stop_loss
+
+    def run(self) -> EngineStats:
+        start = perf_counter()
+        feeds = [_BarFeed(i.market_data[self.timeframe]) for i in self.universe]
+        events = [
+            BarEvent(n, getattr(instrument, "symbol", None))
+            for n, instrument in enumerate(self.universe)
+        ]
+        for strategy in self.strategies:
+            strategy.engine = self
+            strategy.init()
+        # strategies not overriding on_bar are not called at all
+        handlers = [
+            strategy.on_bar
+            for strategy in self.strategies
+            if type(strategy).on_bar is not Strategy.on_bar
+        ]
+        self.stats = stats = EngineStats(setup_time=perf_counter() - start)
+
+        start = perf_counter()
+        stats.events, stats.fills = self._loop(feeds, events, handlers)
+        stats.run_time = perf_counter() - start
+        logger.info(
+            f"{stats.events} events in {stats.run_time:.2f}s"
+            f" ({stats.ns_per_event:.0f} ns/event)"
+        )
+        return stats
+
+    # private methods --------------------------------------------------
+
+    def _loop(
+        self, feeds: list[_BarFeed], events: list[BarEvent], handlers: list
+    ) -> tuple[int, int]:
+        chunk_iterators = [feed.chunks() for feed in feeds]
+        chunks = [next(iterator, None) for iterator in chunk_iterators]
+        # heap of (next timestamp, instrument, position in its chunk), ties
+        # go to the first instrument of the universe
+        heap = [(chunk[1][0], n, 0) for n, chunk in enumerate(chunks) if chunk]
+        heapq.heapify(heap)
+        heapreplace, heappop = heapq.heapreplace, heapq.heappop
+        pending = self._pending
+        stops = self._stops
+        portfolio = self.portfolio
+        portfolio.reserve(len(feeds))
+        mark, record = portfolio.mark, portfolio.record
+        execute = self._execute
+        n_events = n_fills = 0
+        # the portfolio is recorded once all bars of a timestamp are done
+        last = heap[0][0] if heap else None
+
+        while heap:
+            timestamp, n, i = heap[0]
+            if timestamp != last:
+                record(last)
+                last = timestamp
+            start, timestamps, opens, highs, lows, closes, volumes = chunks[n]
+            event = events[n]
+            event.timestamp = timestamp
+            event.row = start + i
+            event.open = opens[i]
+            event.high = highs[i]
+            event.low = lows[i]
+            event.close = close = closes[i]
+            event.volume = volumes[i]
+
+            if pending[n] or stops[n] is not None:
+                n_fills += execute(n, event)
+            mark(n, close)
+            for handler in handlers:
+                handler(event)
+
+            i += 1
+            if i < len(timestamps):
+                heapreplace(heap, (timestamps[i], n, i))
+            elif (chunk := next(chunk_iterators[n], None)) is not None:
+                chunks[n] = chunk
+                heapreplace(heap, (chunk[1][0], n, 0))
+            else:
+                heappop(heap)
+            n_events += 1
+
+        if last is not None:
+            record(last)
+        return n_events, n_fills
+
+    def _execute(self, n: int, event: BarEvent) -> int:
+        """Fills the pending market order of an instrument at the open of
+        the bar, then its stop order if the bar reaches it. Returns the
+        number of fills."""
+        fills = 0
+        fill = self.portfolio.fill
+        commission = self.commission
+        if self._pending[n]:
+            quantity = self._pending[n]
+            self._pending[n] = 0.0
+            fill(event.timestamp, n, quantity, event.open, abs(quantity) * commission)
+            self._stops[n] = self._stop_order(n, event.open)
+            fills += 1
+
+        if self._stops[n] is not None:
+            level, quantity = self._stops[n]
+            if quantity < 0 and event.low <= level:
+                price = min(event.open, level)
+            elif quantity > 0 and event.high >= level:
+                price = max(event.open, level)
+            else:
+                return fills
+            fill(event.timestamp, n, quantity, price, abs(quantity) * commission)
+            self._stops[n] = None
+            fills += 1
+        return fills
+
+    def _stop_order(self, instrument: int, price: float) -> tuple[float, float] | None:
+        stop_loss = self._pending_stop[instrument]
+        self._pending_stop[instrument] = None
+        position = self.portfolio.position(instrument)
+        if stop_loss is None or not position:
+            return None
+        level = price * (1 - stop_loss) if position > 0 else price * (1 + stop_loss)
+        return level, -position
+
+
+# ----------------------------------------------------------------------
+# VectorizedEngine
+# ----------------------------------------------------------------------
+
+
+@dataclass(slots=True)
+class VectorizedResult:
+    # position held at the close of every bar, per instrument
+    positions: list[np.ndarray]
+    # cash flows of fills and costs of every bar, per instrument
+    cash_flows: list[np.ndarray]
+    equity: pd.Series
+    fills: int
+    run_time: float
+
+
+class VectorizedEngine:
+    """
+    Runs a SignalStrategy on whole arrays: target positions are computed
+    once per instrument and fills, stops, costs and equity are derived
+    with numpy operations, with no per-bar Python code. Same semantics as
+    Engine with the same strategy.
+    """
+
+    def __init__(
+        self,
+        universe: Universe | list[Instrument],
+        strategy: SignalStrategy,
+        cash: float = 0.0,
+        timeframe: str = "1min",
+        commission: float = 0.0,
+    ):
+        self.universe = _as_universe(universe)
+        self.strategy = strategy
+        self.cash = cash
+        self.timeframe = timeframe
+        self.commission = commission
+
+    def run(self) -> VectorizedResult:
+        start = perf_counter()
+        positions, cash_flows, values = [], [], []
+        fills = 0
+        for instrument in self.universe:
+            data = instrument.market_data[self.timeframe]
+            position, cash_flow, n_fills = backtest_signals(
+                data,
+                self.strategy.targets(data),
+                stop_loss=self.strategy.stop_loss,
+                commission=self.commission,
+            )
+            positions.append(position)
+            cash_flows.append(cash_flow)
+            fills += n_fills
+            values.append(
+                pd.Series(
+                    np.cumsum(cash_flow) + position * data["close"].to_numpy(float),
+                    index=_timestamps(data),
+                )
+            )
+
+        # each instrument keeps its last value between its bars
+        equity = pd.concat(values, axis=1).sort_index().ffill().fillna(0.0)
+        equity = equity.sum(axis=1) + self.cash
+        equity.index = pd.to_datetime(equity.index, utc=True).tz_convert(
+            STANDARD_TIMEZONE
+        )
+        return VectorizedResult(
+            positions, cash_flows, equity, fills, perf_counter() - start
+        )
+
 
-        self.universe = universe
+def backtest_signals(
+    data: pd.DataFrame,
+    targets: np.ndarray,
+    stop_loss: float | None = None,
+    commission: float = 0.0,
+) -> tuple[np.ndarray, np.ndarray, int]:
+    """
+    Vectorized backtest of the target positions of an instrument, same
+    fills as Engine: the target of bar t is filled at the open of bar
+    t + 1, and stopped out intrabar if stop_loss is set.
 
-    def run(self):
-        while True:
+    Returns the position held at the close of every bar, the cash flow
+    of every bar (fills and costs) and the number of fills.
+    """
+    opens, highs, lows, closes = (
+        data[col].to_numpy(dtype=float) for col in ("open", "high", "low", "close")
+    )
+    # position the strategy wants during each bar
+    held = np.zeros(len(targets))
+    held[1:] = targets[:-1]
+    # bars where the target changes, each one starts a run of bars
+    changes = np.diff(held, prepend=0.0) != 0
+    position = held
+    stop_quantity = np.zeros(len(held))
+    stop_price = np.zeros(len(held))
+
+    if stop_loss is not None and len(held):
+        # the first bar never has a change, it starts run 0
+        run = np.cumsum(changes)
+        run_start = np.flatnonzero(changes | (np.arange(len(held)) == 0))
+        entry = opens[run_start][run]
+        long = held > 0
+        level = np.where(long, entry * (1 - stop_loss), entry * (1 + stop_loss))
+        hit = (long & (lows <= level)) | ((held < 0) & (highs >= level))
+        hits = np.cumsum(hit)
+        hits_before_run = (hits - hit)[run_start][run]
+        stopped = hits - hits_before_run > 0
+        exit_bar = hit & (hits - hits_before_run == 1)
+
+        position = np.where(stopped, 0.0, held)
+        stop_quantity = np.where(exit_bar, -held, 0.0)
+        stop_price = np.where(
+            long, np.minimum(opens, level), np.maximum(opens, level)
+        )
+
+    previous = np.zeros(len(held))
+    previous[1:] = position[:-1]
+    # a stopped position is flat when the next target is filled
+    quantity = np.where(changes, held - previous, 0.0)
+    cash_flow = (
+        -(quantity * opens)
+        - stop_quantity * stop_price
+        - (np.abs(quantity) + np.abs(stop_quantity)) * commission
+    )
+    n_fills = int(np.count_nonzero(quantity) + np.count_nonzero(stop_quantity))
+    return position, cash_flow, n_fills
+
+
+def _as_universe(universe: Universe | list[Instrument]) -> Universe:
+    return universe if isinstance(universe, Universe) else Universe(universe)
+
+
+def _timestamps(data: pd.DataFrame) -> np.ndarray:
+    """int64 UTC nanoseconds of a sorted DataFrame index."""
+    if not data.index.is_monotonic_increasing:
+        raise ValueError("Market data index must be sorted.")
+    index = data.index
+    if index.tz is None:
+        index = index.tz_localize(STANDARD_TIMEZONE)
+    return index.as_unit("ns").asi8
+
+
+if __name__ == "__main__":
+    # demonstration: per-event overhead on synthetic 1min bars
+    from kaos.data.data import FuturesReferenceData
+    from kaos.data.enums import AssetClass, DataProvider
+    from kaos.data.instruments import FuturesContract
+    from kaos.data.symbol import Symbol
+
+    class NoOp(Strategy):
+        def init(self):
+            pass
+
+        def on_bar(self, bar: BarEvent) -> None:
             pass
+
+    rng = np.random.default_rng(0)
+    index = pd.date_range(
+        "2024-01-01", periods=200_000, freq="1min", tz=STANDARD_TIMEZONE
+    )
+    universe = []
+    for code in ("H", "M", "U", "Z", "F"):
+        close = 100 + np.cumsum(rng.normal(0, 0.01, len(index)))
+        bars = pd.DataFrame(
+            {"open": close, "high": close, "low": close, "close": close, "volume": 1},
+            index=index,
+        )
+        reference_data = FuturesReferenceData(
+            symbol=Symbol(f"6E-{code}-2024"),
+            provider=DataProvider.FIRSTRATE,
+            asset_class=AssetClass.FX,
+            activation=index[0],
+            expiration=index[-1],
+        )
+        universe.append(FuturesContract(reference_data, {"1min": bars, "D": bars}))
+
+    stats = Engine(universe, [NoOp()], Portfolio()).run()
+    print(
+        f"{stats.events} bars: {stats.events_per_second / 1e6:.2f}M bars/s,"
+        f" {stats.ns_per_event:.0f} ns/event (setup {stats.setup_time:.2f}s)"
+    )
+
+    # same signal strategy, event-driven and vectorized
+    class Crossover(SignalStrategy):
+        params = {"fast": 50, "slow": 200, "stop_loss": 0.001}
+
+        def signals(self, data: pd.DataFrame) -> np.ndarray:
+            fast = data["close"].rolling(self.params["fast"]).mean()
+            slow = data["close"].rolling(self.params["slow"]).mean()
+            return np.sign(fast - slow).to_numpy()
+
+    portfolio = Portfolio(cash=1_000)
+    stats = Engine(universe, [Crossover()], portfolio, commission=0.01).run()
+    result = VectorizedEngine(universe, Crossover(), 1_000, commission=0.01).run()
+    print(
+        f"event-driven: {stats.setup_time + stats.run_time:.2f}s,"
+        f" {stats.fills} fills, equity {portfolio.equity:.4f}\n"
+        f"vectorized:   {result.run_time:.2f}s,"
+        f" {result.fills} fills, equity {result.equity.iloc[-1]:.4f}"
+    )
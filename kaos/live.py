@@ -0,0 +1,397 @@
+"""
+Live market data on asyncio.
+
+A Feed delivers bars (or ticks, as single price bars) as fixed-size
+binary frames; LiveEngine reads them into a bounded queue and dispatches
+them to the strategies with the semantics of Engine. When the queue is
+full the feed stops being read, so TCP flow control pushes back on the
+sender instead of buffering without limit. The latency from the arrival
+of a frame to the strategy callback is measured for every event.
+
+ReplayServer streams Catalog data over a local socket with the same
+protocol, at real time, any multiple of it or as fast as possible, so
+the whole live path runs offline.
+
+Protocol: a JSON header line {"symbols": [...], "timeframe": ...}
+followed by FRAME records, until the server closes the connection.
+"""
+
+import asyncio
+import heapq
+import json
+import struct
+from abc import ABC, abstractmethod
+from array import array
+from collections.abc import AsyncIterator
+from dataclasses import dataclass, field
+from time import perf_counter, perf_counter_ns
+
+import numpy as np
+import pandas as pd
+
+from kaos.data.enums import DataProvider
+from kaos.data.loading import Catalog
+from kaos.data.symbol import Symbol
+from kaos.engine import BarEvent, Engine, EngineStats
+from kaos.log_utils import get_logger
+from kaos.risk import Portfolio
+from kaos.strategy import Strategy
+from kaos.time_utils import STANDARD_TIMEZONE
+
+# logger config
+logger = get_logger(__name__)
+# ----------------------------------------------------------------------
+# constants
+# ----------------------------------------------------------------------
+
+# kind, instrument, timestamp (UTC ns), open, high, low, close, volume
+FRAME = struct.Struct("<iiqddddd")
+KIND_BAR = 0
+# close is the price and volume the size, dispatched as a single price bar
+KIND_TICK = 1
+# frames written between two flow control checks when not paced
+DRAIN_EVERY = 256
+DEFAULT_QUEUE_SIZE = 1024
+
+# a frame as delivered by feeds, with its arrival time (perf_counter_ns)
+Message = tuple[int, int, int, float, float, float, float, float, int]
+
+
+# ----------------------------------------------------------------------
+# feeds
+# ----------------------------------------------------------------------
+
+
+class Feed(ABC):
+    """Source of live frames. Adapters for live providers (e.g.
+    DataProvider.DATABENTO) implement the same interface."""
+
+    @abstractmethod
+    async def connect(self) -> list[str]:
+        """Opens the feed, returns the symbols of the instruments."""
+
+    @abstractmethod
+    def messages(self) -> AsyncIterator[Message]:
+        """Frames in arrival order, until the feed ends."""
+
+    @abstractmethod
+    async def close(self) -> None:
+        pass
+
+
+class SocketFeed(Feed):
+    """Client of a server speaking the kaos frame protocol, e.g. a
+    ReplayServer."""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0):
+        self.host = host
+        self.port = port
+        self._reader: asyncio.StreamReader | None = None
+        self._writer: asyncio.StreamWriter | None = None
+
+    async def connect(self) -> list[str]:
+        self._reader, self._writer = await asyncio.open_connection(self.host, self.port)
+        header = json.loads(await self._reader.readline())
+        return header["symbols"]
+
+    async def messages(self) -> AsyncIterator[Message]:
+        size, unpack = FRAME.size, FRAME.unpack
+        while True:
+            try:
+                frame = await self._reader.readexactly(size)
+            except asyncio.IncompleteReadError:
+                return
+            yield (*unpack(frame), perf_counter_ns())
+
+    async def close(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+            await self._writer.wait_closed()
+
+
+# ----------------------------------------------------------------------
+# ReplayServer
+# ----------------------------------------------------------------------
+
+
+class ReplayServer:
+    """
+    Streams the bars of some instruments, merged in time order, to every
+    client connecting to it.
+
+    speed is the number of seconds of data sent per second: 1 replays in
+    real time, 60 a minute per second, None as fast as the client reads.
+    """
+
+    def __init__(
+        self,
+        data: dict[str, pd.DataFrame],
+        timeframe: str = "1min",
+        speed: float | None = None,
+        host: str = "127.0.0.1",
+        port: int = 0,
+    ):
+        self.data = data
+        self.timeframe = timeframe
+        self.speed = speed
+        self.host = host
+        self.port = port
+        self._server: asyncio.Server | None = None
+
+    @classmethod
+    def from_catalog(
+        cls,
+        catalog: Catalog,
+        symbols: list[Symbol],
+        provider: DataProvider,
+        timeframe: str = "1min",
+        start: pd.Timestamp | None = None,
+        end: pd.Timestamp | None = None,
+        **kwargs,
+    ) -> "ReplayServer":
+        # contracts without a known expiration rule require the daily timeframe
+        timeframes = list(dict.fromkeys([timeframe, "D"]))
+        contracts = catalog.get_futures_contracts(
+            symbols, provider, timeframes, is_raw_data=True, start=start, end=end
+        )
+        data = {c.symbol.value: c.market_data[timeframe] for c in contracts}
+        return cls(data, timeframe, **kwargs)
+
+    # ------------------------------------------------------------------
+    # methods
+    # ------------------------------------------------------------------
+
+    async def start(self) -> None:
+        self._server = await asyncio.start_server(self._serve, self.host, self.port)
+        # the actual port, if 0 was given
+        self.port = self._server.sockets[0].getsockname()[1]
+        logger.info(f"Replay server listening on {self.host}:{self.port}")
+
+    async def close(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+
+    async def __aenter__(self) -> "ReplayServer":
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.close()
+
+    # private methods --------------------------------------------------
+
+    async def _serve(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        header = {"symbols": list(self.data), "timeframe": self.timeframe}
+        writer.write(json.dumps(header).encode() + b"\n")
+        loop = asyncio.get_running_loop()
+        start_wall = loop.time()
+        start_data = None
+        try:
+            for sent, (timestamp, frame) in enumerate(self._frames()):
+                if self.speed is not None:
+                    start_data = timestamp if start_data is None else start_data
+                    due = (timestamp - start_data) / 1e9 / self.speed
+                    delay = due - (loop.time() - start_wall)
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+                writer.write(frame)
+                # waits while the client does not keep up
+                if self.speed is not None or sent % DRAIN_EVERY == 0:
+                    await writer.drain()
+            await writer.drain()
+        except (ConnectionResetError, BrokenPipeError):
+            logger.warning("Replay client disconnected.")
+        finally:
+            writer.close()
+
+    def _frames(self):
+        """(timestamp, frame) of every bar, merged in time order."""
+        streams = []
+        for n, data in enumerate(self.data.values()):
+            index = data.index
+            if index.tz is None:
+                index = index.tz_localize(STANDARD_TIMEZONE)
+            columns = [index.as_unit("ns").asi8] + [
+                data[col].to_numpy(dtype=float)
+                for col in ("open", "high", "low", "close", "volume")
+            ]
+            streams.append(_bar_frames(n, columns))
+        return heapq.merge(*streams, key=lambda item: item[0])
+
+
+def _bar_frames(n: int, columns: list[np.ndarray]):
+    pack = FRAME.pack
+    for timestamp, *values in zip(*(column.tolist() for column in columns)):
+        yield timestamp, pack(KIND_BAR, n, timestamp, *values)
+
+
+# ----------------------------------------------------------------------
+# LiveEngine
+# ----------------------------------------------------------------------
+
+
+@dataclass(slots=True)
+class LiveStats(EngineStats):
+    # arrival to strategy callback of every event, in nanoseconds
+    latencies: array = field(default_factory=lambda: array("q"))
+    max_queue_depth: int = 0
+
+    def latency_percentiles(
+        self, q: tuple[float, ...] = (50, 90, 99, 100)
+    ) -> dict[float, float]:
+        """Latency percentiles in microseconds."""
+        if not self.latencies:
+            return {}
+        values = np.percentile(np.frombuffer(self.latencies, dtype=np.int64), q)
+        return dict(zip(q, (values / 1e3).tolist()))
+
+
+class LiveEngine(Engine):
+    """
+    Engine driven by a Feed instead of stored market data: same order,
+    stop and portfolio semantics. Instruments are only known by the
+    symbols sent by the feed, kept in symbols, and universe stays empty:
+    strategies needing stored data at init (e.g. SignalStrategy) are not
+    supported.
+    """
+
+    def __init__(
+        self,
+        feed: Feed,
+        strategies: list[Strategy],
+        portfolio: Portfolio,
+        commission: float = 0.0,
+        queue_size: int = DEFAULT_QUEUE_SIZE,
+    ):
+        super().__init__([], strategies, portfolio, commission=commission)
+        self.feed = feed
+        self.queue_size = queue_size
+        # symbols as sent by the feed, not necessarily kaos symbols
+        self.symbols: list[str] = []
+        self.stats = LiveStats()
+
+    async def run_live(self) -> LiveStats:
+        start = perf_counter()
+        self.symbols = await self.feed.connect()
+        n_instruments = len(self.symbols)
+        self._pending = [0.0] * n_instruments
+        self._pending_stop = [None] * n_instruments
+        self._stops = [None] * n_instruments
+        self.portfolio.reserve(n_instruments)
+        events = [BarEvent(n, symbol) for n, symbol in enumerate(self.symbols)]
+        for strategy in self.strategies:
+            strategy.engine = self
+            strategy.init()
+        handlers = [
+            strategy.on_bar
+            for strategy in self.strategies
+            if type(strategy).on_bar is not Strategy.on_bar
+        ]
+        self.stats = stats = LiveStats(setup_time=perf_counter() - start)
+
+        queue: asyncio.Queue[Message | None] = asyncio.Queue(self.queue_size)
+        producer = asyncio.create_task(self._produce(queue))
+        start = perf_counter()
+        try:
+            await self._consume(queue, events, handlers)
+            # raises the exception of the feed, if it failed
+            await producer
+        finally:
+            producer.cancel()
+            await self.feed.close()
+        stats.run_time = perf_counter() - start
+        logger.info(
+            f"{stats.events} live events, latency (us) {stats.latency_percentiles()}"
+        )
+        return stats
+
+    # private methods --------------------------------------------------
+
+    async def _produce(self, queue: asyncio.Queue) -> None:
+        try:
+            async for message in self.feed.messages():
+                # blocks while the queue is full: the feed is not read
+                await queue.put(message)
+        finally:
+            # the consumer stops at the sentinel, also when the feed fails;
+            # the producer is only cancelled once the consumer is gone
+            if not asyncio.current_task().cancelling():
+                await queue.put(None)
+
+    async def _consume(
+        self, queue: asyncio.Queue, events: list[BarEvent], handlers: list
+    ) -> None:
+        stats: LiveStats = self.stats
+        latencies = stats.latencies
+        portfolio = self.portfolio
+        last = None
+        while (message := await queue.get()) is not None:
+            stats.max_queue_depth = max(stats.max_queue_depth, queue.qsize() + 1)
+            kind, n, timestamp, open_, high, low, close, volume, arrival = message
+            if kind == KIND_TICK:
+                open_ = high = low = close
+            elif kind != KIND_BAR:
+                raise ValueError(f"Unknown frame kind: {kind}")
+            if timestamp != last:
+                if last is not None:
+                    portfolio.record(last)
+                last = timestamp
+            event = events[n]
+            event.timestamp = timestamp
+            event.row += 1
+            event.open, event.high, event.low = open_, high, low
+            event.close, event.volume = close, volume
+
+            if self._pending[n] or self._stops[n] is not None:
+                stats.fills += self._execute(n, event)
+            portfolio.mark(n, close)
+            latencies.append(perf_counter_ns() - arrival)
+            for handler in handlers:
+                handler(event)
+            stats.events += 1
+        if last is not None:
+            portfolio.record(last)
+
+
+if __name__ == "__main__":
+    # demonstration: replay of synthetic bars through the live path
+    class Momentum(Strategy):
+        def init(self):
+            self.previous = {}
+
+        def on_bar(self, bar: BarEvent) -> None:
+            previous = self.previous.get(bar.instrument, bar.close)
+            position = self.engine.portfolio.position(bar.instrument)
+            if bar.close > previous and position <= 0:
+                self.order(bar.instrument, 1 - position)
+            elif bar.close < previous and position >= 0:
+                self.order(bar.instrument, -1 - position)
+            self.previous[bar.instrument] = bar.close
+
+    rng = np.random.default_rng(0)
+    index = pd.date_range(
+        "2024-01-02 09:30", periods=20_000, freq="1min", tz=STANDARD_TIMEZONE
+    )
+    data = {}
+    for code in ("H", "M"):
+        close = 100 + np.cumsum(rng.normal(0, 0.01, len(index)))
+        data[f"6E-{code}-2024"] = pd.DataFrame(
+            {"open": close, "high": close, "low": close, "close": close, "volume": 1},
+            index=index,
+        )
+
+    async def main() -> None:
+        async with ReplayServer(data, speed=None) as server:
+            feed = SocketFeed(server.host, server.port)
+            engine = LiveEngine(feed, [Momentum()], Portfolio(), queue_size=256)
+            stats = await engine.run_live()
+        print(
+            f"{stats.events} events in {stats.run_time:.2f}s,"
+            f" {stats.fills} fills, max queue depth {stats.max_queue_depth}"
+        )
+        print(f"latency percentiles (us): {stats.latency_percentiles()}")
+
+    asyncio.run(main())
@@ -1,2 +1,239 @@
+"""
+Portfolio ledger of a backtest.
+
+State per instrument is kept as a struct of arrays (positions and last
+prices, indexed by the position of the instrument in the engine
+universe) and the market value of the portfolio is updated
+incrementally, so marking a bar costs O(1) whatever the number of
+instruments. Fills are rows of a preallocated structured array that
+doubles its capacity when full, and the equity history is a set of
+typed array.array columns: no Python object is kept per fill or per
+timestamp.
+"""
+
+from array import array
+from collections.abc import Iterator
+
+import numpy as np
+
+# ----------------------------------------------------------------------
+# constants
+# ----------------------------------------------------------------------
+
+FILL_DTYPE = np.dtype(
+    [
+        ("timestamp", "<i8"),  # UTC nanoseconds
+        ("instrument", "<i8"),
+        ("quantity", "<f8"),
+        ("price", "<f8"),
+        ("cost", "<f8"),
+    ]
+)
+HISTORY_DTYPE = np.dtype(
+    [
+        ("timestamp", "<i8"),
+        ("cash", "<f8"),
+        ("equity", "<f8"),
+        ("exposure", "<f8"),
+    ]
+)
+INITIAL_CAPACITY = 1024
+
+
+class Fill:
+    """A fill of the ledger, built on demand from the fill arrays."""
+
+    __slots__ = ("timestamp", "instrument", "quantity", "price", "cost")
+
+    def __init__(
+        self,
+        timestamp: int,
+        instrument: int,
+        quantity: float,
+        price: float,
+        cost: float = 0.0,
+    ):
+        self.timestamp = timestamp
+        self.instrument = instrument
+        self.quantity = quantity
+        self.price = price
+        self.cost = cost
+
+    def __repr__(self) -> str:
+        return (
+            f"Fill({self.timestamp}, instrument={self.instrument},"
+            f" quantity={self.quantity}, price={self.price}, cost={self.cost})"
+        )
+
+
+class _Records:
+    """Structured array of rows appended one at a time, preallocated and
+    grown by doubling its capacity."""
+
+    __slots__ = ("_data", "_size")
+
+    def __init__(self, dtype: np.dtype, capacity: int = INITIAL_CAPACITY):
+        self._data = np.empty(max(capacity, 1), dtype=dtype)
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def append(self, row: tuple) -> None:
+        if self._size == len(self._data):
+            grown = np.empty(2 * len(self._data), dtype=self._data.dtype)
+            grown[: self._size] = self._data
+            self._data = grown
+        self._data[self._size] = row
+        self._size += 1
+
+    def view(self) -> np.ndarray:
+        """Rows appended so far, a view valid until the next append."""
+        return self._data[: self._size]
+
+
+# ----------------------------------------------------------------------
+# Portfolio
+# ----------------------------------------------------------------------
+
+
 class Portfolio:
-    pass
+    """
+    Positions and cash of a backtest, driven by the engine: fill is
+    called when an order is executed, mark when a new price of an
+    instrument is seen and record once all the bars of a timestamp are
+    processed. Instruments are identified by their position in the
+    engine universe.
+    """
+
+    def __init__(
+        self,
+        cash: float = 0.0,
+        n_instruments: int = 0,
+        capacity: int = INITIAL_CAPACITY,
+    ):
+        self.initial_cash = cash
+        self.cash = cash
+        # per instrument state, array.array items are read and written as
+        # plain floats, much cheaper than numpy scalars on every bar
+        self._positions = array("d")
+        self._prices = array("d")
+        self.reserve(n_instruments)
+        # sums over instruments of position * price and its absolute value
+        self._value = 0.0
+        self._exposure = 0.0
+        self._fills = _Records(FILL_DTYPE, capacity)
+        # history columns, appended on every timestamp: array.array
+        # appends are amortized O(1) and much cheaper than numpy rows
+        self._history = {
+            name: array("q" if dtype.kind == "i" else "d")
+            for name, (dtype, _) in HISTORY_DTYPE.fields.items()
+        }
+        self._record = [column.append for column in self._history.values()]
+
+    # properties -------------------------------------------------------
+
+    @property
+    def equity(self) -> float:
+        """Cash plus the market value of the positions at last prices."""
+        return self.cash + self._value
+
+    @property
+    def exposure(self) -> float:
+        """Gross market value of the positions at last prices."""
+        return self._exposure
+
+    @property
+    def positions(self) -> np.ndarray:
+        """Position of every instrument (a copy)."""
+        return np.array(self._positions)
+
+    @property
+    def prices(self) -> np.ndarray:
+        """Last price of every instrument (a copy)."""
+        return np.array(self._prices)
+
+    @property
+    def fills(self) -> np.ndarray:
+        """Fills as FILL_DTYPE records."""
+        return self._fills.view()
+
+    @property
+    def history(self) -> np.ndarray:
+        """Cash, equity and exposure of every recorded timestamp as
+        HISTORY_DTYPE records."""
+        out = np.empty(len(self._history["timestamp"]), dtype=HISTORY_DTYPE)
+        for name, column in self._history.items():
+            out[name] = column
+        return out
+
+    @property
+    def timestamps(self) -> np.ndarray:
+        return np.array(self._history["timestamp"], dtype=np.int64)
+
+    @property
+    def equity_curve(self) -> np.ndarray:
+        return np.array(self._history["equity"])
+
+    @property
+    def exposure_curve(self) -> np.ndarray:
+        return np.array(self._history["exposure"])
+
+    # ------------------------------------------------------------------
+    # methods
+    # ------------------------------------------------------------------
+
+    def reserve(self, n_instruments: int) -> None:
+        """Makes room for instruments 0 to n_instruments - 1."""
+        missing = n_instruments - len(self._positions)
+        if missing > 0:
+            self._positions.extend([0.0] * missing)
+            self._prices.extend([0.0] * missing)
+
+    def fill(
+        self,
+        timestamp: int,
+        instrument: int,
+        quantity: float,
+        price: float,
+        cost: float = 0.0,
+    ) -> None:
+        """Executes quantity (negative to sell) of an instrument at price,
+        paying cost on top."""
+        self.reserve(instrument + 1)
+        old_position = self._positions[instrument]
+        old_price = self._prices[instrument]
+        position = old_position + quantity
+        self._value += position * price - old_position * old_price
+        self._exposure += abs(position) * price - abs(old_position) * old_price
+        self._positions[instrument] = position
+        self._prices[instrument] = price
+        self.cash -= quantity * price + cost
+        self._fills.append((timestamp, instrument, quantity, price, cost))
+
+    def mark(self, instrument: int, price: float) -> None:
+        """Updates the last price of an instrument, reserved beforehand."""
+        position = self._positions[instrument]
+        if position:
+            change = price - self._prices[instrument]
+            self._value += position * change
+            self._exposure += abs(position) * change
+        self._prices[instrument] = price
+
+    def record(self, timestamp: int) -> None:
+        """Appends cash, equity and exposure to the history."""
+        timestamps, cash, equity, exposure = self._record
+        timestamps(timestamp)
+        cash(self.cash)
+        equity(self.cash + self._value)
+        exposure(self._exposure)
+
+    def position(self, instrument: int) -> float:
+        if instrument >= len(self._positions):
+            return 0.0
+        return self._positions[instrument]
+
+    def iter_fills(self) -> Iterator[Fill]:
+        """Fills as Fill objects, built one at a time."""
+        for row in self._fills.view().tolist():
+            yield Fill(*row)
@@ -1,7 +1,104 @@
 from abc import ABC, abstractmethod
+from typing import TYPE_CHECKING, Any
+
+import numpy as np
+import pandas as pd
+
+if TYPE_CHECKING:
+    from kaos.engine import BarEvent, Engine
 
 
 class Strategy(ABC):
+    # set by the engine running the strategy, before init is called
+    engine: "Engine | None" = None
+    # default values of the parameters, merged with the ones of the
+    # parent classes and overridden by the keywords given to __init__
+    params: dict[str, Any] = {}
+
+    def __init__(self, **params):
+        defaults = {}
+        for cls in reversed(type(self).__mro__):
+            defaults.update(cls.__dict__.get("params", {}))
+        unknown = set(params) - set(defaults)
+        if unknown:
+            raise ValueError(
+                f"Unknown parameters of {type(self).__name__}: {sorted(unknown)}"
+            )
+        self.params = defaults | params
+
     @abstractmethod
     def init(self):
         pass
+
+    def on_bar(self, bar: "BarEvent") -> None:
+        """Called for every bar of the universe, in time order. The event
+        is reused by the engine, copy its fields to keep them."""
+
+    def order(
+        self, instrument: int, quantity: float, stop_loss: float | None = None
+    ) -> None:
+        """Market order, filled at the open of the next bar of the
+        instrument (position in the engine universe). See Engine.submit
+        for stop_loss."""
+        self.engine.submit(instrument, quantity, stop_loss)
+
+
+class SignalStrategy(Strategy):
+    """
+    Strategy whose positions are a pure function of bar data: signals
+    returns the target position of every bar, decided at its close and
+    filled at the open of the next bar. It runs bar by bar in Engine or,
+    with the same results, on whole arrays in VectorizedEngine.
+
+    Positions are stopped out intrabar when the price moves stop_loss
+    (a fraction of the entry price) against them, and stay flat until
+    the target changes. If capital is set, signals are target weights of
+    capital, converted to units with the close of the signal bar. Both
+    are parameters.
+
+    In Engine it must be the only strategy trading its instruments.
+    """
+
+    params = {"stop_loss": None, "capital": None}
+
+    @property
+    def stop_loss(self) -> float | None:
+        return self.params["stop_loss"]
+
+    @property
+    def capital(self) -> float | None:
+        return self.params["capital"]
+
+    @abstractmethod
+    def signals(self, data: pd.DataFrame) -> np.ndarray:
+        pass
+
+    def init(self):
+        timeframe = self.engine.timeframe
+        self._targets = [
+            self.targets(instrument.market_data[timeframe]).tolist()
+            for instrument in self.engine.universe
+        ]
+        self._last = [0.0] * len(self._targets)
+
+    def on_bar(self, bar: "BarEvent") -> None:
+        n = bar.instrument
+        target = self._targets[n][bar.row]
+        if target == self._last[n]:
+            return
+        self._last[n] = target
+        quantity = target - self.engine.portfolio.position(n)
+        if quantity:
+            self.order(n, quantity, self.stop_loss)
+
+    def targets(self, data: pd.DataFrame) -> np.ndarray:
+        """Target positions in units, missing signals are flat."""
+        signals = np.asarray(self.signals(data), dtype=float)
+        if signals.shape != (len(data),):
+            raise ValueError(
+                f"Signals must have one value per bar ({len(data)}),"
+                f" got shape {signals.shape}"
+            )
+        if self.capital is not None:
+            signals = signals * self.capital / data["close"].to_numpy(dtype=float)
+        return np.nan_to_num(signals, nan=0.0, posinf=0.0, neginf=0.0)
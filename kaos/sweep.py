@@ -0,0 +1,321 @@
+"""
+Parallel parameter sweeps.
+
+Market data of the universe is written once to memory-mapped .npy files
+(see kaos.data.store) and every worker process attaches to them: the
+columns of the DataFrames given to strategies are views on the maps,
+so workers share the pages of the OS cache instead of receiving pickled
+copies. Each run only ships its parameters, and its metrics are yielded
+as soon as it finishes, with a bounded number of runs in flight, so the
+memory of a sweep does not grow with the number of configurations.
+"""
+
+import itertools
+import os
+import tempfile
+from collections.abc import Callable, Iterable, Iterator, Sequence
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+import pandas as pd
+
+from kaos.data.data import ReferenceData, Universe
+from kaos.data.instruments import Instrument
+from kaos.data.store import to_frame, write_records
+from kaos.engine import Engine, VectorizedEngine
+from kaos.log_utils import get_logger
+from kaos.risk import Portfolio
+from kaos.strategy import SignalStrategy, Strategy
+
+# logger config
+logger = get_logger(__name__)
+# ----------------------------------------------------------------------
+
+
+@dataclass(slots=True)
+class SweepResult:
+    run: int  # position of the parameters in the sweep
+    params: dict[str, Any]
+    metrics: dict[str, float] = field(default_factory=dict)
+    error: str | None = None
+
+
+# ----------------------------------------------------------------------
+# parameter sets
+# ----------------------------------------------------------------------
+
+
+def grid(**values: Sequence) -> Iterator[dict[str, Any]]:
+    """Every combination of the given parameter values.
+
+    >>> list(grid(fast=[10, 20], slow=[100]))
+    [{'fast': 10, 'slow': 100}, {'fast': 20, 'slow': 100}]
+    """
+    names = list(values)
+    for combination in itertools.product(*values.values()):
+        yield dict(zip(names, combination))
+
+
+def random_search(
+    space: dict[str, Sequence | Callable[[np.random.Generator], Any]],
+    n: int,
+    seed: int | None = None,
+) -> Iterator[dict[str, Any]]:
+    """n parameter sets drawn from space: values are picked from
+    sequences, or drawn by calling a function with the generator (e.g.
+    lambda rng: rng.uniform(0.001, 0.01))."""
+    rng = np.random.default_rng(seed)
+    for _ in range(n):
+        yield {
+            name: (
+                values(rng) if callable(values) else values[rng.integers(len(values))]
+            )
+            for name, values in space.items()
+        }
+
+
+# ----------------------------------------------------------------------
+# SweepRunner
+# ----------------------------------------------------------------------
+
+
+class SweepRunner:
+    def __init__(
+        self,
+        universe: Universe | list[Instrument],
+        strategy: type[Strategy],
+        timeframe: str = "1min",
+        cash: float = 0.0,
+        commission: float = 0.0,
+        max_workers: int | None = None,
+        directory: Path | None = None,
+    ):
+        """
+        Args:
+            universe (Universe | list[Instrument]): instruments of every
+                run.
+            strategy (type[Strategy]): instantiated with the parameters
+                of each run. SignalStrategy subclasses run in the
+                VectorizedEngine, the others in the event-driven Engine.
+            max_workers (int | None): processes, defaults to the CPUs.
+            directory (Path | None): where the shared market data is
+                written, a temporary directory if None.
+        """
+        self.universe = (
+            universe if isinstance(universe, Universe) else Universe(universe)
+        )
+        self.strategy = strategy
+        self.timeframe = timeframe
+        self.cash = cash
+        self.commission = commission
+        self.max_workers = max_workers
+        self.directory = directory
+
+    # ------------------------------------------------------------------
+    # methods
+    # ------------------------------------------------------------------
+
+    def run(self, param_sets: Iterable[dict[str, Any]]) -> Iterator[SweepResult]:
+        """Yields the result of every parameter set as runs finish, not
+        in order. param_sets is consumed lazily."""
+        with tempfile.TemporaryDirectory(dir=self.directory) as directory:
+            shared = self._share(Path(directory))
+            with ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                initializer=_init_worker,
+                initargs=(shared, self.timeframe),
+            ) as executor:
+                yield from self._stream(executor, param_sets)
+
+    # private methods --------------------------------------------------
+
+    def _share(self, directory: Path) -> list[tuple[ReferenceData, Path, str | None]]:
+        shared = []
+        for n, instrument in enumerate(self.universe):
+            data = instrument.market_data[self.timeframe]
+            path = write_records(directory / f"{n}.npy", data)
+            shared.append((instrument.reference_data, path, data.index.tz))
+        return shared
+
+    def _stream(
+        self, executor: ProcessPoolExecutor, param_sets: Iterable[dict[str, Any]]
+    ) -> Iterator[SweepResult]:
+        # a few runs per worker in flight keep workers busy while results
+        # are consumed, without submitting the whole sweep up front
+        max_in_flight = 2 * (self.max_workers or os.cpu_count() or 1)
+        runs = enumerate(param_sets)
+        in_flight: set[Future] = set()
+        while True:
+            for run, params in itertools.islice(runs, max_in_flight - len(in_flight)):
+                in_flight.add(
+                    executor.submit(
+                        _run,
+                        run,
+                        self.strategy,
+                        params,
+                        self.timeframe,
+                        self.cash,
+                        self.commission,
+                    )
+                )
+            if not in_flight:
+                return
+            done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                result: SweepResult = future.result()
+                if result.error is not None:
+                    logger.error(f"Run {result.run} {result.params}: {result.error}")
+                yield result
+
+
+# ----------------------------------------------------------------------
+# metrics
+# ----------------------------------------------------------------------
+
+
+def equity_metrics(equity: np.ndarray, fills: int) -> dict[str, float]:
+    """Summary of an equity curve sampled every bar."""
+    equity = np.asarray(equity, dtype=float)
+    peak = np.maximum.accumulate(equity)
+    changes = np.diff(equity)
+    std = changes.std() if len(changes) else 0.0
+    return {
+        "equity": float(equity[-1]),
+        "pnl": float(equity[-1] - equity[0]),
+        "max_drawdown": float((peak - equity).max()),
+        # per bar, not annualized
+        "sharpe": float(changes.mean() / std) if std else 0.0,
+        "fills": fills,
+    }
+
+
+def backtest_metrics(
+    universe: Universe | list[Instrument],
+    strategy: Strategy,
+    timeframe: str = "1min",
+    cash: float = 0.0,
+    commission: float = 0.0,
+    vectorized: bool | None = None,
+) -> dict[str, float]:
+    """
+    Runs a strategy and summarizes its equity curve, see equity_metrics.
+    SignalStrategy instances run in the VectorizedEngine unless
+    vectorized is False, the others in the event-driven Engine. Both
+    curves start from cash, before the first bar, so their metrics are
+    the same for the same fills.
+    """
+    if vectorized is None:
+        vectorized = isinstance(strategy, SignalStrategy)
+    if vectorized:
+        result = VectorizedEngine(universe, strategy, cash, timeframe, commission).run()
+        equity, fills = result.equity.to_numpy(), result.fills
+    else:
+        portfolio = Portfolio(cash)
+        stats = Engine(universe, [strategy], portfolio, timeframe, commission).run()
+        equity, fills = portfolio.equity_curve, stats.fills
+    return equity_metrics(np.append(cash, equity), fills)
+
+
+# ----------------------------------------------------------------------
+# worker
+# ----------------------------------------------------------------------
+
+
+class _SharedInstrument(Instrument):
+    """Instrument of a worker, market data is a view on the shared map."""
+
+    def __init__(self, reference_data: ReferenceData, market_data: dict):
+        super().__init__(reference_data, market_data)
+
+    @property
+    def symbol(self):
+        return self.reference_data.symbol
+
+
+# universe of the worker process, set by _init_worker
+_universe = Universe([])
+
+
+def _init_worker(
+    shared: list[tuple[ReferenceData, Path, str | None]], timeframe: str
+) -> None:
+    global _universe
+    instruments = []
+    for reference_data, path, tz in shared:
+        records = np.load(path, mmap_mode="r")
+        data = to_frame(records, tz, copy=False)
+        instruments.append(_SharedInstrument(reference_data, {timeframe: data}))
+    _universe = Universe(instruments)
+
+
+def _run(
+    run: int,
+    strategy_cls: type[Strategy],
+    params: dict[str, Any],
+    timeframe: str,
+    cash: float,
+    commission: float,
+) -> SweepResult:
+    try:
+        metrics = backtest_metrics(
+            _universe, strategy_cls(**params), timeframe, cash, commission
+        )
+    except Exception as e:
+        return SweepResult(run, params, error=repr(e))
+    return SweepResult(run, params, metrics)
+
+
+if __name__ == "__main__":
+    # demonstration: grid search of a moving average crossover
+    import logging
+    from time import perf_counter
+
+    from kaos.data.data import FuturesReferenceData
+    from kaos.data.enums import AssetClass, DataProvider
+    from kaos.data.instruments import FuturesContract
+    from kaos.data.symbol import Symbol
+    from kaos.time_utils import STANDARD_TIMEZONE
+
+    class Crossover(SignalStrategy):
+        params = {"fast": 50, "slow": 200}
+
+        def signals(self, data: pd.DataFrame) -> np.ndarray:
+            fast = data["close"].rolling(self.params["fast"]).mean()
+            slow = data["close"].rolling(self.params["slow"]).mean()
+            return np.sign(fast - slow).to_numpy()
+
+    rng = np.random.default_rng(0)
+    index = pd.date_range(
+        "2024-01-01", periods=100_000, freq="1min", tz=STANDARD_TIMEZONE
+    )
+    universe = []
+    for code in ("H", "M", "U", "Z"):
+        close = 100 + np.cumsum(rng.normal(0, 0.01, len(index)))
+        bars = pd.DataFrame(
+            {"open": close, "high": close, "low": close, "close": close, "volume": 1},
+            index=index,
+        )
+        reference_data = FuturesReferenceData(
+            symbol=Symbol(f"6E-{code}-2024"),
+            provider=DataProvider.FIRSTRATE,
+            asset_class=AssetClass.FX,
+            activation=index[0],
+            expiration=index[-1],
+        )
+        universe.append(FuturesContract(reference_data, {"1min": bars, "D": bars}))
+
+    # engine logs every run
+    logging.getLogger("kaos.engine").setLevel(logging.WARNING)
+    param_sets = list(
+        grid(fast=[10, 20, 50], slow=[100, 200, 400], stop_loss=[None, 0.001])
+    )
+    start = perf_counter()
+    runner = SweepRunner(universe, Crossover, cash=1_000, commission=0.01)
+    results = sorted(runner.run(param_sets), key=lambda r: -r.metrics["equity"])
+    elapsed = perf_counter() - start
+    print(f"{len(results)} runs in {elapsed:.2f}s ({len(results) / elapsed:.1f}/s)")
+    for result in results[:3]:
+        print(result.params, result.metrics)
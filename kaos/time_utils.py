@@ -1,5 +1,16 @@
+from dataclasses import dataclass
+from functools import lru_cache
+
+import numpy as np
 import pandas as pd
-from kaos.data.enums import DayOfWeek, WeekOfMonth
+from pandas.tseries.holiday import (
+    AbstractHolidayCalendar,
+    GoodFriday,
+    Holiday,
+    nearest_workday,
+    sunday_to_monday,
+)
+from kaos.data.enums import DayOfWeek, ExpirationRule, WeekOfMonth
 
 # ----------------------------------------------------------------------
 # constants
@@ -13,6 +24,32 @@ STANDARD_TIMEZONE = "America/New_York"  # "UTC"
 CMES_CODE_TO_MONTH = dict(zip("FGHJKMNQUVXZ", range(1, 13)))
 MONTH_TO_CMES_CODE = dict(zip(range(1, 13), "FGHJKMNQUVXZ"))
 
+# yearly arrays kept by the session calendar cache
+CALENDAR_CACHE_SIZE = 512
+# years covered by the holidays of the session calendars
+HOLIDAY_YEARS = range(1970, 2100)
+
+# contract years covered by the precomputed expiration tables
+EXPIRATION_YEARS = range(1970, 2100)
+# expiration rule family of every product, CME and FirstRate codes
+EXPIRATION_RULES: dict[str, ExpirationRule] = {
+    **dict.fromkeys(
+        ("6E", "6B", "6J", "6A", "6S", "6N", "E6", "B6", "J6", "A6", "S6", "N6"),
+        ExpirationRule.CURRENCY,
+    ),
+    **dict.fromkeys(("6C", "D6"), ExpirationRule.CAD),
+    **dict.fromkeys(
+        ("ES", "NQ", "YM", "RTY", "EMD", "MES", "MNQ", "MYM", "M2K"),
+        ExpirationRule.EQUITY_INDEX,
+    ),
+    **dict.fromkeys(("ZT", "ZF", "TU", "FV"), ExpirationRule.SHORT_TREASURY),
+    **dict.fromkeys(("ZN", "ZB", "UB", "TN", "TY", "US"), ExpirationRule.TREASURY),
+    **dict.fromkeys(("CL", "MCL", "QM"), ExpirationRule.CRUDE_OIL),
+    **dict.fromkeys(("NG", "QG"), ExpirationRule.NATURAL_GAS),
+    **dict.fromkeys(("GC", "SI", "HG", "MGC", "SIL"), ExpirationRule.METALS),
+    **dict.fromkeys(("ZC", "ZS", "ZW", "ZM", "ZL", "ZO"), ExpirationRule.GRAINS),
+}
+
 # ----------------------------------------------------------------------
 # functions
 # ----------------------------------------------------------------------
@@ -21,21 +58,34 @@ MONTH_TO_CMES_CODE = dict(zip(range(1, 13), "FGHJKMNQUVXZ"))
 def month_of_year(month_code: str) -> int:
     """Given a futures month code, returns an int between 1 and 12
     representing the month of the year."""
-    code_to_month = dict(zip(MONTH_CODES, range(1, 13)))
-
     try:
-        return code_to_month[month_code.upper()]
+        return CMES_CODE_TO_MONTH[month_code.upper()]
     except KeyError:
         raise ValueError(
-            f"Invalid month code: {month_code!r}. Must be one of {list(code_to_month.keys())}"
+            f"Invalid month code: {month_code!r}. Must be one of {list(MONTH_CODES)}"
         )
 
 
+def full_year(year: int, reference: pd.Timestamp | None = None) -> int:
+    """4-digit year of a 2-digit contract year, the closest to the year of
+    reference (now by default)."""
+    reference_year = (pd.Timestamp.now() if reference is None else reference).year
+    candidate = reference_year - reference_year % 100 + year
+    return min(
+        (candidate - 100, candidate, candidate + 100),
+        key=lambda y: abs(y - reference_year),
+    )
+
+
 def nth_weekday_of_month(
-    year: int, month: int, weekday: DayOfWeek, week_num: WeekOfMonth
-) -> pd.Timestamp:
+    year: int | np.ndarray,
+    month: int | np.ndarray,
+    weekday: DayOfWeek,
+    week_num: WeekOfMonth,
+) -> pd.Timestamp | pd.DatetimeIndex:
     """Given the parameters returns the nth occurrence (4th max) of the
-    specified day of week.
+    specified day of week. year and month may be arrays, all the dates
+    are then computed at once and returned as a DatetimeIndex.
 
     NOTE any given day may occur 5 times in a month, this function handles
     up to the forth occurrence.
@@ -47,5 +97,258 @@ def nth_weekday_of_month(
         raise ValueError("week_num must be between 0 and 3(included).")
 
     # ------------------------------------------------------------------
-    first_of_month = pd.Timestamp(year=year, month=month, day=1, tz=STANDARD_TIMEZONE)
-    return first_of_month + pd.offsets.WeekOfMonth(n=1, weekday=weekday, week=week_num)
+    days = _nth_weekday(_first_of_month(year, month), weekday, week_num)
+    if np.ndim(days) == 0:
+        return pd.Timestamp(days).tz_localize(STANDARD_TIMEZONE)
+    return pd.DatetimeIndex(days.astype("M8[ns]")).tz_localize(STANDARD_TIMEZONE)
+
+
+# ----------------------------------------------------------------------
+# session calendars
+# ----------------------------------------------------------------------
+
+
+@dataclass(frozen=True)
+class SessionCalendar:
+    """
+    Trading sessions of a venue. A session is labelled by its trading
+    date and opens at open_time, on the previous calendar day when
+    open_time is after close_time (e.g. CME Globex: 18:00 to 17:00 ET).
+    Trading dates follow weekmask, excluding holidays.
+
+    Session bounds and bin edges are computed one year at a time as
+    int64 arrays (UTC nanoseconds) and kept in an LRU cache, so repeated
+    resamples and lookups over many contracts don't recompute them.
+    """
+
+    name: str
+    tz: str = STANDARD_TIMEZONE
+    open_time: str = "18:00"
+    close_time: str = "17:00"
+    weekmask: str = "Mon Tue Wed Thu Fri"
+    holidays: tuple[str, ...] = ()
+
+    def sessions(
+        self, start: pd.Timestamp, end: pd.Timestamp
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """Open and close of the sessions with trading date in
+        [start, end]."""
+        dates, opens, closes = _concat_years(self, "sessions", start, end)
+        mask = _date_mask(dates, start, end)
+        return opens[mask], closes[mask]
+
+    def daily_edges(self, start: pd.Timestamp, end: pd.Timestamp) -> np.ndarray:
+        """Every calendar day at open_time in [start, end]: the edges of
+        daily bins, same as resampling "D" with offset=open_time."""
+        (edges,) = _concat_years(self, "daily", start, end)
+        first, last = _to_ns(start, self.tz), _to_ns(end, self.tz)
+        return edges[(edges >= first) & (edges <= last)]
+
+    def weekly_edges(self, start: pd.Timestamp, end: pd.Timestamp) -> np.ndarray:
+        """Open of the first session of each week with trading dates in
+        [start, end]."""
+        dates, opens, _ = _concat_years(self, "sessions", start, end)
+        # monday based week number, 1970-01-01 was a thursday
+        weeks = (dates // pd.Timedelta(days=1).value + 3) // 7
+        first = np.flatnonzero(np.diff(weeks, prepend=weeks[:1] - 1))
+        return opens[first][_date_mask(dates[first], start, end)]
+
+    def session_of(self, timestamps: np.ndarray) -> np.ndarray:
+        """Trading date (datetime64) of the session containing each int64
+        timestamp (UTC nanoseconds), NaT if it falls outside sessions."""
+        timestamps = np.asarray(timestamps, dtype=np.int64)
+        if not len(timestamps):
+            return np.empty(0, dtype="datetime64[ns]")
+        start = pd.Timestamp(timestamps.min(), tz="UTC").tz_convert(self.tz)
+        end = pd.Timestamp(timestamps.max(), tz="UTC").tz_convert(self.tz)
+        dates, opens, closes = _concat_years(
+            self, "sessions", start, end + pd.Timedelta(days=1)
+        )
+
+        positions = np.searchsorted(opens, timestamps, "right") - 1
+        positions = np.maximum(positions, 0)
+        inside = (timestamps >= opens[positions]) & (timestamps < closes[positions])
+        out = np.where(inside, dates[positions], np.iinfo(np.int64).min)
+        return out.view("datetime64[ns]")
+
+
+class CMEHolidayCalendar(AbstractHolidayCalendar):
+    """Days CME Globex is closed for the whole session: New Year's Day,
+    Good Friday and Christmas. Other US holidays only halt trading early
+    and keep their session, they are not holidays here."""
+
+    rules = [
+        Holiday("New Year's Day", month=1, day=1, observance=sunday_to_monday),
+        GoodFriday,
+        Holiday("Christmas", month=12, day=25, observance=nearest_workday),
+    ]
+
+
+def calendar_holidays(
+    calendar: AbstractHolidayCalendar, years: range = HOLIDAY_YEARS
+) -> tuple[str, ...]:
+    """Holidays of a pandas holiday calendar as ISO dates, for the
+    holidays of a SessionCalendar."""
+    dates = calendar.holidays(f"{years[0]}-01-01", f"{years[-1]}-12-31")
+    return tuple(dates.strftime("%Y-%m-%d"))
+
+
+CME_GLOBEX = SessionCalendar(
+    name="CME", holidays=calendar_holidays(CMEHolidayCalendar())
+)
+CALENDARS: dict[str, SessionCalendar] = {"CME": CME_GLOBEX}
+
+
+def get_calendar(venue: str) -> SessionCalendar:
+    """Given a venue name (e.g. CME), returns its session calendar."""
+    try:
+        return CALENDARS[venue.upper()]
+    except KeyError:
+        raise ValueError(
+            f"Unknown venue: {venue!r}. Must be one of {list(CALENDARS)}"
+        )
+
+
+@lru_cache(maxsize=CALENDAR_CACHE_SIZE)
+def _calendar_year(
+    calendar: SessionCalendar, kind: str, year: int
+) -> tuple[np.ndarray, ...]:
+    """Daily edges ("daily") or trading dates, opens and closes of the
+    sessions ("sessions") of a calendar year."""
+    open_offset = pd.Timedelta(f"{calendar.open_time}:00")
+    close_offset = pd.Timedelta(f"{calendar.close_time}:00")
+
+    if kind == "daily":
+        days = pd.date_range(f"{year}-01-01", f"{year}-12-31", freq="D")
+        return (_localize(days + open_offset, calendar.tz),)
+
+    dates = pd.bdate_range(
+        f"{year}-01-01",
+        f"{year}-12-31",
+        freq="C",
+        weekmask=calendar.weekmask,
+        holidays=list(calendar.holidays),
+    )
+    # overnight sessions open the calendar day before
+    open_days = dates - pd.Timedelta(days=int(open_offset >= close_offset))
+    opens = _localize(open_days + open_offset, calendar.tz)
+    closes = _localize(dates + close_offset, calendar.tz)
+    return dates.asi8, opens, closes
+
+
+def _concat_years(
+    calendar: SessionCalendar, kind: str, start: pd.Timestamp, end: pd.Timestamp
+) -> tuple[np.ndarray, ...]:
+    # a session may open the last day of the previous year
+    first_year = pd.Timestamp(start).year - 1
+    parts = [
+        _calendar_year(calendar, kind, year)
+        for year in range(first_year, pd.Timestamp(end).year + 1)
+    ]
+    return tuple(np.concatenate(arrays) for arrays in zip(*parts))
+
+
+def _localize(index: pd.DatetimeIndex, tz: str) -> np.ndarray:
+    return index.tz_localize(tz, ambiguous=True, nonexistent="shift_forward").asi8
+
+
+def _date_mask(dates: np.ndarray, start: pd.Timestamp, end: pd.Timestamp) -> np.ndarray:
+    first = pd.Timestamp(start).tz_localize(None).normalize().value
+    last = pd.Timestamp(end).tz_localize(None).normalize().value
+    return (dates >= first) & (dates <= last)
+
+
+def _to_ns(ts: pd.Timestamp, tz: str) -> int:
+    ts = pd.Timestamp(ts)
+    return (ts.tz_localize(tz) if ts.tz is None else ts).value
+
+
+# ----------------------------------------------------------------------
+# futures expiration calendar
+# ----------------------------------------------------------------------
+
+
+def contract_dates(
+    product_code: str,
+    year: int | np.ndarray,
+    month: int | np.ndarray,
+    calendar: SessionCalendar = CME_GLOBEX,
+) -> tuple[np.ndarray, np.ndarray] | None:
+    """Expiration and last trade dates (datetime64[D]) of the contracts
+    of a product with the given years and months (scalars or arrays),
+    looked up in the precomputed table of its rule family. None if the
+    rule of the product is unknown."""
+    rule = EXPIRATION_RULES.get(product_code.upper())
+    if rule is None:
+        return None
+    year, month = np.asarray(year), np.asarray(month)
+    if ((year < EXPIRATION_YEARS.start) | (year >= EXPIRATION_YEARS.stop)).any():
+        raise ValueError(
+            f"Contract years must be in [{EXPIRATION_YEARS.start},"
+            f" {EXPIRATION_YEARS.stop})."
+        )
+    expirations, last_trades = expiration_table(rule, calendar)
+    rows, columns = year - EXPIRATION_YEARS.start, month - 1
+    return expirations[rows, columns], last_trades[rows, columns]
+
+
+@lru_cache(maxsize=None)
+def expiration_table(
+    rule: ExpirationRule, calendar: SessionCalendar = CME_GLOBEX
+) -> tuple[np.ndarray, np.ndarray]:
+    """Expiration and last trade dates (datetime64[D]) of every contract
+    month of EXPIRATION_YEARS under a rule, arrays of shape (years, 12)
+    computed with numpy business day functions. Read-only."""
+    years = np.arange(EXPIRATION_YEARS.start, EXPIRATION_YEARS.stop)
+    firsts = _first_of_month(years[:, None], np.arange(1, 13))
+    next_firsts = (firsts.astype("M8[M]") + 1).astype("M8[D]")
+    business = np.busdaycalendar(
+        weekmask=calendar.weekmask, holidays=list(calendar.holidays)
+    )
+
+    def offset(dates, n, roll="forward"):
+        return np.busday_offset(dates, n, roll=roll, busdaycal=business)
+
+    match rule:
+        case ExpirationRule.CURRENCY | ExpirationRule.CAD:
+            wednesday = _nth_weekday(firsts, DayOfWeek.WED, WeekOfMonth.THIRD)
+            expiration = offset(wednesday, 0)
+            days_before = 2 if rule == ExpirationRule.CURRENCY else 1
+            last_trade = offset(expiration, -days_before)
+        case ExpirationRule.EQUITY_INDEX:
+            friday = _nth_weekday(firsts, DayOfWeek.FRI, WeekOfMonth.THIRD)
+            expiration = last_trade = offset(friday, 0, roll="backward")
+        case ExpirationRule.TREASURY:
+            expiration = offset(next_firsts, -1)
+            last_trade = offset(expiration, -7)
+        case ExpirationRule.SHORT_TREASURY:
+            last_trade = offset(next_firsts, -1)
+            expiration = offset(next_firsts, 2)
+        case ExpirationRule.CRUDE_OIL:
+            # the 25th of the previous month, or the business day before
+            day_25 = (firsts.astype("M8[M]") - 1).astype("M8[D]") + 24
+            expiration = last_trade = offset(offset(day_25, 0, "backward"), -3)
+        case ExpirationRule.NATURAL_GAS:
+            expiration = last_trade = offset(firsts, -3)
+        case ExpirationRule.METALS:
+            expiration = last_trade = offset(next_firsts, -3)
+        case ExpirationRule.GRAINS:
+            expiration = last_trade = offset(firsts + 14, -1)
+        case _:
+            raise ValueError(f"Unhandled expiration rule: {rule}")
+
+    for dates in (expiration, last_trade):
+        dates.flags.writeable = False
+    return expiration, last_trade
+
+
+def _first_of_month(year: int | np.ndarray, month: int | np.ndarray) -> np.ndarray:
+    months = (np.asarray(year) - 1970) * 12 + np.asarray(month) - 1
+    return months.astype("M8[M]").astype("M8[D]")
+
+
+def _nth_weekday(firsts: np.ndarray, weekday: int, n: int) -> np.ndarray:
+    """nth (from 0) given weekday on or after each date."""
+    weekmask = [0] * 7
+    weekmask[weekday] = 1
+    return np.busday_offset(firsts, n, roll="forward", weekmask=weekmask)
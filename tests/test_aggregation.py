@@ -0,0 +1,167 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from kaos.data.aggregation import (
+    BarAggregator,
+    bars_to_frame,
+    subsample_ohlc,
+    subsample_ohlc_multi,
+)
+from kaos.time_utils import CME_GLOBEX
+
+
+def _bars(tz: str | None, start: str = "2024-03-01", days: int = 21) -> pd.DataFrame:
+    """1min bars with random gaps, spanning the March DST change in New York."""
+    rng = np.random.default_rng(0)
+    index = pd.date_range(start, periods=days * 1440, freq="1min", tz=tz)
+    index = index[rng.random(len(index)) > 0.3].rename("timestamp")
+    close = 100 + np.cumsum(rng.normal(0, 0.01, len(index)))
+    return pd.DataFrame(
+        {
+            "open": close + rng.normal(0, 0.01, len(index)),
+            "high": close + 0.05,
+            "low": close - 0.05,
+            "close": close,
+            "volume": rng.integers(0, 100, len(index)),
+        },
+        index=index,
+    )
+
+
+def _assert_engines_equal(data: pd.DataFrame, **kwargs) -> None:
+    pd.testing.assert_frame_equal(
+        subsample_ohlc(data, engine="numpy", **kwargs),
+        subsample_ohlc(data, engine="pandas", **kwargs),
+    )
+
+
+@pytest.mark.parametrize("tz", [None, "UTC", "America/New_York"])
+@pytest.mark.parametrize("timeframe", ["5min", "1h", "4h", "D"])
+@pytest.mark.parametrize("offset", [None, "18h"])
+@pytest.mark.parametrize("label", ["left", "right"])
+@pytest.mark.parametrize("dropna_rows", [True, False])
+def test_numpy_engine_matches_pandas(tz, timeframe, offset, label, dropna_rows):
+    _assert_engines_equal(
+        _bars(tz),
+        timeframe=timeframe,
+        offset=offset,
+        label=label,
+        dropna_rows=dropna_rows,
+    )
+
+
+@pytest.mark.parametrize("tz", [None, "UTC", "America/New_York"])
+@pytest.mark.parametrize("label", ["left", "right"])
+def test_numpy_engine_matches_pandas_over_fall_dst(tz, label):
+    # the repeated hour of November, bins are not monotonic in local time
+    data = _bars(tz, start="2024-10-25", days=14)
+    for timeframe, offset in [("1h", None), ("D", "18h")]:
+        _assert_engines_equal(data, timeframe=timeframe, offset=offset, label=label)
+
+
+@pytest.mark.parametrize("tz", [None, "UTC", "America/New_York"])
+@pytest.mark.parametrize("label", ["left", "right"])
+@pytest.mark.parametrize("dropna_rows", [True, False])
+def test_numpy_engine_weekly_falls_back_to_pandas(tz, label, dropna_rows):
+    _assert_engines_equal(
+        _bars(tz), timeframe="W", label=label, dropna_rows=dropna_rows
+    )
+
+
+@pytest.mark.parametrize("timeframe", ["5min", "D"])
+def test_numpy_engine_with_missing_values(timeframe):
+    data = _bars("America/New_York")
+    data.iloc[::7, data.columns.get_loc("high")] = np.nan
+    _assert_engines_equal(data, timeframe=timeframe, dropna_rows=False)
+
+
+def test_numpy_engine_with_time_column():
+    data = _bars("UTC").reset_index()
+    _assert_engines_equal(data, timeframe="15min", time_column="timestamp")
+
+
+@pytest.mark.parametrize("tz", [None, "America/New_York"])
+@pytest.mark.parametrize("label", ["left", "right"])
+@pytest.mark.parametrize("dropna_rows", [True, False])
+def test_calendar_daily_bins_match_pandas_offset(tz, label, dropna_rows):
+    data = _bars(tz)
+    pd.testing.assert_frame_equal(
+        subsample_ohlc(
+            data,
+            timeframe="D",
+            calendar=CME_GLOBEX,
+            label=label,
+            dropna_rows=dropna_rows,
+        ),
+        subsample_ohlc(
+            data,
+            timeframe="D",
+            offset="18h",
+            label=label,
+            dropna_rows=dropna_rows,
+        ),
+        check_freq=False,
+    )
+
+
+@pytest.mark.parametrize("tz", [None, "UTC", "America/New_York"])
+@pytest.mark.parametrize("start", ["2024-03-06 13:37", "2024-10-29 09:03"])
+@pytest.mark.parametrize("offset", [None, "18h"])
+@pytest.mark.parametrize("label", ["left", "right"])
+@pytest.mark.parametrize("dropna_rows", [True, False])
+def test_multi_timeframes_match_subsample_ohlc(tz, start, offset, label, dropna_rows):
+    # starts inside a bin of every timeframe, spans a DST change
+    data = _bars(tz, start=start, days=10)
+    kwargs = dict(offset=offset, label=label, dropna_rows=dropna_rows)
+    timeframes = ["5min", "15min", "1h", "4h", "D", "W"]
+    out = subsample_ohlc_multi(data, timeframes=timeframes, **kwargs)
+    assert list(out) == timeframes
+    for timeframe in timeframes:
+        pd.testing.assert_frame_equal(
+            out[timeframe], subsample_ohlc(data, timeframe=timeframe, **kwargs)
+        )
+
+
+@pytest.mark.parametrize("tz", [None, "UTC", "America/New_York"])
+@pytest.mark.parametrize("offset", [None, "18h"])
+@pytest.mark.parametrize("label", ["left", "right"])
+def test_bar_aggregator_replay_matches_batch(tz, offset, label):
+    data = _bars(tz, days=10)
+    timeframes = ["5min", "1h", "D"]
+    aggregator = BarAggregator(timeframes, offset=offset, label=label)
+    bars = {tf: [] for tf in timeframes}
+    for tf, bar in aggregator.replay(data):
+        bars[tf].append(bar)
+
+    for tf in timeframes:
+        pd.testing.assert_frame_equal(
+            bars_to_frame(bars[tf]).astype({"volume": np.int64}),
+            subsample_ohlc(data, timeframe=tf, offset=offset, label=label),
+            check_freq=False,
+        )
+
+
+def test_bar_aggregator_emits_completed_bars():
+    data = _bars("America/New_York", days=1)
+    received = []
+    aggregator = BarAggregator(
+        ["15min"], on_bar=lambda tf, bar: received.append((tf, bar))
+    )
+    returned = []
+    for row in data.itertuples(name=None):
+        returned += aggregator.update(*row)
+    assert returned == received
+    # the last partial bar is only completed by flush
+    assert len(received) == 24 * 4 - 1
+    assert aggregator.flush() == received[-1:]
+    assert received[-1][1].timestamp == data.index[0] + pd.Timedelta(days=1)
+
+
+def test_bar_aggregator_rejects_out_of_order_and_anchored_timeframes():
+    aggregator = BarAggregator(["5min"])
+    aggregator.update(pd.Timestamp("2024-01-02 10:00"), 1, 1, 1, 1, 1)
+    with pytest.raises(ValueError):
+        aggregator.update(pd.Timestamp("2024-01-02 09:59"), 1, 1, 1, 1, 1)
+    with pytest.raises(ValueError):
+        BarAggregator(["W"])
@@ -0,0 +1,96 @@
+import os
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from kaos.data.cache import ColumnarCache
+
+pytest.importorskip("pyarrow")
+
+PRESET = {"tz": "America/New_York", "sep": ","}
+
+
+def _bars(periods: int = 1_000) -> pd.DataFrame:
+    index = pd.date_range(
+        "2024-01-02", periods=periods, freq="1min", tz="America/New_York"
+    )
+    close = 100 + np.arange(periods) * 0.25
+    return pd.DataFrame(
+        {"close": close, "volume": np.arange(periods)}, index=index.rename("timestamp")
+    )
+
+
+@pytest.fixture
+def source(tmp_path: Path) -> Path:
+    file = tmp_path / "ES_H24_1min.txt"
+    file.write_text("raw\n")
+    return file
+
+
+def test_cache_key_changes_with_mtime_size_and_preset(tmp_path: Path, source: Path):
+    cache = ColumnarCache(tmp_path / "cache")
+    entry = cache._entry_path(source, PRESET)
+    assert cache._entry_path(source, dict(reversed(PRESET.items()))) == entry
+    assert cache._entry_path(source, {**PRESET, "sep": ";"}) != entry
+
+    stat = source.stat()
+    os.utime(source, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    assert cache._entry_path(source, PRESET) != entry
+    entry = cache._entry_path(source, PRESET)
+    source.write_text("raw!\n")
+    os.utime(source, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    assert cache._entry_path(source, PRESET) != entry
+
+
+def test_cache_get_filters_time_window(
+    tmp_path: Path, source: Path, monkeypatch: pytest.MonkeyPatch
+):
+    import pyarrow.parquet as pq
+
+    monkeypatch.setattr(ColumnarCache, "ROW_GROUP_SIZE", 100)
+    cache = ColumnarCache(tmp_path / "cache")
+    data = _bars()
+    cache.put(source, PRESET, data)
+    entry = cache._entry_path(source, PRESET)
+    assert pq.ParquetFile(entry).num_row_groups == 10
+
+    pd.testing.assert_frame_equal(cache.get(source, PRESET), data, check_freq=False)
+    start, end = data.index[150], data.index[420]
+    pd.testing.assert_frame_equal(
+        cache.get(source, PRESET, start, end), data.loc[start:end], check_freq=False
+    )
+    pd.testing.assert_frame_equal(
+        cache.get(source, PRESET, end=start), data.loc[:start], check_freq=False
+    )
+
+
+def test_cache_ignores_and_removes_stale_entries(tmp_path: Path, source: Path):
+    cache = ColumnarCache(tmp_path / "cache")
+    cache.put(source, PRESET, _bars())
+    stale = cache._entry_path(source, PRESET)
+
+    source.write_text("changed\n")
+    assert cache.get(source, PRESET) is None
+    cache.put(source, PRESET, _bars(10))
+    assert not stale.exists()
+    assert len(cache.get(source, PRESET)) == 10
+    assert len(list(cache.directory.iterdir())) == 1
+
+
+def test_cache_put_is_atomic(
+    tmp_path: Path, source: Path, monkeypatch: pytest.MonkeyPatch
+):
+    cache = ColumnarCache(tmp_path / "cache")
+
+    def fail(self, path, **kwargs):
+        Path(path).write_bytes(b"PAR1 partial")
+        raise OSError("disk full")
+
+    monkeypatch.setattr(pd.DataFrame, "to_parquet", fail)
+    with pytest.raises(OSError):
+        cache.put(source, PRESET, _bars())
+    # the partial file is never visible as an entry
+    assert cache.get(source, PRESET) is None
+    assert not list(cache.directory.glob(f"*{ColumnarCache.EXTENSION}"))
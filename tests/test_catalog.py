@@ -0,0 +1,211 @@
+import os
+import pickle
+import re
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from kaos.data.enums import DataProvider
+from kaos.data.loading import Catalog
+from kaos.data.partitioned import PartitionedStore
+from kaos.data.symbol import Symbol
+
+SYMBOLS = [Symbol("ES-Z-2023"), Symbol("ES-H-2024"), Symbol("NQ-H-2024")]
+
+
+def _bars(start: str, periods: int) -> pd.DataFrame:
+    rng = np.random.default_rng(0)
+    index = pd.date_range(start, periods=periods, freq="1min", tz="America/New_York")
+    close = 4000 + 0.25 * np.cumsum(rng.integers(-2, 3, periods))
+    return pd.DataFrame(
+        {
+            "open": close,
+            "high": close + 0.25,
+            "low": close - 0.25,
+            "close": close,
+            "volume": rng.integers(0, 500, periods),
+        },
+        index=index.rename("timestamp"),
+    )
+
+
+def _write_raw(catalog: Catalog, symbol: Symbol, data: pd.DataFrame) -> Path:
+    _, file = catalog._path_in_raw_data(symbol, DataProvider.FIRSTRATE, "1min")
+    file.parent.mkdir(parents=True, exist_ok=True)
+    data.set_axis(data.index.strftime("%Y-%m-%d %H:%M:%S")).to_csv(file, header=False)
+    return file
+
+
+@pytest.fixture
+def catalog(tmp_path: Path) -> Catalog:
+    catalog = Catalog(tmp_path, use_cache=False)
+    # the December contract crosses the new year, two partitions
+    _write_raw(catalog, SYMBOLS[0], _bars("2023-12-31 17:00", 600))
+    _write_raw(catalog, SYMBOLS[1], _bars("2024-01-02", 300))
+    _write_raw(catalog, SYMBOLS[2], _bars("2024-01-03", 200))
+    return catalog
+
+
+def test_manifest_indexes_raw_files(catalog: Catalog):
+    assert catalog.refresh_manifest() == (3, 0)
+    entries = catalog.manifest.entries.set_index("symbol")
+    assert sorted(entries.index) == sorted(s.value for s in SYMBOLS)
+    assert entries.loc["ES-H-2024", "rows"] == 300
+    assert entries.loc["ES-H-2024", "timeframe"] == "1min"
+    assert entries.loc["ES-H-2024", "first"] == (
+        pd.Timestamp("2024-01-02", tz="America/New_York").value
+    )
+    assert entries.loc["ES-H-2024", "last"] == (
+        pd.Timestamp("2024-01-02 04:59", tz="America/New_York").value
+    )
+
+    manifest = catalog.manifest
+    assert manifest.symbols(product="ES") == SYMBOLS[:2]
+    assert manifest.symbols(start="2024-01-02") == SYMBOLS[1:]
+    assert manifest.symbols(start="2024-01-02 12:00") == SYMBOLS[2:]
+    assert manifest.symbols(end="2024-01-01") == SYMBOLS[:1]
+    assert manifest.find(SYMBOLS[2], DataProvider.FIRSTRATE, "1min") == (
+        catalog._path_in_raw_data(SYMBOLS[2], DataProvider.FIRSTRATE, "1min")[1]
+    )
+    assert manifest.find(SYMBOLS[2], DataProvider.FIRSTRATE, "1day") is None
+
+
+def test_manifest_refresh_only_scans_changes(catalog: Catalog):
+    catalog.refresh_manifest()
+    # a new catalog reads the manifest from disk
+    catalog = Catalog(catalog.directory, use_cache=False)
+    assert len(catalog.manifest.entries) == 3
+    assert catalog.refresh_manifest() == (0, 0)
+
+    _write_raw(catalog, SYMBOLS[1], _bars("2024-01-02", 400))
+    _, removed = catalog._path_in_raw_data(SYMBOLS[2], DataProvider.FIRSTRATE, "1min")
+    removed.unlink()
+    assert catalog.refresh_manifest() == (1, 1)
+    entries = catalog.manifest.entries.set_index("symbol")
+    assert entries.loc["ES-H-2024", "rows"] == 400
+    assert "NQ-H-2024" not in entries.index
+
+
+def test_write_ingests_into_partitioned_store(catalog: Catalog):
+    assert catalog.write(max_workers=1) == (3, 0)
+    store = catalog.market_store
+
+    # partitioned by UTC year
+    assert sorted(store.partitions(SYMBOLS[0], "1min")) == [2023, 2024]
+    assert sorted(store.partitions(SYMBOLS[1], "1min")) == [2024]
+    for symbol, data in zip(
+        SYMBOLS,
+        (
+            _bars("2023-12-31 17:00", 600),
+            _bars("2024-01-02", 300),
+            _bars("2024-01-03", 200),
+        ),
+    ):
+        stored = store.read(symbol, "1min")
+        assert stored["open_interest"].isna().all()
+        pd.testing.assert_frame_equal(
+            stored[list(data)], data, check_freq=False, check_dtype=False
+        )
+
+    window = store.read(SYMBOLS[0], "1min", start="2024-01-01", end="2024-01-01 01:00")
+    assert window.index[0] == pd.Timestamp("2024-01-01", tz="America/New_York")
+    assert len(window) == 61
+
+
+def test_write_skips_ingested_files(catalog: Catalog):
+    catalog.write(max_workers=1)
+    assert catalog.write(max_workers=1) == (0, 3)
+
+    # a changed file is ingested again
+    _write_raw(catalog, SYMBOLS[1], _bars("2024-01-02", 100))
+    assert catalog.write(max_workers=1) == (1, 2)
+    assert len(catalog.market_store.read(SYMBOLS[1], "1min")) == 100
+
+    # an interrupted ingest resumes from the files not logged
+    log = catalog.market_store.log_path
+    lines = log.read_text().splitlines()
+    log.write_text("\n".join(lines[:-1]) + "\n")
+    assert catalog.write(max_workers=1) == (1, 2)
+    assert set(catalog.market_store.ingested()) == set(
+        catalog.manifest.entries["path"]
+    )
+
+
+def test_partitioned_store_replaces_stale_partitions(tmp_path: Path):
+    store = PartitionedStore(tmp_path)
+    symbol = SYMBOLS[0]
+    store.write(symbol, "1min", _bars("2023-12-31 17:00", 600))
+    store.write(symbol, "1min", _bars("2024-01-02", 10))
+    assert sorted(store.partitions(symbol, "1min")) == [2024]
+    assert len(store.read(symbol, "1min")) == 10
+    assert store.read(symbol, "1min", start="2025-01-01").empty
+    with pytest.raises(FileNotFoundError):
+        store.read(SYMBOLS[2], "1min")
+    with pytest.raises(ValueError):
+        store.write(symbol, "1min", _bars("2024-01-02", 10).iloc[::-1])
+
+
+def test_write_requires_pyarrow(catalog: Catalog, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr("kaos.data.partitioned.has_parquet_engine", lambda: False)
+    with pytest.raises(ImportError, match="pyarrow"):
+        catalog.write(max_workers=1)
+    assert not catalog.market_store.log_path.exists()
+
+
+def test_manifest_lists_directories_changed_after_refresh(catalog: Catalog):
+    catalog.refresh_manifest()
+    file = _write_raw(catalog, Symbol("ES-M-2024"), _bars("2024-01-04", 100))
+    directory = file.parent
+    # the file is added after the manifest was written
+    written = catalog.manifest.path.stat().st_mtime_ns
+    os.utime(directory, ns=(written + 10**9, written + 10**9))
+
+    files = catalog._list_matching_files(directory, re.compile(r".*"))
+    assert file.resolve() in [path.resolve() for path in files]
+    assert len(files) == 4
+
+    catalog.refresh_manifest()
+    os.utime(directory, ns=(written, written))
+    indexed = catalog.manifest.files(directory.resolve(), re.compile(r".*"))
+    assert indexed is not None and len(indexed) == 4
+
+
+def test_pooled_lazy_load_reports_missing_files(catalog: Catalog):
+    missing = Symbol("ES-M-2024")
+    contracts = catalog.get_futures_contracts(
+        [*SYMBOLS, missing],
+        DataProvider.FIRSTRATE,
+        ["1min"],
+        is_raw_data=True,
+        max_workers=2,
+        lazy=True,
+    )
+    assert [c.symbol for c in contracts] == SYMBOLS
+    assert list(catalog.load_errors) == [missing]
+    assert isinstance(catalog.load_errors[missing], FileNotFoundError)
+
+
+def test_process_pool_loads_contracts_from_paths(catalog: Catalog):
+    kwargs = dict(
+        provider=DataProvider.FIRSTRATE, timeframes=["1min"], is_raw_data=True
+    )
+    # loaders only reference module-level functions, paths and parameters
+    loaders = catalog._timeframe_loaders(SYMBOLS[0], **kwargs)
+    assert catalog.__class__.__name__.encode() not in pickle.dumps(loaders)
+
+    expected = catalog.get_futures_contracts([*SYMBOLS, Symbol("ES-M-2024")], **kwargs)
+    contracts = catalog.get_futures_contracts(
+        [*SYMBOLS, Symbol("ES-M-2024")], **kwargs, max_workers=2, use_processes=True
+    )
+    assert list(catalog.load_errors) == [Symbol("ES-M-2024")]
+    for contract, other in zip(contracts, expected, strict=True):
+        assert contract.symbol == other.symbol
+        pd.testing.assert_frame_equal(
+            contract.market_data["1min"], other.market_data["1min"]
+        )
+    with pytest.raises(ValueError):
+        catalog.get_futures_contracts(
+            SYMBOLS, **kwargs, max_workers=2, use_processes=True, lazy=True
+        )
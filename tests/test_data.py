@@ -0,0 +1,138 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from kaos.data.data import (
+    LazyMarketData,
+    Universe,
+    cross_sectional_rank,
+    pairwise_correlation,
+)
+from tests.test_engine import _universe
+
+
+def _frame(rows: int) -> pd.DataFrame:
+    # 8 bytes per row for the index and for the column
+    return pd.DataFrame(
+        {"close": np.zeros(rows)}, index=pd.date_range("2024", periods=rows)
+    )
+
+
+def _lazy(memory_budget: int | None = None) -> tuple[LazyMarketData, list[str]]:
+    calls = []
+
+    def loader(timeframe: str, rows: int):
+        def load():
+            calls.append(timeframe)
+            return _frame(rows)
+
+        return load
+
+    loaders = {"1min": loader("1min", 100), "5min": loader("5min", 20)}
+    loaders["D"] = loader("D", 10)
+    return LazyMarketData(loaders, memory_budget), calls
+
+
+def test_lazy_market_data_loads_on_first_access():
+    data, calls = _lazy()
+    assert data.loaded == [] and calls == []
+    assert len(data["5min"]) == 20
+    data["5min"]
+    assert calls == ["5min"]
+    assert data.is_loaded("5min") and not data.is_loaded("1min")
+    assert data.nbytes == 20 * 16
+
+
+def test_lazy_market_data_evicts_least_recently_used():
+    # room for 1min (1600 bytes) and D (160 bytes), not for 5min as well
+    data, calls = _lazy(memory_budget=1_800)
+    data["5min"], data["1min"], data["D"]
+    assert data.loaded == ["1min", "D"]
+    assert data.nbytes <= 1_800
+
+    # an evicted timeframe is loaded again on access
+    data["5min"]
+    assert calls == ["5min", "1min", "D", "5min"]
+    assert data.loaded == ["D", "5min"]
+    # the frame just accessed is kept even if alone over budget
+    data.memory_budget = 100
+    data["1min"]
+    assert data.loaded == ["1min"]
+
+
+def test_lazy_market_data_behaves_like_a_dict():
+    data, calls = _lazy(memory_budget=0)
+    assert list(data) == ["1min", "5min", "D"]
+    assert len(data) == 3 and "D" in data and "W" not in data
+    with pytest.raises(KeyError):
+        data["W"]
+
+    # frames set directly replace the loader and are never evicted
+    weekly = _frame(5)
+    data["W"] = weekly
+    data["1min"]
+    assert data["W"] is weekly and data.is_loaded("W")
+    data.evict("W")
+    assert data.is_loaded("W")
+    assert set(data.keys()) == {"1min", "5min", "D", "W"}
+
+    del data["5min"]
+    assert "5min" not in data and len(data) == 3
+    with pytest.raises(KeyError):
+        del data["5min"]
+    assert dict(data).keys() == {"1min", "D", "W"}
+    assert calls.count("5min") == 0
+
+
+def _aligned(universe: Universe, field: str = "close") -> pd.DataFrame:
+    """Field of every instrument aligned by pandas, timestamps x instruments."""
+    return pd.concat(
+        [c.market_data["1min"][field].rename(c.symbol.value) for c in universe],
+        axis=1,
+    ).sort_index()
+
+
+def test_universe_panel_aligns_instruments():
+    universe = Universe(_universe(500))
+    aligned = _aligned(universe)
+    pd.testing.assert_index_equal(
+        universe.index("1min"), aligned.index, check_names=False
+    )
+    np.testing.assert_array_equal(universe.field("close", "1min"), aligned.T)
+    assert universe.panel("1min").shape == (3, len(aligned), 5)
+
+    start, end = aligned.index[100], aligned.index[199]
+    window = universe.field("close", "1min", start, end)
+    np.testing.assert_array_equal(window, aligned.loc[start:end].T)
+    returns = aligned / aligned.shift(1) - 1
+    np.testing.assert_allclose(universe.returns("1min"), returns.T)
+
+
+def test_universe_rank_and_correlation_match_pandas():
+    universe = Universe(_universe(500))
+    aligned = _aligned(universe)
+    # ties are ranked by position, as method="first"
+    aligned.iloc[:50, 1] = aligned.iloc[:50, 0]
+    ranks = cross_sectional_rank(aligned.to_numpy().T)
+    np.testing.assert_array_equal(ranks, aligned.rank(axis=1, method="first").T - 1)
+
+    returns = aligned.pct_change(fill_method=None)
+    np.testing.assert_allclose(
+        pairwise_correlation(returns.to_numpy().T),
+        returns.corr(min_periods=2),
+        atol=1e-12,
+    )
+    values = returns.to_numpy().T.copy()
+    values[2, 3:] = np.nan
+    assert np.isnan(pairwise_correlation(values, min_periods=10)[2]).all()
+    assert universe.correlation("1min").shape == (3, 3)
+    np.testing.assert_array_equal(
+        universe.rank("1min"), cross_sectional_rank(universe.field("close", "1min"))
+    )
+
+
+def test_universe_rejects_unsorted_index():
+    contract = _universe(50)[0]
+    contract.market_data["1min"] = contract.market_data["1min"].iloc[::-1]
+    with pytest.raises(ValueError):
+        Universe([contract]).panel("1min")
@@ -0,0 +1,89 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from kaos.data.data import FuturesReferenceData
+from kaos.data.enums import AssetClass, DataProvider
+from kaos.data.instruments import FuturesContract
+from kaos.data.symbol import Symbol
+from kaos.engine import Engine, VectorizedEngine
+from kaos.risk import Portfolio
+from kaos.strategy import SignalStrategy
+
+
+class Crossover(SignalStrategy):
+    params = {"fast": 5, "slow": 20}
+
+    def signals(self, data: pd.DataFrame) -> np.ndarray:
+        fast = data["close"].rolling(self.params["fast"]).mean()
+        slow = data["close"].rolling(self.params["slow"]).mean()
+        return np.sign(fast - slow).to_numpy()
+
+
+def _universe(n_bars: int = 2_000) -> list[FuturesContract]:
+    """Contracts with gaps at different bars, so the streams interleave."""
+    rng = np.random.default_rng(0)
+    index = pd.date_range(
+        "2024-01-02", periods=n_bars, freq="1min", tz="America/New_York"
+    )
+    universe = []
+    for code in "HMU":
+        bars_index = index[rng.random(len(index)) > 0.2]
+        close = 100 + np.cumsum(rng.normal(0, 0.05, len(bars_index)))
+        open = close + rng.normal(0, 0.05, len(bars_index))
+        bars = pd.DataFrame(
+            {
+                "open": open,
+                "high": np.maximum(open, close) + 0.05,
+                "low": np.minimum(open, close) - 0.05,
+                "close": close,
+                "volume": 1,
+            },
+            index=bars_index,
+        )
+        reference_data = FuturesReferenceData(
+            symbol=Symbol(f"6E-{code}-2024"),
+            provider=DataProvider.FIRSTRATE,
+            asset_class=AssetClass.FX,
+            activation=index[0],
+            expiration=index[-1],
+        )
+        universe.append(FuturesContract(reference_data, {"1min": bars, "D": bars}))
+    return universe
+
+
+@pytest.mark.parametrize("stop_loss", [None, 0.001])
+def test_engine_and_vectorized_engine_agree(stop_loss):
+    universe = _universe()
+    portfolio = Portfolio(cash=1_000)
+    stats = Engine(
+        universe, [Crossover(stop_loss=stop_loss)], portfolio, commission=0.01
+    ).run()
+    result = VectorizedEngine(
+        universe, Crossover(stop_loss=stop_loss), 1_000, commission=0.01
+    ).run()
+
+    assert stats.events == sum(len(c.market_data["1min"]) for c in universe)
+    assert stats.fills == result.fills == len(portfolio.fills) > 0
+    for n, contract in enumerate(universe):
+        fills = portfolio.fills[portfolio.fills["instrument"] == n]
+        assert fills["quantity"].sum() == pytest.approx(result.positions[n][-1])
+    assert portfolio.timestamps.tolist() == result.equity.index.asi8.tolist()
+    np.testing.assert_allclose(portfolio.equity_curve, result.equity.to_numpy())
+    assert portfolio.equity == pytest.approx(result.equity.iloc[-1])
+
+
+def test_engine_fills_market_orders_at_next_open():
+    universe = _universe(50)[:1]
+    data = universe[0].market_data["1min"]
+
+    class BuyOnce(SignalStrategy):
+        def signals(self, data: pd.DataFrame) -> np.ndarray:
+            return np.ones(len(data))
+
+    portfolio = Portfolio()
+    Engine(universe, [BuyOnce()], portfolio).run()
+    (fill,) = portfolio.fills
+    assert fill["quantity"] == 1
+    assert fill["price"] == data["open"].iloc[1]
+    assert fill["timestamp"] == data.index[1].value
@@ -0,0 +1,207 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from kaos.data.aggregation import subsample_ohlc
+from kaos.data.data import FuturesReferenceData
+from kaos.data.enums import ContinuousFuturesAdjustment, RolloverRule
+from kaos.data.instruments import (
+    ContinuousFuturesContract,
+    FuturesContract,
+    roll_schedule,
+)
+from kaos.data.symbol import Symbol
+
+TZ = "America/New_York"
+
+
+def _es_2020() -> dict[str, pd.DataFrame]:
+    """Hourly bars of ES H, M, U and Z 2020, each contract on its own
+    price level, from 2019-09-01 to its expiration."""
+    rng = np.random.default_rng(0)
+    data = {}
+    for k, month_code in enumerate("HMUZ"):
+        symbol = Symbol(f"ES-{month_code}-2020")
+        expiration = FuturesReferenceData.from_symbol(symbol).expiration
+        start = pd.Timestamp("2019-09-01", tz=TZ)
+        index = pd.date_range(start, expiration, freq="1h")
+        close = 3000 + 10 * k + 0.25 * np.cumsum(rng.integers(-4, 5, len(index)))
+        data[symbol.value] = pd.DataFrame(
+            {
+                "open": close,
+                "high": close + 0.25,
+                "low": close - 0.25,
+                "close": close,
+                "volume": 1,
+            },
+            index=index,
+        )
+    return data
+
+
+def _contracts(
+    data: dict[str, pd.DataFrame], end: pd.Timestamp | None = None
+) -> list[FuturesContract]:
+    contracts = []
+    for value, df in data.items():
+        bars = df if end is None else df[df.index < end]
+        hourly = bars.rename_axis("timestamp")
+        daily = subsample_ohlc(hourly, timeframe="D", label="left")
+        reference_data = FuturesReferenceData.from_symbol(Symbol(value))
+        contracts.append(FuturesContract(reference_data, {"1h": hourly, "D": daily}))
+    return contracts
+
+
+@pytest.mark.parametrize(
+    "adjustment",
+    [ContinuousFuturesAdjustment.DIFFERENCE, ContinuousFuturesAdjustment.RATIO],
+)
+def test_update_equals_rebuild(adjustment):
+    data = _es_2020()
+    cut = pd.Timestamp("2020-04-15", tz=TZ)
+    continuous = ContinuousFuturesContract.from_individuals(
+        _contracts(data, cut), RolloverRule.EXPIRY, adjustment
+    )
+    # roll dates are known from the calendar before the data
+    full = _contracts(data)
+    continuous.update(full[1:])
+    rebuilt = ContinuousFuturesContract.from_individuals(
+        _contracts(data), RolloverRule.EXPIRY, adjustment
+    )
+
+    assert continuous.roll_dates == rebuilt.roll_dates
+    np.testing.assert_allclose(continuous.adjustments, rebuilt.adjustments)
+    for tf in ("1h", "D"):
+        pd.testing.assert_frame_equal(
+            continuous.unadjusted[tf], rebuilt.unadjusted[tf], check_freq=False
+        )
+        pd.testing.assert_frame_equal(
+            continuous.market_data[tf], rebuilt.market_data[tf], check_freq=False
+        )
+
+
+def _assert_same_series(
+    continuous: ContinuousFuturesContract, rebuilt: ContinuousFuturesContract
+) -> None:
+    assert continuous.roll_dates == rebuilt.roll_dates
+    np.testing.assert_allclose(continuous.adjustments, rebuilt.adjustments)
+    for tf in ("1h", "D"):
+        pd.testing.assert_frame_equal(
+            continuous.market_data[tf], rebuilt.market_data[tf], check_freq=False
+        )
+
+
+def _with_open_interest(
+    contracts: list[FuturesContract], days: pd.DatetimeIndex
+) -> list[FuturesContract]:
+    """ES M 2020 open interest exceeds H on days, no other pair crosses
+    (they roll on expiry)."""
+    for contract in contracts:
+        daily = contract.market_data["D"]
+        open_interest = np.full(len(daily), 10.0)
+        if contract.month_code in "HM":
+            above = daily.index.isin(days)
+            high = above if contract.month_code == "M" else ~above
+            open_interest = np.where(high, 1_000.0, 100.0)
+        daily["open_interest"] = open_interest
+    return contracts
+
+
+def test_update_appends_without_rebuilding():
+    data = _es_2020()
+    # after the last roll, only bars of ES Z 2020 are new
+    cut = pd.Timestamp("2020-10-15", tz=TZ)
+    adjustment = ContinuousFuturesAdjustment.DIFFERENCE
+    continuous = ContinuousFuturesContract.from_individuals(
+        _contracts(data, cut), RolloverRule.EXPIRY, adjustment
+    )
+    before = continuous.unadjusted["1h"]
+    roll_dates = list(continuous.roll_dates)
+
+    continuous.update([])
+    assert continuous.unadjusted["1h"] is before
+    continuous.update(_contracts(data)[3:])
+    assert continuous.roll_dates == roll_dates
+    pd.testing.assert_frame_equal(
+        continuous.unadjusted["1h"].loc[: before.index[-1]], before, check_freq=False
+    )
+    rebuilt = ContinuousFuturesContract.from_individuals(
+        _contracts(data), RolloverRule.EXPIRY, adjustment
+    )
+    _assert_same_series(continuous, rebuilt)
+
+
+def test_update_rebuilds_from_changed_roll():
+    data = _es_2020()
+    cut = pd.Timestamp("2020-03-10", tz=TZ)
+    adjustment = ContinuousFuturesAdjustment.RATIO
+    # two early crossovers, then M stays above H from March 12
+    days = pd.DatetimeIndex(["2020-02-20", "2020-02-21"], tz=TZ).append(
+        pd.date_range("2020-03-12", "2020-03-31", tz=TZ)
+    )
+    continuous = ContinuousFuturesContract.from_individuals(
+        _with_open_interest(_contracts(data, cut), days),
+        RolloverRule.OPEN_INTEREST,
+        adjustment,
+    )
+    assert continuous.roll_dates[0] == days[1]
+
+    # with more data, the early crossovers leave the window of the last
+    # days both contracts have data and the roll moves after the cut
+    continuous.update(_with_open_interest(_contracts(data), days))
+    assert continuous.roll_dates[0] == days[3]
+    rebuilt = ContinuousFuturesContract.from_individuals(
+        _with_open_interest(_contracts(data), days),
+        RolloverRule.OPEN_INTEREST,
+        adjustment,
+    )
+    _assert_same_series(continuous, rebuilt)
+
+
+def _per_pair_roll_date(
+    curr: FuturesContract,
+    next_: FuturesContract,
+    column: str = "open_interest",
+    days_to_expiration: int = 20,
+    occurrence: int = 2,
+) -> pd.Timestamp:
+    """Roll date of a pair as found before roll_schedule, one pair at a time."""
+    both = curr.market_data["D"][[column]].join(
+        next_.market_data["D"][[column]], lsuffix="_curr", rsuffix="_next", how="inner"
+    )[-days_to_expiration:]
+    crossover = both[column + "_next"] > both[column + "_curr"]
+    return crossover[crossover].index[occurrence - 1]
+
+
+@pytest.mark.parametrize("occurrence", [1, 2, 3])
+def test_roll_schedule_matches_per_pair_search(occurrence):
+    rng = np.random.default_rng(1)
+    contracts = _contracts(_es_2020())
+    for contract in contracts:
+        daily = contract.market_data["D"]
+        # noisy open interest falling in the last 30 days before expiry,
+        # the next contract overtakes after a few false crossovers
+        days_left = (contract.expiration - daily.index).days.to_numpy()
+        noise = rng.normal(0, 3, len(daily))
+        daily["open_interest"] = np.minimum(days_left, 30) + noise
+
+    schedule = roll_schedule(contracts, occurrence=occurrence)
+    assert (schedule["rule"] == RolloverRule.OPEN_INTEREST).all()
+    assert schedule["symbol"].tolist() == [c.symbol for c in contracts[:-1]]
+    assert schedule["roll_date"].tolist() == [
+        _per_pair_roll_date(curr, next_, occurrence=occurrence)
+        for curr, next_ in zip(contracts, contracts[1:])
+    ]
+
+
+def test_roll_schedule_falls_back_to_expiry():
+    contracts = _contracts(_es_2020())
+    for k, contract in enumerate(contracts):
+        # open interest never crosses over
+        contract.market_data["D"]["open_interest"] = 1_000.0 - k
+
+    schedule = roll_schedule(contracts)
+    assert (schedule["rule"] == RolloverRule.EXPIRY).all()
+    assert schedule["roll_date"].tolist() == [c.last_trade for c in contracts[:-1]]
+    with pytest.raises(ValueError):
+        roll_schedule(contracts, fallback=None)
@@ -0,0 +1,120 @@
+import asyncio
+from time import perf_counter_ns
+
+import numpy as np
+import pytest
+
+from kaos.data.data import Universe
+from kaos.engine import BarEvent, Engine
+from kaos.live import KIND_BAR, KIND_TICK, Feed, LiveEngine, ReplayServer, SocketFeed
+from kaos.risk import Portfolio
+from kaos.strategy import Strategy
+from tests.test_engine import _universe
+
+
+class Momentum(Strategy):
+    def init(self):
+        self.previous = {}
+        self.bars = []
+
+    def on_bar(self, bar: BarEvent) -> None:
+        self.bars.append((bar.instrument, bar.open, bar.high, bar.low, bar.close))
+        previous = self.previous.get(bar.instrument, bar.close)
+        position = self.engine.portfolio.position(bar.instrument)
+        if bar.close > previous and position <= 0:
+            self.order(bar.instrument, 1 - position)
+        elif bar.close < previous and position >= 0:
+            self.order(bar.instrument, -1 - position)
+        self.previous[bar.instrument] = bar.close
+
+
+class ListFeed(Feed):
+    """Frames from memory, then error if given."""
+
+    def __init__(self, symbols: list[str], frames: list[tuple], error=None):
+        self.symbols = symbols
+        self.frames = frames
+        self.error = error
+        self.closed = False
+
+    async def connect(self) -> list[str]:
+        return self.symbols
+
+    async def messages(self):
+        for frame in self.frames:
+            yield (*frame, perf_counter_ns())
+            await asyncio.sleep(0)
+        if self.error is not None:
+            raise self.error
+
+    async def close(self) -> None:
+        self.closed = True
+
+
+def _frames(n: int) -> list[tuple]:
+    return [(KIND_BAR, i % 2, i // 2, 1.0, 2.0, 0.5, 1.5, 1.0) for i in range(n)]
+
+
+def test_replay_matches_engine():
+    universe = _universe(500)
+    data = {c.symbol.value: c.market_data["1min"] for c in universe}
+    portfolio = Portfolio(cash=1_000)
+    Engine(universe, [Momentum()], portfolio).run()
+
+    async def replay() -> tuple[LiveEngine, Portfolio]:
+        async with ReplayServer(data, speed=None) as server:
+            live_portfolio = Portfolio(cash=1_000)
+            engine = LiveEngine(
+                SocketFeed(server.host, server.port),
+                [Momentum()],
+                live_portfolio,
+                queue_size=16,
+            )
+            await engine.run_live()
+        return engine, live_portfolio
+
+    engine, live_portfolio = asyncio.run(replay())
+    assert engine.symbols == list(data)
+    assert isinstance(engine.universe, Universe) and not len(engine.universe)
+    assert engine.stats.events == sum(len(df) for df in data.values())
+    assert engine.stats.max_queue_depth <= 16
+    np.testing.assert_array_equal(live_portfolio.fills, portfolio.fills)
+    np.testing.assert_allclose(live_portfolio.equity_curve, portfolio.equity_curve)
+
+
+def test_feed_error_is_raised_by_run_live():
+    feed = ListFeed(["A", "B"], _frames(100), error=ConnectionError("feed lost"))
+    engine = LiveEngine(feed, [Momentum()], Portfolio(), queue_size=4)
+    with pytest.raises(ConnectionError, match="feed lost"):
+        asyncio.run(asyncio.wait_for(engine.run_live(), timeout=10))
+    # every frame before the error was dispatched
+    assert engine.stats.events == 100
+    assert feed.closed
+
+
+def test_strategy_error_stops_the_feed():
+    class Failing(Strategy):
+        def init(self):
+            pass
+
+        def on_bar(self, bar: BarEvent) -> None:
+            raise RuntimeError("strategy failed")
+
+    feed = ListFeed(["A", "B"], _frames(100))
+    engine = LiveEngine(feed, [Failing()], Portfolio(), queue_size=4)
+    with pytest.raises(RuntimeError, match="strategy failed"):
+        asyncio.run(asyncio.wait_for(engine.run_live(), timeout=10))
+    assert feed.closed
+
+
+def test_ticks_are_single_price_bars():
+    frames = [(KIND_TICK, 0, i, 0.0, 0.0, 0.0, 100.0 + i, 3.0) for i in range(3)]
+    strategy = Momentum()
+    engine = LiveEngine(ListFeed(["A"], frames), [strategy], Portfolio())
+    asyncio.run(engine.run_live())
+    assert strategy.bars == [(0, p, p, p, p) for p in (100.0, 101.0, 102.0)]
+
+    frames = [(7, 0, 0, 1.0, 1.0, 1.0, 1.0, 1.0)]
+    engine = LiveEngine(ListFeed(["A"], frames), [Momentum()], Portfolio())
+    with pytest.raises(ValueError, match="Unknown frame kind"):
+        asyncio.run(engine.run_live())
@@ -0,0 +1,54 @@
+import numpy as np
+import pandas as pd
+
+from kaos.data.data import FuturesReferenceData
+from kaos.data.loading import compact_ohlcv
+from kaos.data.symbol import Symbol
+
+
+def _bars(n: int = 1_000, tick: float = 0.25) -> pd.DataFrame:
+    rng = np.random.default_rng(0)
+    close = 3000 + tick * np.cumsum(rng.integers(-2, 3, n))
+    index = pd.date_range("2024-01-02", periods=n, freq="1min", tz="America/New_York")
+    return pd.DataFrame(
+        {
+            "symbol": "ES-H-2024",
+            "open": close,
+            "high": close + tick,
+            "low": close - tick,
+            "close": close,
+            "volume": rng.integers(0, 500, n),
+            "open_interest": np.nan,
+        },
+        index=index,
+    )
+
+
+def test_compact_ohlcv_keeps_prices_on_tick_grid():
+    data = _bars()
+    compact = compact_ohlcv(data, tick_size=0.25)
+
+    assert isinstance(compact["symbol"].dtype, pd.CategoricalDtype)
+    assert (compact[["open", "high", "low", "close"]].dtypes == np.float32).all()
+    assert compact["volume"].dtype == np.int32
+    assert compact["open_interest"].dtype == np.float32
+    pd.testing.assert_frame_equal(
+        compact.astype({c: np.float64 for c in ("open", "high", "low", "close")}),
+        data.astype({"symbol": "category", "volume": np.int32}).astype(
+            {"open_interest": np.float32}
+        ),
+    )
+    assert compact.memory_usage(deep=True).sum() < data.memory_usage(deep=True).sum()
+
+
+def test_compact_ohlcv_keeps_float64_when_float32_loses_ticks():
+    data = _bars(tick=0.25)
+    data[["open", "high", "low", "close"]] += 1e6 + 0.001
+    compact = compact_ohlcv(data, tick_size=0.001)
+    assert (compact[["open", "high", "low", "close"]].dtypes == np.float64).all()
+
+
+def test_from_symbol_fills_tick_size():
+    assert FuturesReferenceData.from_symbol(Symbol("ES-H-2024")).tick_size == 0.25
+    assert FuturesReferenceData.from_symbol(Symbol("ZN-H-2024")).tick_size == 1 / 64
+    assert FuturesReferenceData.from_symbol(Symbol("XX-H-2024")).tick_size is None
@@ -0,0 +1,75 @@
+import numpy as np
+import pytest
+
+from kaos.risk import FILL_DTYPE, HISTORY_DTYPE, Portfolio, _Records
+
+
+def test_portfolio_fills_positions_and_prices():
+    portfolio = Portfolio(cash=1_000)
+    portfolio.fill(1, 0, 2, 100.0, cost=1.0)
+    portfolio.fill(2, 2, -1, 50.0)
+    assert portfolio.positions.tolist() == [2, 0, -1]
+    assert portfolio.prices.tolist() == [100.0, 0.0, 50.0]
+    assert portfolio.cash == 1_000 - 200 - 1 + 50
+    assert portfolio.equity == pytest.approx(999)
+    assert portfolio.exposure == pytest.approx(250)
+
+    portfolio.mark(0, 110.0)
+    portfolio.mark(2, 40.0)
+    assert portfolio.equity == pytest.approx(849 + 2 * 110 - 40)
+    assert portfolio.exposure == pytest.approx(2 * 110 + 40)
+    # closing a position at a new price
+    portfolio.fill(3, 0, -2, 105.0)
+    assert portfolio.position(0) == 0 and portfolio.position(5) == 0.0
+    assert portfolio.equity == pytest.approx(portfolio.cash - 40)
+    assert portfolio.exposure == pytest.approx(40)
+    # the returned arrays are copies
+    portfolio.positions[2] = 10
+    assert portfolio.position(2) == -1
+
+
+def test_portfolio_fills_rebuild_fill_objects():
+    portfolio = Portfolio()
+    portfolio.fill(10, 1, 3, 99.5, cost=0.5)
+    portfolio.fill(20, 0, -1, 101.0)
+    assert portfolio.fills.dtype == FILL_DTYPE
+    assert portfolio.fills["timestamp"].tolist() == [10, 20]
+    fills = list(portfolio.iter_fills())
+    assert [
+        (f.timestamp, f.instrument, f.quantity, f.price, f.cost) for f in fills
+    ] == [(10, 1, 3.0, 99.5, 0.5), (20, 0, -1.0, 101.0, 0.0)]
+    assert isinstance(fills[0].timestamp, int)
+    assert repr(fills[1]) == (
+        "Fill(20, instrument=0, quantity=-1.0, price=101.0, cost=0.0)"
+    )
+
+
+def test_portfolio_history_columns():
+    portfolio = Portfolio(cash=100, n_instruments=1)
+    portfolio.record(1)
+    portfolio.fill(2, 0, 1, 10.0)
+    portfolio.mark(0, 12.0)
+    portfolio.record(2)
+    history = portfolio.history
+    assert history.dtype == HISTORY_DTYPE
+    assert history["timestamp"].tolist() == [1, 2]
+    assert history["cash"].tolist() == [100, 90]
+    assert history["equity"].tolist() == [100, 102]
+    assert history["exposure"].tolist() == [0, 12]
+    assert portfolio.timestamps.dtype == np.int64
+    np.testing.assert_array_equal(portfolio.equity_curve, history["equity"])
+    np.testing.assert_array_equal(portfolio.exposure_curve, history["exposure"])
+
+
+def test_records_grow_past_initial_capacity():
+    records = _Records(FILL_DTYPE, capacity=2)
+    for i in range(5):
+        records.append((i, i % 2, 1.0, 100.0 + i, 0.0))
+    assert len(records) == 5
+    assert len(records._data) == 8
+    assert records.view()["price"].tolist() == [100, 101, 102, 103, 104]
+
+    portfolio = Portfolio(capacity=1)
+    for i in range(3):
+        portfolio.fill(i, 0, 1, 1.0)
+    assert portfolio.fills["timestamp"].tolist() == [0, 1, 2]
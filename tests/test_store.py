@@ -0,0 +1,84 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from kaos.data.store import OHLCV_DTYPE, BinaryStore, search_range, to_frame
+from kaos.data.symbol import Symbol
+
+SYMBOL = Symbol("ES-H-2024")
+
+
+def _bars(periods: int = 500) -> pd.DataFrame:
+    rng = np.random.default_rng(0)
+    index = pd.date_range(
+        "2024-01-02 09:30", periods=periods, freq="1min", tz="America/New_York"
+    )
+    close = 4000 + 0.25 * np.cumsum(rng.integers(-2, 3, periods))
+    return pd.DataFrame(
+        {
+            "open": close,
+            "high": close + 0.25,
+            "low": close - 0.25,
+            "close": close,
+            "volume": rng.integers(0, 500, periods).astype(float),
+            "open_interest": np.nan,
+        },
+        index=index.rename("timestamp"),
+    )
+
+
+def test_binary_store_round_trip(tmp_path):
+    store = BinaryStore(tmp_path)
+    data = _bars()
+    data.iloc[3, data.columns.get_loc("volume")] = np.nan
+    store.write(SYMBOL, "1min", data)
+
+    records = store.open(SYMBOL, "1min")
+    assert records.dtype == OHLCV_DTYPE
+    out = store.get(SYMBOL, "1min", tz="America/New_York")
+    pd.testing.assert_frame_equal(out, data, check_dtype=False, check_freq=False)
+    # missing integer values come back as NaN
+    assert np.isnan(out["volume"].iloc[3])
+    assert out["open_interest"].isna().all()
+
+
+def test_binary_store_slices_time_range(tmp_path):
+    store = BinaryStore(tmp_path)
+    data = _bars()
+    store.write(SYMBOL, "1min", data)
+    start, end = data.index[100], data.index[199]
+
+    out = store.get(SYMBOL, "1min", start, end, tz="America/New_York")
+    pd.testing.assert_index_equal(out.index, data.loc[start:end].index)
+    # naive bounds are in the standard timezone
+    naive = store.get(SYMBOL, "1min", start.tz_localize(None), end.tz_localize(None))
+    assert len(naive) == 100
+    # slices are views on the memory map
+    assert np.shares_memory(store.slice(SYMBOL, "1min"), store.open(SYMBOL, "1min"))
+
+
+def test_search_range():
+    timestamps = pd.date_range("2024-01-02", periods=10, freq="1h", tz="UTC").asi8
+    assert search_range(timestamps) == (0, 10)
+    assert search_range(
+        timestamps, pd.Timestamp("2024-01-02 02:00", tz="UTC")
+    ) == (2, 10)
+    # both bounds are included
+    assert search_range(
+        timestamps,
+        pd.Timestamp("2024-01-02 02:30", tz="UTC"),
+        pd.Timestamp("2024-01-02 05:00", tz="UTC"),
+    ) == (3, 6)
+
+
+def test_to_frame_without_copy_views_records(tmp_path):
+    store = BinaryStore(tmp_path)
+    store.write(SYMBOL, "1min", _bars().fillna({"open_interest": 0}))
+    records = store.open(SYMBOL, "1min")
+    out = to_frame(records, copy=False)
+    assert np.shares_memory(out["close"].to_numpy(), records)
+
+
+def test_binary_store_requires_sorted_data(tmp_path):
+    with pytest.raises(ValueError):
+        BinaryStore(tmp_path).write(SYMBOL, "1min", _bars().iloc[::-1])
@@ -0,0 +1,35 @@
+import pytest
+
+from kaos.sweep import SweepRunner, backtest_metrics, grid
+from tests.test_engine import Crossover, _universe
+
+
+@pytest.mark.parametrize("stop_loss", [None, 0.001])
+def test_engine_and_vectorized_metrics_agree(stop_loss):
+    universe = _universe()
+    metrics = {
+        vectorized: backtest_metrics(
+            universe,
+            Crossover(stop_loss=stop_loss),
+            cash=1_000,
+            commission=0.01,
+            vectorized=vectorized,
+        )
+        for vectorized in (True, False)
+    }
+    assert metrics[True]["fills"] == metrics[False]["fills"] > 0
+    assert metrics[True] == pytest.approx(metrics[False])
+    assert metrics[True]["pnl"] == pytest.approx(metrics[True]["equity"] - 1_000)
+
+
+def test_sweep_runs_match_in_process_metrics():
+    universe = _universe(500)
+    param_sets = list(grid(fast=[3, 5], slow=[10], stop_loss=[None, 0.001]))
+    runner = SweepRunner(universe, Crossover, cash=1_000, max_workers=1)
+    results = sorted(runner.run(param_sets), key=lambda result: result.run)
+
+    assert [result.params for result in results] == param_sets
+    for result in results:
+        assert result.error is None
+        expected = backtest_metrics(universe, Crossover(**result.params), cash=1_000)
+        assert result.metrics == pytest.approx(expected)
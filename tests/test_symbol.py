@@ -0,0 +1,56 @@
+import pickle
+
+import pytest
+
+from kaos.data.symbol import Symbol
+
+
+def test_symbol_is_interned():
+    symbol = Symbol("ES-H-2024")
+    assert Symbol("ES-H-2024") is symbol
+    assert Symbol("".join(["ES-H-", "2024"])) is symbol
+    assert Symbol("ES-M-2024") is not symbol
+
+
+def test_symbol_fields_and_sort_key():
+    symbol = Symbol("6E-M-2024")
+    assert (symbol.product_code, symbol.month_code, symbol.year) == ("6E", "M", "2024")
+    assert symbol.firstrate_string == "6E_M24"
+    assert hash(symbol) == hash("6E-M-2024")
+    assert sorted(Symbol(s) for s in ("ES-H-2025", "ES-Z-2024", "ES-M-2024")) == [
+        Symbol("ES-M-2024"),
+        Symbol("ES-Z-2024"),
+        Symbol("ES-H-2025"),
+    ]
+    # continuous symbols sort before individual contracts
+    assert Symbol("ES-1-open_interest") < Symbol("ES-H-2020")
+
+
+def test_symbol_is_immutable():
+    symbol = Symbol("ES-U-2024")
+    with pytest.raises(AttributeError):
+        symbol.year = "2025"
+    assert symbol.year == "2024"
+
+
+def test_unpickled_symbol_is_interned():
+    symbol = Symbol("NQ-Z-2023")
+    assert pickle.loads(pickle.dumps(symbol)) is symbol
+    # a value never seen is interned on load
+    payload = pickle.dumps(Symbol("CL-F-2031"))
+    del Symbol._interned["CL-F-2031"]
+    loaded = pickle.loads(payload)
+    assert loaded is Symbol("CL-F-2031")
+    assert loaded.sort_key == ("CL", 2031, 1, "CL-F-2031")
+
+
+def test_two_digit_years_sort_with_their_century():
+    assert Symbol("ES-Z-99").sort_key[1] == 1999
+    assert Symbol("ES-Z-99") < Symbol("ES-H-00")
+    values = ("ES-H-25", "ES-Z-2024", "ES-M-24", "ES-H-2024")
+    assert sorted(Symbol(value) for value in values) == [
+        Symbol("ES-H-2024"),
+        Symbol("ES-M-24"),
+        Symbol("ES-Z-2024"),
+        Symbol("ES-H-25"),
+    ]
@@ -0,0 +1,124 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from kaos.data.aggregation import subsample_ohlc
+from kaos.data.enums import BarType
+from kaos.data.symbol import Symbol
+from kaos.data.ticks import TICK_DTYPE, TickStore, aggregate_ticks
+
+
+def _ticks(n: int = 10_000) -> np.ndarray:
+    rng = np.random.default_rng(0)
+    ticks = np.zeros(n, dtype=TICK_DTYPE)
+    start = pd.Timestamp("2024-01-02 18:00", tz="America/New_York").value
+    ticks["timestamp"] = start + np.cumsum(rng.integers(1, 2_000_000_000, n))
+    ticks["price"] = 100 + np.cumsum(rng.normal(0, 0.01, n))
+    ticks["size"] = rng.integers(1, 20, n)
+    return ticks
+
+
+def _chunks(ticks: np.ndarray, size: int) -> list[np.ndarray]:
+    return [ticks[i : i + size] for i in range(0, len(ticks), size)]
+
+
+def _volume_bar_ends(sizes: np.ndarray, size: int) -> list[int]:
+    """Last tick of every volume bar, one tick at a time."""
+    ends, volume = [], 0
+    for i, tick_size in enumerate(sizes.tolist()):
+        volume += tick_size
+        if volume >= size:
+            ends.append(i)
+            volume = 0
+    if volume:
+        ends.append(len(sizes) - 1)
+    return ends
+
+
+def test_volume_bar_count_restarts_after_overshoot():
+    ticks = _ticks(5)
+    ticks["size"] = [6, 6, 3, 5, 4]
+    bars = aggregate_ticks([ticks], BarType.VOLUME, 10)
+    # 12 closes the first bar, the second one needs 10 more
+    assert bars["volume"].tolist() == [12, 8 + 4]
+    assert bars["ticks"].tolist() == [2, 3]
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 1_000, 10_000])
+@pytest.mark.parametrize("bar_size", [1, 15, 100])
+def test_volume_bars_match_tick_by_tick(chunk_size, bar_size):
+    ticks = _ticks()
+    bars = aggregate_ticks(_chunks(ticks, chunk_size), BarType.VOLUME, bar_size)
+
+    ends = np.array(_volume_bar_ends(ticks["size"], bar_size))
+    starts = np.append(0, ends[:-1] + 1)
+    prices = ticks["price"]
+    assert bars["ticks"].tolist() == (ends - starts + 1).tolist()
+    assert bars["volume"].tolist() == np.add.reduceat(ticks["size"], starts).tolist()
+    assert (bars["volume"].to_numpy()[:-1] >= bar_size).all()
+    np.testing.assert_array_equal(bars["open"], prices[starts])
+    np.testing.assert_array_equal(bars["close"], prices[ends])
+    np.testing.assert_array_equal(bars["high"], np.maximum.reduceat(prices, starts))
+    assert bars.index.asi8.tolist() == ticks["timestamp"][ends].tolist()
+
+
+@pytest.mark.parametrize("chunk_size", [7, 10_000])
+def test_tick_bars(chunk_size):
+    ticks = _ticks()
+    bars = aggregate_ticks(_chunks(ticks, chunk_size), BarType.TICK, 100)
+    assert (bars["ticks"] == 100).all()
+    assert bars["volume"].tolist() == np.add.reduceat(
+        ticks["size"], np.arange(0, len(ticks), 100)
+    ).tolist()
+
+
+@pytest.mark.parametrize("chunk_size", [7, 10_000])
+def test_time_bars_match_subsample_ohlc(chunk_size):
+    ticks = _ticks()
+    bars = aggregate_ticks(_chunks(ticks, chunk_size), BarType.TIME, "1h")
+    index = pd.DatetimeIndex(ticks["timestamp"].view("M8[ns]"), name="timestamp")
+    prices = pd.DataFrame(
+        {
+            "open": ticks["price"],
+            "high": ticks["price"],
+            "low": ticks["price"],
+            "close": ticks["price"],
+            "volume": ticks["size"],
+        },
+        index=index.tz_localize("UTC").tz_convert("America/New_York"),
+    )
+    pd.testing.assert_frame_equal(
+        bars.drop(columns="ticks"),
+        subsample_ohlc(prices, timeframe="1h"),
+        check_freq=False,
+        check_dtype=False,
+    )
+
+
+def test_tick_store_appends_to_partial_chunk(tmp_path):
+    ticks = _ticks(2_500)
+    store = TickStore(tmp_path, chunk_size=1_000)
+    symbol = Symbol("ES-H-2024")
+    store.write(symbol, ticks[:1_500])
+    store.write(symbol, ticks[1_500:])
+    assert [len(np.load(path)) for _, _, path in store.chunk_files(symbol)] == [
+        1_000,
+        1_000,
+        500,
+    ]
+    np.testing.assert_array_equal(store.read(symbol), ticks)
+
+
+def test_tick_store_keeps_partial_chunk_if_write_fails(tmp_path, monkeypatch):
+    ticks = _ticks(1_500)
+    store = TickStore(tmp_path, chunk_size=1_000)
+    symbol = Symbol("ES-H-2024")
+    store.write(symbol, ticks[:500])
+
+    def fail(*args):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(store, "_write_chunk", fail)
+    with pytest.raises(OSError):
+        store.write(symbol, ticks[500:])
+    np.testing.assert_array_equal(store.read(symbol), ticks[:500])
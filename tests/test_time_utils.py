@@ -0,0 +1,121 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from kaos.data.data import FuturesReferenceData
+from kaos.data.enums import DayOfWeek, ExpirationRule, WeekOfMonth
+from kaos.data.instruments import FuturesContract
+from kaos.data.symbol import Symbol
+from kaos.time_utils import (
+    CME_GLOBEX,
+    EXPIRATION_RULES,
+    contract_dates,
+    full_year,
+    nth_weekday_of_month,
+)
+
+
+@pytest.mark.parametrize(
+    "product, year, month, expiration, last_trade",
+    [
+        ("ES", 2020, 3, "2020-03-20", "2020-03-20"),
+        ("6E", 2024, 6, "2024-06-19", "2024-06-17"),
+        ("6C", 2024, 6, "2024-06-19", "2024-06-18"),
+        ("ZN", 2024, 6, "2024-06-28", "2024-06-19"),
+        # 2 and 5-year notes trade until the last business day
+        ("ZT", 2024, 6, "2024-07-03", "2024-06-28"),
+        ("ZF", 2024, 8, "2024-09-04", "2024-08-30"),
+        ("CL", 2024, 6, "2024-05-21", "2024-05-21"),
+        ("GC", 2024, 6, "2024-06-26", "2024-06-26"),
+    ],
+)
+def test_contract_dates(product, year, month, expiration, last_trade):
+    dates = contract_dates(product, year, month)
+    assert dates == (np.datetime64(expiration), np.datetime64(last_trade))
+
+
+def test_contract_dates_of_arrays_and_unknown_products():
+    expirations, last_trades = contract_dates("ES", np.array([2020, 2021]), 3)
+    assert expirations.tolist() == last_trades.tolist()
+    assert expirations.astype(str).tolist() == ["2020-03-20", "2021-03-19"]
+    assert contract_dates("XX", 2020, 3) is None
+    with pytest.raises(ValueError):
+        contract_dates("ES", 1900, 3)
+
+
+def test_short_treasuries_have_their_own_rule():
+    for product in ("ZT", "ZF", "TU", "FV"):
+        assert EXPIRATION_RULES[product] == ExpirationRule.SHORT_TREASURY
+    for product in ("ZN", "ZB", "UB"):
+        assert EXPIRATION_RULES[product] == ExpirationRule.TREASURY
+
+
+def test_full_year():
+    reference = pd.Timestamp("2026-10-18")
+    assert full_year(20, reference) == 2020
+    assert full_year(30, reference) == 2030
+    assert full_year(99, reference) == 1999
+    assert full_year(98, pd.Timestamp("2001-01-01")) == 1998
+
+
+def test_from_symbol_accepts_2_digit_years():
+    short = FuturesReferenceData.from_symbol(Symbol("ES-H-20"))
+    full = FuturesReferenceData.from_symbol(Symbol("ES-H-2020"))
+    assert short.expiration == full.expiration == pd.Timestamp(
+        "2020-03-20", tz="America/New_York"
+    )
+    assert short.last_trade == full.last_trade
+
+
+def test_activation_comes_from_daily_data():
+    index = pd.date_range("2019-12-01", "2020-03-20", freq="D", tz="America/New_York")
+    daily = pd.DataFrame({"close": 1.0}, index=index)
+    reference_data = FuturesReferenceData.from_symbol(Symbol("ES-H-2020"))
+    assert reference_data.activation is None
+
+    contract = FuturesContract(reference_data, {"D": daily})
+    assert contract.activation == index[0]
+    assert contract.expiration == pd.Timestamp("2020-03-20", tz="America/New_York")
+
+
+def test_nth_weekday_of_month_counts_the_first_day():
+    # 2024-03-01 is a Friday: the first Friday is the 1st itself, while
+    # the previous WeekOfMonth offset rolled it to the next month
+    first = nth_weekday_of_month(2024, 3, DayOfWeek.FRI, WeekOfMonth.FIRST)
+    assert first == pd.Timestamp("2024-03-01", tz="America/New_York")
+    rolled = pd.Timestamp("2024-03-01") + pd.offsets.WeekOfMonth(weekday=4, week=0)
+    assert rolled == pd.Timestamp("2024-04-05")
+    assert nth_weekday_of_month(
+        2024, 3, DayOfWeek.FRI, WeekOfMonth.THIRD
+    ) == pd.Timestamp("2024-03-15", tz="America/New_York")
+
+    dates = nth_weekday_of_month(
+        np.array([2024, 2024, 2025]),
+        np.array([3, 5, 6]),
+        DayOfWeek.WED,
+        WeekOfMonth.THIRD,
+    )
+    assert dates.strftime("%Y-%m-%d").tolist() == [
+        "2024-03-20",
+        "2024-05-15",
+        "2025-06-18",
+    ]
+
+
+def test_cme_globex_sessions_skip_holidays():
+    # Good Friday 2024 and Christmas 2024, a Wednesday
+    opens, closes = CME_GLOBEX.sessions(
+        pd.Timestamp("2024-03-28"), pd.Timestamp("2024-04-01")
+    )
+    assert pd.DatetimeIndex(opens, tz="UTC").tz_convert(CME_GLOBEX.tz).strftime(
+        "%Y-%m-%d %H:%M"
+    ).tolist() == ["2024-03-27 18:00", "2024-03-31 18:00"]
+    assert len(closes) == 2
+
+    opens, _ = CME_GLOBEX.sessions(
+        pd.Timestamp("2024-12-24"), pd.Timestamp("2024-12-27")
+    )
+    assert len(opens) == 3
+    assert "2024-12-25" in CME_GLOBEX.holidays
+    # observed holidays: Christmas 2021 on Friday 24, New Year 2023 on Monday 2
+    assert {"2021-12-24", "2023-01-02"} <= set(CME_GLOBEX.holidays)